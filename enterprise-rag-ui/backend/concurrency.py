@@ -0,0 +1,112 @@
+"""
+Upstream Concurrency Limits
+
+Each upstream service the request path talks to (Ollama embeddings, the Chroma
+store, the Groq LLM) gets its own limiter. A burst of requests queues on the
+limiter in the event loop instead of exhausting worker threads or flooding the
+upstream. Blocking calls are run on a dedicated thread pool sized to the limit.
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+
+class RateLimiter:
+    """Token bucket allowing a burst of up to a minute's quota, then a steady per-minute rate"""
+
+    def __init__(self, requests_per_minute: float):
+        self.requests_per_minute = requests_per_minute
+        self._tokens = float(requests_per_minute)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        """Wait until a request is allowed under the rate"""
+        per_second = self.requests_per_minute / 60
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.requests_per_minute, self._tokens + (now - self._updated) * per_second)
+            self._updated = now
+            # No await between the check and the decrement, so this is safe within one event loop
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / per_second)
+
+
+class UpstreamLimiter:
+    """Bounds the number of in-flight calls (and optionally calls per minute) to one upstream service"""
+
+    def __init__(self, name: str, max_concurrency: int, requests_per_minute: float = 0):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests_per_minute = requests_per_minute
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._rate = RateLimiter(requests_per_minute) if requests_per_minute > 0 else None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def __aenter__(self) -> "UpstreamLimiter":
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+            if self._rate is not None:
+                try:
+                    await self._rate.acquire()
+                except BaseException:
+                    self.semaphore.release()
+                    raise
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.in_flight -= 1
+        self.semaphore.release()
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call on this upstream's thread pool, within the limit"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                thread_name_prefix=self.name)
+        async with self:
+            loop = asyncio.get_running_loop()
+            # Run in a copy of the caller's context, so the request's trace sees the call
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor, partial(context.run, fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "requests_per_minute": self.requests_per_minute,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+        }
+
+
+LIMITERS = {
+    "ollama": UpstreamLimiter("ollama", int(os.environ.get("OLLAMA_CONCURRENCY", "8"))),
+    "chroma": UpstreamLimiter("chroma", int(os.environ.get("CHROMA_CONCURRENCY", "8"))),
+    # Groq quotas are per minute (30 requests/min on the free tier). Interactive
+    # requests are not rate limited unless GROQ_REQUESTS_PER_MINUTE is set; batch
+    # analysis has its own rate (BATCH_REQUESTS_PER_MINUTE in main.py)
+    "groq": UpstreamLimiter("groq", int(os.environ.get("GROQ_CONCURRENCY", "16")),
+                            float(os.environ.get("GROQ_REQUESTS_PER_MINUTE", "0"))),
+}
+
+
+def get_limiter(name: str) -> UpstreamLimiter:
+    """Return the limiter for an upstream service"""
+    return LIMITERS[name]
@@ -0,0 +1,228 @@
+"""
+Conversation Store
+
+Chat history lives on the server, keyed by a conversation ID that the
+frontend keeps in its session cookie, so the cookie stays a few bytes however
+long the conversation gets. Each turn records the question, the standalone
+question it was condensed into (see llm/followup.py), the answer, and the IDs
+of the chunks retrieved for it, so a follow-up question can reuse that
+context instead of retrieving again.
+
+The most recently used conversations (up to CONVERSATION_CACHE_SIZE, each
+with its last CONVERSATION_MAX_TURNS turns) are held in memory. With
+CONVERSATION_DB set, every turn is also written to SQLite: conversations
+survive restarts, evicted ones are read back on demand (and return to memory
+with their next turn), and history pages reach back past the in-memory turns.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_CACHE_SIZE = int(os.environ.get("CONVERSATION_CACHE_SIZE", "1000"))
+CONVERSATION_MAX_TURNS = int(os.environ.get("CONVERSATION_MAX_TURNS", "50"))
+# SQLite file for persistent history; empty keeps conversations in memory only
+CONVERSATION_DB = os.environ.get("CONVERSATION_DB", "")
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Conversation IDs come from clients, so they are restricted to a safe shape
+CONVERSATION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+def new_conversation_id() -> str:
+    return uuid.uuid4().hex
+
+
+def valid_conversation_id(conversation_id: str) -> bool:
+    return bool(CONVERSATION_ID_PATTERN.match(conversation_id or ""))
+
+
+class Turn:
+    """One question and its answer, with the chunks retrieved to answer it"""
+
+    def __init__(self, question: str, answer: str, chunk_ids: Sequence[str] = (),
+                 kind: str = "question", turn_id: Optional[str] = None,
+                 created_at: Optional[float] = None, query: Optional[str] = None):
+        self.id = turn_id or uuid.uuid4().hex
+        self.question = question
+        # The standalone question retrieved and answered, when it differs from the one asked
+        self.query = query or question
+        self.answer = answer
+        self.chunk_ids = list(chunk_ids)
+        self.kind = kind  # question, analysis
+        self.created_at = created_at if created_at is not None else time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "question": self.question,
+            "query": self.query,
+            "answer": self.answer,
+            "kind": self.kind,
+            "chunk_ids": self.chunk_ids,
+            "created_at": self.created_at,
+            "timestamp": datetime.fromtimestamp(self.created_at).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+
+class ConversationStore:
+    """Thread-safe LRU of conversations, optionally persisted to SQLite"""
+
+    def __init__(self, max_conversations: int = CONVERSATION_CACHE_SIZE,
+                 max_turns: int = CONVERSATION_MAX_TURNS,
+                 db_path: Optional[str] = CONVERSATION_DB or None):
+        self.max_conversations = max_conversations
+        self.max_turns = max_turns
+        self._lock = threading.Lock()
+        # conversation ID -> its most recent turns, oldest first
+        self._conversations: "OrderedDict[str, List[Turn]]" = OrderedDict()
+        # conversation ID -> total turns, including those only in SQLite
+        self._totals: Dict[str, int] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS conversation_turns (
+                    conversation_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    turn_id TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    chunk_ids TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (conversation_id, position)
+                );
+            """)
+            # Tables created before turns recorded their standalone question
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(conversation_turns)")}
+            if "query" not in columns:
+                self._conn.execute("ALTER TABLE conversation_turns ADD COLUMN query TEXT NOT NULL DEFAULT ''")
+            self._conn.commit()
+
+    def append(self, conversation_id: str, question: str, answer: str,
+               chunk_ids: Sequence[str] = (), kind: str = "question",
+               query: Optional[str] = None) -> Turn:
+        """Add a turn to a conversation, starting the conversation if it is new"""
+        turn = Turn(question, answer, chunk_ids, kind, query=query)
+        with self._lock:
+            turns, position = self._get(conversation_id)
+            # Only appending brings a conversation into memory, so reads of
+            # unknown IDs cannot evict the conversations in use
+            self._conversations[conversation_id] = turns
+            self._conversations.move_to_end(conversation_id)
+            turns.append(turn)
+            del turns[:-self.max_turns]
+            self._totals[conversation_id] = position + 1
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT INTO conversation_turns (conversation_id, position, turn_id, question,"
+                        " query, answer, kind, chunk_ids, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (conversation_id, position, turn.id, turn.question, turn.query, turn.answer,
+                         turn.kind, json.dumps(turn.chunk_ids), turn.created_at)
+                    )
+            self._evict()
+        return turn
+
+    def last_turn(self, conversation_id: str) -> Optional[Turn]:
+        """Return the most recent turn of a conversation, if any"""
+        with self._lock:
+            turns, _ = self._get(conversation_id)
+            return turns[-1] if turns else None
+
+    def recent_turns(self, conversation_id: str, n: int) -> List[Turn]:
+        """Return up to n of the most recent turns, oldest first"""
+        with self._lock:
+            turns, _ = self._get(conversation_id)
+            return list(turns[-n:]) if n > 0 else []
+
+    def history(self, conversation_id: str, offset: Optional[int] = None,
+                limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """Return a page of turns, oldest first; without an offset, the latest page"""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        with self._lock:
+            turns, total = self._get(conversation_id)
+            if offset is None:
+                offset = max(0, total - limit)
+            offset = max(0, offset)
+            # The in-memory turns are the last len(turns) positions
+            first_in_memory = total - len(turns)
+            if offset < first_in_memory and self._conn is not None:
+                page = self._read_turns(conversation_id, offset, limit)
+            else:
+                # Without SQLite, turns before the in-memory ones are gone
+                offset = max(offset, first_in_memory)
+                page = turns[offset - first_in_memory:offset - first_in_memory + limit]
+        return {
+            "conversation_id": conversation_id,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "turns": [turn.to_dict() for turn in page],
+        }
+
+    def delete(self, conversation_id: str) -> None:
+        """Forget a conversation and its persisted turns"""
+        with self._lock:
+            self._conversations.pop(conversation_id, None)
+            self._totals.pop(conversation_id, None)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM conversation_turns WHERE conversation_id = ?",
+                                       (conversation_id,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "conversations_in_memory": len(self._conversations),
+                "turns_in_memory": sum(len(turns) for turns in self._conversations.values()),
+                "persistent": self._conn is not None,
+            }
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _get(self, conversation_id: str) -> Tuple[List[Turn], int]:
+        """Return a conversation's recent turns and its total turn count, from memory or SQLite"""
+        turns = self._conversations.get(conversation_id)
+        if turns is not None:
+            self._conversations.move_to_end(conversation_id)
+            return turns, self._totals[conversation_id]
+        if self._conn is None:
+            return [], 0
+        total = self._conn.execute(
+            "SELECT COUNT(*) FROM conversation_turns WHERE conversation_id = ?", (conversation_id,)
+        ).fetchone()[0]
+        if not total:
+            return [], 0
+        return self._read_turns(conversation_id, max(0, total - self.max_turns), self.max_turns), total
+
+    def _read_turns(self, conversation_id: str, offset: int, limit: int) -> List[Turn]:
+        rows = self._conn.execute(
+            "SELECT turn_id, question, query, answer, kind, chunk_ids, created_at FROM conversation_turns"
+            " WHERE conversation_id = ? AND position >= ? ORDER BY position LIMIT ?",
+            (conversation_id, offset, limit)
+        ).fetchall()
+        return [Turn(question, answer, json.loads(chunk_ids), kind, turn_id, created_at, query)
+                for turn_id, question, query, answer, kind, chunk_ids, created_at in rows]
+
+    def _evict(self) -> None:
+        while len(self._conversations) > self.max_conversations:
+            conversation_id, _ = self._conversations.popitem(last=False)
+            self._totals.pop(conversation_id, None)
@@ -0,0 +1,142 @@
+"""
+Cached, Batched Embeddings
+
+Wraps an embedding model so that chunk texts are embedded in batches across a
+small thread pool, and every vector is stored in an on-disk SQLite cache keyed
+by (model name, SHA-256 of the text). Re-ingesting unchanged text, or
+boilerplate repeated across many patents, never reaches the model again.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+import logging
+
+from langchain_core.embeddings import Embeddings
+
+from metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "32"))
+DEFAULT_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", "4"))
+CACHE_FILENAME = "embedding_cache.sqlite3"
+
+
+def text_hash(text: str) -> str:
+    """Hash a chunk text for use as a cache key"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent (model, text hash) -> vector cache backed by SQLite"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """Return the cached vectors for whichever of the hashes are present"""
+        hashes = list(hashes)
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings"
+                    f" WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                )
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, List[float]]]) -> None:
+        """Store vectors under their text hashes"""
+        rows = [(model, key, array("f", vector).tobytes()) for key, vector in items]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper adding a persistent cache, batching and concurrent requests"""
+
+    def __init__(self, embedding_model: Embeddings, model_name: str, cache: EmbeddingCache,
+                 batch_size: int = DEFAULT_BATCH_SIZE, concurrency: int = DEFAULT_CONCURRENCY):
+        self.embedding_model = embedding_model
+        self.model_name = model_name
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, only sending ones not already cached to the model"""
+        keys = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model_name, set(keys))
+
+        # Embed each distinct uncached text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        CACHE_LOOKUPS.inc(len(texts) - len(missing), cache="embedding", result="hit")
+        CACHE_LOOKUPS.inc(len(missing), cache="embedding", result="miss")
+
+        if missing:
+            items = list(missing.items())
+            batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+            logger.info(f"Embedding {len(items)} uncached texts in {len(batches)} batches "
+                        f"({len(texts) - len(items)} served from cache)")
+            if self.concurrency == 1 or len(batches) == 1:
+                for batch_vectors in map(self._embed_batch, batches):
+                    vectors.update(batch_vectors)
+            else:
+                with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                    for batch_vectors in executor.map(self._embed_batch, batches):
+                        vectors.update(batch_vectors)
+
+        return [vectors[key] for key in keys]
+
+    def _embed_batch(self, batch: List[Tuple[str, str]]) -> Dict[str, List[float]]:
+        """Embed one batch and write it to the cache"""
+        embedded = self.embedding_model.embed_documents([text for _, text in batch])
+        items = [(key, vector) for (key, _), vector in zip(batch, embedded)]
+        self.cache.put_many(self.model_name, items)
+        return dict(items)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Queries go straight to the model; they use a different instruction than documents"""
+        return self.embedding_model.embed_query(text)
@@ -1,44 +1,26 @@
-import os
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.docstore.document import Document
-from backend.ingestion.load_docs import load_documents
+"""
+Generate Embeddings
 
+Kept for the old `python backend/embeddings/generate.py` entry point. It runs
+the regular ingestion pipeline (ingestion/patent_ingestion.py), so the
+manifest, keyword index and patent metadata store stay in step with the
+vector store.
+"""
 
+import logging
+import sys
+from pathlib import Path
 
-# 1. Load text from PDFs
-texts = load_documents()
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASE_DIR = BACKEND_DIR.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
 
-# 2. Split the text into chunks (e.g. 1000 characters each)
-splitter = RecursiveCharacterTextSplitter(
-    chunk_size=500,
-    chunk_overlap=100,
-)
+from ingestion.patent_ingestion import ingest_patents  # noqa: E402
 
-all_chunks = []
-for text in texts:
-    docs = splitter.split_text(text)
-    # Wrap each chunk in a Document object (required by LangChain)
-    all_chunks.extend([Document(page_content=chunk) for chunk in docs])
 
-# 3. Create embedding model using Ollama (must be running locally)
-embedding_model = OllamaEmbeddings(model="nomic-embed-text")
-
-# 4. Create and store in Chroma vector DB
-vectorstore = Chroma.from_documents(
-    documents=all_chunks,
-    embedding=embedding_model,
-    persist_directory="chromadb"
-)
-
-# Save to disk
-vectorstore.persist()
-
-print("✅ Embeddings generated and stored in ChromaDB!")
-for text in texts:
-    docs = splitter.split_text(text)
-    all_chunks.extend([Document(page_content=chunk) for chunk in docs])
-    print(f"📄 Split document into {len(docs)} chunks")
-    for i, chunk in enumerate(docs[:3]):  # Just show first 3 chunks
-        print(f"\n🔹 Chunk {i+1}:\n{chunk[:300]}...\n")
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    ingest_patents(str(BASE_DIR / "data"), str(BASE_DIR / "chromadb"))
+    print("✅ Embeddings generated and stored in ChromaDB!")
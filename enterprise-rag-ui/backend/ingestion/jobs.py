@@ -0,0 +1,147 @@
+"""
+Background Ingestion Jobs
+
+Uploads enqueue an ingestion job instead of parsing and embedding inside the
+HTTP request. Jobs run on a bounded worker pool and only one ingestion run
+touches the vector store at a time. Because ingestion is incremental, a single
+run picks up every file that changed, so uploads arriving while a job is still
+queued are coalesced into that job rather than scheduling another run.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+from ingestion.patent_ingestion import IngestionProgress, ingest_patents
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("completed", "completed_with_errors", "failed")
+
+
+class IngestionJob(IngestionProgress):
+    """State and progress counters of one background ingestion run"""
+
+    def __init__(self, filenames: List[str]):
+        self.id = uuid.uuid4().hex
+        self.filenames = list(filenames)
+        self.status = "queued"  # queued, running, completed, completed_with_errors, failed
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.files_parsed = 0
+        self.chunks_embedded = 0
+        self.errors: List[Dict[str, str]] = []
+        self._lock = threading.Lock()
+
+    def add_file(self, filename: str) -> None:
+        """Attach another uploaded file to this (still queued) job"""
+        with self._lock:
+            if filename not in self.filenames:
+                self.filenames.append(filename)
+
+    def on_file_parsed(self, filename: str) -> None:
+        with self._lock:
+            self.files_parsed += 1
+
+    def on_chunks_embedded(self, filename: str, count: int) -> None:
+        with self._lock:
+            self.chunks_embedded += count
+
+    def on_file_failed(self, filename: str, error: str) -> None:
+        with self._lock:
+            self.errors.append({"filename": filename, "error": error})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert job state to a JSON-serializable dictionary"""
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "filenames": list(self.filenames),
+                "files_parsed": self.files_parsed,
+                "chunks_embedded": self.chunks_embedded,
+                "elapsed_seconds": round(elapsed, 3),
+                "chunks_per_second": round(self.chunks_embedded / elapsed, 2) if elapsed else 0.0,
+                "errors": list(self.errors),
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class IngestionJobQueue:
+    """Bounded background queue that runs incremental ingestion jobs"""
+
+    def __init__(self, data_dir: str, db_dir: str, max_workers: int = 1,
+                 max_history: int = 100, ingest_fn: Callable = ingest_patents):
+        self.data_dir = data_dir
+        self.db_dir = db_dir
+        self.max_history = max_history
+        self._ingest_fn = ingest_fn
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="ingest")
+        self._lock = threading.Lock()
+        # Only one ingestion run may write to the vector store and manifest at a time
+        self._ingest_lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._pending: Optional[IngestionJob] = None
+
+    def submit(self, filename: str) -> IngestionJob:
+        """Enqueue ingestion of an uploaded file, joining the queued job if there is one"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.add_file(filename)
+                return self._pending
+
+            job = IngestionJob([filename])
+            self._jobs[job.id] = job
+            self._pending = job
+            self._prune()
+
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Look up a job by ID"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond max_history"""
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.status in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: IngestionJob) -> None:
+        with self._ingest_lock:
+            # From here on, new uploads must start a fresh job: this run may
+            # already have scanned past them
+            with self._lock:
+                if self._pending is job:
+                    self._pending = None
+            job.status = "running"
+            job.started_at = time.time()
+            logger.info(f"Starting ingestion job {job.id} for {job.filenames}")
+
+            try:
+                self._ingest_fn(self.data_dir, self.db_dir, progress=job)
+                # Files that failed to parse or embed are reported, but do not fail the others
+                job.status = "completed_with_errors" if job.errors else "completed"
+            except Exception as e:
+                logger.error(f"Ingestion job {job.id} failed: {str(e)}")
+                job.on_file_failed("", str(e))
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting jobs and optionally wait for running ones"""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,113 @@
+"""
+Document Loaders
+
+One text extractor per file type, registered by file extension, so ingestion,
+uploads and the document listing all agree on which formats are supported.
+Each loader takes a path and returns the document's plain text:
+
+- TXT of MMAP_MIN_BYTES or more is memory-mapped and decoded straight from
+  the mapping, without first reading the file into a bytes object; smaller
+  files are cheaper to read() than to map.
+- DOCX is a zip archive; word/document.xml is streamed out of it and parsed
+  incrementally, keeping only the text of each paragraph as it completes.
+- PDF is read page by page with PyMuPDF.
+
+Loaders are plain functions with no state, so they can run in worker
+processes. Register another format with @register_loader(".ext").
+"""
+
+import mmap
+import os
+import xml.etree.ElementTree as ET
+import zipfile
+from typing import Callable, Dict, List
+
+import fitz  # PyMuPDF
+
+Loader = Callable[[str], str]
+
+# Below this size, setting up a mapping costs more than the copy it saves
+MMAP_MIN_BYTES = 1 << 20
+
+LOADERS: Dict[str, Loader] = {}
+
+
+def register_loader(*extensions: str) -> Callable[[Loader], Loader]:
+    """Register a loader for the given lowercase file extensions (with the dot)"""
+    def register(loader: Loader) -> Loader:
+        for extension in extensions:
+            LOADERS[extension] = loader
+        return loader
+    return register
+
+
+def supported_extensions() -> List[str]:
+    """Extensions with a registered loader, e.g. [".docx", ".pdf", ".txt"]"""
+    return sorted(LOADERS)
+
+
+def get_loader(path: str) -> Loader:
+    """Return the loader for a file, raising ValueError for unsupported types"""
+    extension = os.path.splitext(path)[1].lower()
+    loader = LOADERS.get(extension)
+    if loader is None:
+        raise ValueError(f"Unsupported file type: {extension or path}")
+    return loader
+
+
+def load_text(path: str) -> str:
+    """Extract the plain text of a supported document"""
+    return get_loader(path)(path)
+
+
+@register_loader(".txt")
+def load_txt(path: str) -> str:
+    """Decode a text file, straight from a memory mapping of it when it is large"""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0 or size < MMAP_MIN_BYTES:  # an empty file cannot be mapped
+            text = f.read().decode("utf-8", "replace")
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                text = str(mapped, "utf-8", "replace")
+    # Unify line endings with the other loaders
+    return text.replace("\r\n", "\n") if "\r" in text else text
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+@register_loader(".docx")
+def load_docx(path: str) -> str:
+    """Stream the paragraphs out of a DOCX file's document.xml, one per blank-line-separated block"""
+    paragraphs = []
+    # Paragraphs nest (e.g. inside text boxes), so each open one collects its own runs
+    open_paragraphs: List[List[str]] = []
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+        for event, element in ET.iterparse(xml, events=("start", "end")):
+            tag = element.tag
+            if event == "start":
+                if tag == f"{_W}p":
+                    open_paragraphs.append([])
+                continue
+            if tag == f"{_W}p":
+                text = "".join(open_paragraphs.pop()).strip()
+                if text:
+                    paragraphs.append(text)
+                # Drop the finished paragraph's tree; memory stays at one paragraph
+                element.clear()
+            elif open_paragraphs:
+                if tag == f"{_W}t":
+                    open_paragraphs[-1].append(element.text or "")
+                elif tag == f"{_W}tab":
+                    open_paragraphs[-1].append("\t")
+                elif tag in (f"{_W}br", f"{_W}cr"):
+                    open_paragraphs[-1].append("\n")
+    return "\n\n".join(paragraphs)
+
+
+@register_loader(".pdf")
+def load_pdf(path: str) -> str:
+    """Extract the text of a PDF page by page and join it once"""
+    with fitz.open(path) as doc:
+        return "".join([page.get_text() for page in doc])
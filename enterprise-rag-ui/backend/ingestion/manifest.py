@@ -0,0 +1,197 @@
+"""
+Ingestion Manifest
+
+Tracks which patent files have already been embedded so that ingestion only
+has to parse, chunk and embed files that were added or changed. Each entry is
+keyed by file name and records the file's SHA-256, the chunker settings it was
+embedded with, and the stable IDs of the chunks written to the vector store.
+Patents imported from a bulk dump are keyed by "<dump>#<patent number>" and
+record the dump they came from instead of a file size and mtime.
+
+Entries live in a SQLite table, so a checkpoint commits only the entries
+recorded since the previous one, and the manifest is never held in memory
+as a whole. Changes become durable on save(); an interrupted run loses only
+what it recorded after the last save.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "ingest_manifest.sqlite3"
+# Manifests written before entries moved to SQLite; imported once, then renamed
+LEGACY_MANIFEST_FILENAME = "ingest_manifest.json"
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """Compute the SHA-256 of a file without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_chunk_id(filename: str, sha256: str, settings_key: str, index: int) -> str:
+    """Build a stable vector ID for the index-th chunk of a file version"""
+    source = hashlib.sha256(f"{filename}|{sha256}|{settings_key}".encode("utf-8")).hexdigest()
+    return f"{source[:24]}-{index:05d}"
+
+
+_COLUMNS = "name, sha256, settings, size, mtime_ns, source, chunk_ids"
+
+
+def _entry(row) -> Dict:
+    name, sha256, settings, size, mtime_ns, source, chunk_ids = row
+    entry = {"sha256": sha256, "settings": settings, "chunk_ids": json.loads(chunk_ids)}
+    if source is not None:
+        entry["source"] = source
+    else:
+        entry["size"] = size
+        entry["mtime_ns"] = mtime_ns
+    return entry
+
+
+class IngestionManifest:
+    """Persistent record of ingested files, stored in SQLite next to the vector store"""
+
+    def __init__(self, db_dir: str, settings_key: str):
+        self.path = Path(db_dir) / MANIFEST_FILENAME
+        self.settings_key = settings_key
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                name TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER,
+                source TEXT,
+                chunk_ids TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS files_by_source ON files (source);
+            """
+        )
+        self._conn.commit()
+        self._import_legacy(Path(db_dir) / LEGACY_MANIFEST_FILENAME)
+
+    def _import_legacy(self, legacy_path: Path) -> None:
+        """Move the entries of a JSON manifest into the table, once"""
+        if not legacy_path.exists():
+            return
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                entries = json.load(f).get("files", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {legacy_path}: {str(e)}")
+            entries = {}
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO files ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(name, e["sha256"], e["settings"], e.get("size"), e.get("mtime_ns"), e.get("source"),
+                  json.dumps(e["chunk_ids"])) for name, e in entries.items()]
+            )
+        os.replace(legacy_path, legacy_path.with_suffix(".json.imported"))
+        logger.info(f"Imported {len(entries)} entries from {legacy_path}")
+
+    def save(self) -> None:
+        """Commit the entries recorded or forgotten since the last save"""
+        with self._lock:
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Discard uncommitted changes and close the database"""
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def count(self, source: str) -> int:
+        """Number of documents recorded from a source file, such as a bulk dump"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files WHERE source = ?", (source,)).fetchone()[0]
+
+    def get(self, filename: str) -> Optional[Dict]:
+        """Return the entry for a file, if it has been ingested"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_COLUMNS} FROM files WHERE name = ?", (filename,)).fetchone()
+        return _entry(row) if row else None
+
+    def file_entries(self) -> Iterator[Tuple[str, int, int, str]]:
+        """Yield (name, size, mtime_ns, sha256) for every ingested file (not dump documents)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, size, mtime_ns, sha256 FROM files WHERE source IS NULL AND size IS NOT NULL"
+            ).fetchall()
+        return iter(rows)
+
+    def fingerprint(self, file_path: Path) -> str:
+        """Return the file's SHA-256, reusing the stored hash when size and mtime are unchanged"""
+        stat = file_path.stat()
+        entry = self.get(file_path.name)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return entry["sha256"]
+        return file_sha256(str(file_path))
+
+    def is_current(self, filename: str, sha256: str) -> bool:
+        """Check whether a file version is already embedded with the current settings"""
+        with self._lock:
+            row = self._conn.execute("SELECT sha256, settings FROM files WHERE name = ?", (filename,)).fetchone()
+        return row is not None and row[0] == sha256 and row[1] == self.settings_key
+
+    def diff(self, files: Dict[str, str]) -> Tuple[List[str], List[str]]:
+        """Compare {filename: sha256} against the manifest, returning (changed, removed)"""
+        changed = [name for name, sha in sorted(files.items()) if not self.is_current(name, sha)]
+        # Patents imported from a dump have no file of their own in the data directory
+        with self._lock:
+            names = self._conn.execute("SELECT name FROM files WHERE source IS NULL ORDER BY name").fetchall()
+        removed = [name for (name,) in names if name not in files]
+        return changed, removed
+
+    def chunk_ids(self, filename: str) -> List[str]:
+        """Return the vector IDs recorded for a file, if any"""
+        entry = self.get(filename)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def record(self, file_path: Path, sha256: str, chunk_ids: List[str]) -> None:
+        """Record that a file version has been embedded under the given chunk IDs"""
+        stat = file_path.stat()
+        self._put(file_path.name, sha256, stat.st_size, stat.st_mtime_ns, None, chunk_ids)
+
+    def record_document(self, name: str, sha256: str, chunk_ids: List[str], source: str) -> None:
+        """Record a document that came out of a larger source file, such as a bulk dump"""
+        self._put(name, sha256, None, None, source, chunk_ids)
+
+    def _put(self, name: str, sha256: str, size: Optional[int], mtime_ns: Optional[int],
+             source: Optional[str], chunk_ids: List[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO files ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, sha256, self.settings_key, size, mtime_ns, source, json.dumps(chunk_ids))
+            )
+
+    def forget(self, filename: str) -> Optional[Dict]:
+        """Drop a file from the manifest"""
+        entry = self.get(filename)
+        if entry is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM files WHERE name = ?", (filename,))
+        return entry
+
+    def clear(self) -> None:
+        """Drop all entries, e.g. before a full rebuild"""
+        with self._lock:
+            self._conn.execute("DELETE FROM files")
@@ -0,0 +1,134 @@
+"""
+Patent Metadata Store
+
+A small SQLite database kept next to the Chroma store that maps each ingested
+patent to its title, abstract, claims and the IDs of its chunks. This lets
+/analyze-patent fetch a patent's own content directly by patent number, with
+no embedding call and no similarity search.
+
+Each chunk ID is stored with the section it came from (abstract, claim or
+description), so an analysis can pick the description chunks rather than
+repeat the abstract and claims it already has.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+METADATA_DB_FILENAME = "patents.sqlite3"
+
+
+def normalize_patent_number(patent_number: str) -> str:
+    """Normalize user input such as "us 11,391,262" to "US11391262" """
+    normalized = re.sub(r"[^A-Za-z0-9]", "", patent_number or "").upper()
+    # Bare numbers are assumed to be US patents
+    if normalized.isdigit():
+        normalized = f"US{normalized}"
+    return normalized
+
+
+class PatentMetadataStore:
+    """Indexed lookup of patent metadata and chunk IDs by patent number or filename"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS patents (
+                filename TEXT PRIMARY KEY,
+                patent_number TEXT,
+                title TEXT,
+                abstract TEXT,
+                claims TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS patents_by_number ON patents (patent_number);
+            CREATE TABLE IF NOT EXISTS patent_chunks (
+                chunk_id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                section TEXT
+            );
+            CREATE INDEX IF NOT EXISTS chunks_by_filename ON patent_chunks (filename, position);
+            """
+        )
+        # Stores created before chunks recorded their section
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(patent_chunks)")}
+        if "section" not in columns:
+            self._conn.execute("ALTER TABLE patent_chunks ADD COLUMN section TEXT")
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM patents").fetchone()[0]
+
+    def upsert(self, filename: str, patent_number: Optional[str], title: str,
+               abstract: str, claims: List[str], chunk_ids: List[str],
+               sections: Optional[List[Optional[str]]] = None) -> None:
+        """Record (or replace) a patent and its chunk IDs, with the section of each chunk"""
+        number = normalize_patent_number(patent_number) if patent_number else None
+        sections = list(sections or [])
+        sections += [None] * (len(chunk_ids) - len(sections))
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM patent_chunks WHERE filename = ?", (filename,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO patents (filename, patent_number, title, abstract, claims)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (filename, number, title, abstract, json.dumps(claims))
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO patent_chunks (chunk_id, filename, position, section)"
+                " VALUES (?, ?, ?, ?)",
+                [(chunk_id, filename, position, section)
+                 for position, (chunk_id, section) in enumerate(zip(chunk_ids, sections))]
+            )
+
+    def remove(self, filename: str) -> None:
+        """Forget a patent file"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM patent_chunks WHERE filename = ?", (filename,))
+            self._conn.execute("DELETE FROM patents WHERE filename = ?", (filename,))
+
+    def clear(self) -> None:
+        """Forget every patent, e.g. before a full rebuild"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM patent_chunks")
+            self._conn.execute("DELETE FROM patents")
+
+    def get(self, patent_number: str) -> Optional[Dict[str, Any]]:
+        """Look up a patent by number, returning its metadata, claims and ordered chunk IDs and sections"""
+        number = normalize_patent_number(patent_number)
+        if not number:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename, patent_number, title, abstract, claims FROM patents"
+                " WHERE patent_number = ? ORDER BY filename LIMIT 1",
+                (number,)
+            ).fetchone()
+            if row is None:
+                return None
+            chunks = self._conn.execute(
+                "SELECT chunk_id, section FROM patent_chunks WHERE filename = ? ORDER BY position",
+                (row[0],)
+            ).fetchall()
+        return {
+            "filename": row[0],
+            "patent_number": row[1],
+            "title": row[2],
+            "abstract": row[3],
+            "claims": json.loads(row[4]),
+            "chunk_ids": [chunk_id for chunk_id, _ in chunks],
+            # None for chunks ingested before sections were recorded
+            "chunk_sections": [section for _, section in chunks],
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -6,25 +6,51 @@ It handles parsing, extraction, and indexing of patent documents from various fo
 """
 
 import os
-import fitz  # PyMuPDF
+import sys
 from pathlib import Path
 import re
-from typing import List, Dict, Any, Optional
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import List, Dict, Any, Callable, Optional, Iterable, Iterator, Tuple
 import logging
+import time
+
+if __name__ == "__main__":
+    # Run as a script (python backend/ingestion/patent_ingestion.py):
+    # import the backend modules the way the backend does
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain.docstore.document import Document
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+from embeddings.cache import (CACHE_FILENAME, DEFAULT_BATCH_SIZE, DEFAULT_CONCURRENCY,
+                              CachedEmbeddings, EmbeddingCache)
+from ingestion.loaders import load_text, supported_extensions
+from ingestion.manifest import IngestionManifest, make_chunk_id
+from llm.context import estimate_tokens
+from metrics import observe_stage, timed
+from ingestion.metadata_store import METADATA_DB_FILENAME, PatentMetadataStore
+from ingestion.pipeline import DEFAULT_QUEUE_SIZE, Stage, run_pipeline
+from retriever.bm25 import INDEX_FILENAME as KEYWORD_INDEX_FILENAME, BM25Journal
+from retriever.mmap_index import VECTOR_BACKEND, export_from_chroma, index_path
+
 logger = logging.getLogger(__name__)
 
+# Documents waiting between pipeline stages; bounds ingestion memory
+QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", str(DEFAULT_QUEUE_SIZE)))
+# Threads embedding documents in parallel (each sends its own batches to Ollama)
+EMBED_WORKERS = int(os.environ.get("INGEST_EMBED_WORKERS", "1"))
+# Documents committed between saves of the manifest and keyword index
+CHECKPOINT_FILES = int(os.environ.get("INGEST_CHECKPOINT_FILES", "50"))
+
 class PatentMetadata:
     """Class to store and extract patent metadata"""
     
+    # Section patterns, shared with the structural chunker
+    ABSTRACT_PATTERN = re.compile(r'Abstract[:\s]+(.+?)(?=\n\n|\n[A-Z]+:)', re.DOTALL)
+    CLAIMS_PATTERN = re.compile(r'Claims[:\s]+(.*?)(?=\n\n[A-Z]+:|\Z)', re.DOTALL)
+    
     def __init__(self, text: str, filename: str):
         self.text = text
         self.filename = filename
@@ -52,14 +78,14 @@ class PatentMetadata:
         
     def _extract_abstract(self) -> str:
         """Extract abstract from text"""
-        abstract_match = re.search(r'Abstract[:\s]+(.+?)(?=\n\n|\n[A-Z]+:)', self.text, re.DOTALL)
+        abstract_match = self.ABSTRACT_PATTERN.search(self.text)
         if abstract_match:
             return abstract_match.group(1).strip()
         return ""
         
     def _extract_claims(self) -> List[str]:
         """Extract claims from text"""
-        claims_section = re.search(r'Claims[:\s]+(.*?)(?=\n\n[A-Z]+:|\Z)', self.text, re.DOTALL)
+        claims_section = self.CLAIMS_PATTERN.search(self.text)
         if not claims_section:
             return []
             
@@ -79,53 +105,186 @@ class PatentMetadata:
         }
 
 
+class PatentStructureChunker:
+    """Split patents along their structure instead of at fixed character offsets
+    
+    Emits one chunk for the abstract, one chunk per claim, and the remaining
+    description paragraphs packed into chunks of at most chunk_tokens. Every
+    chunk is tagged with its section ("abstract", "claim" or "description")
+    and claims with their claim number. Chunks do not overlap.
+    """
+    
+    def __init__(self, chunk_tokens: int = 256):
+        self.chunk_tokens = chunk_tokens
+    
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """Split documents into structural chunks (same interface as LangChain text splitters)"""
+        chunks = []
+        for document in documents:
+            chunks.extend(self._split_document(document))
+        return chunks
+    
+    def _split_document(self, document: Document) -> List[Document]:
+        text = document.page_content
+        metadata = PatentMetadata(text, document.metadata.get("filename", ""))
+        chunks = []
+        
+        def add(content: str, section: str, **extra) -> None:
+            chunks.append(Document(
+                page_content=content,
+                metadata={**document.metadata, "section": section, **extra}
+            ))
+        
+        # Cut the abstract and claims out of the text; what remains is description
+        description = text
+        for pattern in (PatentMetadata.CLAIMS_PATTERN, PatentMetadata.ABSTRACT_PATTERN):
+            match = pattern.search(description)
+            if match:
+                description = description[:match.start()] + "\n\n" + description[match.end():]
+        
+        if metadata.abstract:
+            add(f"Abstract: {metadata.abstract}", "abstract")
+        
+        for number, claim in enumerate(metadata.claims, start=1):
+            # Claims are kept whole unless a single claim blows far past the budget
+            if estimate_tokens(claim) <= 2 * self.chunk_tokens:
+                add(f"Claim {number}. {claim}", "claim", claim_number=number)
+            else:
+                for part in self._pack(self._sentences(claim)):
+                    add(f"Claim {number}. {part}", "claim", claim_number=number)
+        
+        paragraphs = [p.strip() for p in re.split(r'\n\s*\n', description) if p.strip()]
+        for part in self._pack(paragraphs):
+            add(part, "description")
+        return chunks
+    
+    @staticmethod
+    def _sentences(text: str) -> List[str]:
+        return [s for s in re.split(r'(?<=[.;!?])\s+', text) if s]
+    
+    def _pack(self, units: List[str]) -> List[str]:
+        """Greedily pack paragraphs (or sentences) into chunks within the token budget"""
+        packed, current, current_tokens = [], [], 0
+        for unit in units:
+            tokens = estimate_tokens(unit)
+            if tokens > self.chunk_tokens:
+                # Oversized paragraph: fall back to sentences, then to words
+                pieces = self._sentences(unit)
+                if len(pieces) == 1:
+                    words = unit.split()
+                    step = max(1, self.chunk_tokens * 3 // 4)  # ~0.75 words per token
+                    pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+                if len(pieces) > 1:
+                    if current:
+                        packed.append("\n\n".join(current))
+                        current, current_tokens = [], 0
+                    packed.extend(self._pack(pieces))
+                    continue
+            if current and current_tokens + tokens > self.chunk_tokens:
+                packed.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(unit)
+            current_tokens += tokens
+        if current:
+            packed.append("\n\n".join(current))
+        return packed
+
+
+class IngestionProgress:
+    """Receives progress events from an ingestion run; the default implementation ignores them"""
+    
+    def on_file_parsed(self, filename: str) -> None:
+        pass
+    
+    def on_chunks_embedded(self, filename: str, count: int) -> None:
+        pass
+    
+    def on_file_failed(self, filename: str, error: str) -> None:
+        pass
+
+
+def extract_document(file_path: str) -> Tuple[str, Dict[str, Any]]:
+    """Extract the text and metadata of a patent document with the loader for its file type
+    
+    Module-level (and returning plain data) so it can run in worker processes.
+    """
+    logger.info(f"Processing document: {file_path}")
+    filename = Path(file_path).name
+    
+    try:
+        text = load_text(file_path)
+        
+        # Create metadata
+        metadata = PatentMetadata(text, filename).to_dict()
+        metadata["file_type"] = Path(file_path).suffix.lower().lstrip(".")
+        return text, metadata
+    
+    except Exception as e:
+        logger.error(f"Error processing document {file_path}: {str(e)}")
+        # Return empty text with error metadata
+        return "", {"error": str(e), "filename": filename}
+
+
+def _extract_document_timed(file_path: str) -> Tuple[str, Dict[str, Any], float]:
+    """extract_document plus its duration, so parse times from worker processes reach the metrics"""
+    start = time.perf_counter()
+    text, metadata = extract_document(file_path)
+    return text, metadata, time.perf_counter() - start
+
+
 class PatentDocumentProcessor:
     """Process patent documents and extract text and metadata"""
     
-    def __init__(self, data_dir: str):
+    def __init__(self, data_dir: str, workers: int = 1):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
+        self.workers = max(1, workers)
         
-    def process_pdf(self, file_path: str) -> Document:
-        """Process a PDF file and extract text and metadata"""
-        logger.info(f"Processing PDF: {file_path}")
+    def process_file(self, file_path: str) -> Document:
+        """Process a patent document of any supported type and extract text and metadata"""
+        text, metadata = extract_document(file_path)
+        return Document(page_content=text, metadata=metadata)
+    
+    def patent_files(self) -> List[Path]:
+        """List the patent files in the data directory that can be ingested"""
+        extensions = set(supported_extensions())
+        return sorted(path for path in self.data_dir.iterdir()
+                      if path.is_file() and path.suffix.lower() in extensions)
+    
+    def iter_documents(self, files: Optional[Iterable[Path]] = None) -> Iterator[Document]:
+        """Yield a Document per file as soon as its extraction finishes
         
-        try:
-            # Open the PDF
-            doc = fitz.open(file_path)
-            text = ""
-            
-            # Extract text from all pages
-            for page in doc:
-                text += page.get_text()
-                
-            # Create metadata
-            filename = Path(file_path).name
-            metadata = PatentMetadata(text, filename)
-            
-            # Create Document object
-            return Document(
-                page_content=text,
-                metadata=metadata.to_dict()
-            )
-            
-        except Exception as e:
-            logger.error(f"Error processing PDF {file_path}: {str(e)}")
-            # Return empty document with error metadata
-            return Document(
-                page_content="",
-                metadata={"error": str(e), "filename": Path(file_path).name}
-            )
+        With more than one worker, files are parsed in a process pool and results
+        arrive in completion order. At most a few files per worker are in flight,
+        so memory stays bounded however many files are passed in. Documents that
+        failed to parse are yielded with empty content and an "error" metadata key.
+        """
+        files = self.patent_files() if files is None else list(files)
+        
+        if self.workers == 1 or len(files) <= 1:
+            for file_path in files:
+                with timed("parse"):
+                    doc = self.process_file(str(file_path))
+                yield doc
+            return
+        
+        pending = iter(files)
+        max_in_flight = self.workers * 4
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = {executor.submit(_extract_document_timed, str(f)) for f in islice(pending, max_in_flight)}
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    text, metadata, seconds = future.result()
+                    observe_stage("parse", seconds)
+                    yield Document(page_content=text, metadata=metadata)
+                for file_path in islice(pending, len(done)):
+                    in_flight.add(executor.submit(_extract_document_timed, str(file_path)))
     
     def process_directory(self) -> List[Document]:
         """Process all patent documents in the data directory"""
-        documents = []
-        
-        # Process PDF files
-        for pdf_file in self.data_dir.glob("*.pdf"):
-            doc = self.process_pdf(str(pdf_file))
-            if doc.page_content:  # Only add if content was extracted
-                documents.append(doc)
+        # Only keep documents whose content was extracted
+        documents = [doc for doc in self.iter_documents() if doc.page_content]
                 
         logger.info(f"Processed {len(documents)} patent documents")
         return documents
@@ -134,56 +293,280 @@ class PatentDocumentProcessor:
 class PatentVectorizer:
     """Convert patent documents to vector embeddings and store in vector database"""
     
-    def __init__(self, embedding_model_name: str = "nomic-embed-text"):
+    def __init__(self, embedding_model_name: str = "nomic-embed-text",
+                 chunk_tokens: int = 256,
+                 cache_path: Optional[str] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 concurrency: int = DEFAULT_CONCURRENCY):
+        self.embedding_model_name = embedding_model_name
         self.embedding_model = OllamaEmbeddings(model=embedding_model_name)
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=100
+        if cache_path:
+            # Embed in concurrent batches and never re-embed text seen before
+            self.embedding_model = CachedEmbeddings(
+                self.embedding_model,
+                embedding_model_name,
+                EmbeddingCache(cache_path),
+                batch_size=batch_size,
+                concurrency=concurrency
+            )
+        self.chunk_tokens = chunk_tokens
+        self.text_splitter = PatentStructureChunker(chunk_tokens=chunk_tokens)
+    
+    @property
+    def settings_key(self) -> str:
+        """Identify the embedding model and chunker settings; changing them invalidates stored chunks"""
+        return f"{self.embedding_model_name}:structure:{self.chunk_tokens}"
+    
+    def open_vectorstore(self, persist_directory: str) -> Chroma:
+        """Open (or create) the persistent vector database"""
+        return Chroma(
+            persist_directory=persist_directory,
+            embedding_function=self.embedding_model
         )
-        
-    def vectorize(self, documents: List[Document], persist_directory: str) -> Chroma:
-        """Split documents into chunks, create embeddings, and store in vector database"""
-        if not documents:
-            logger.warning("No documents to vectorize")
-            return None
+    
+    def chunk(self, document: Document, sha256: str) -> List[Document]:
+        """Split a single document into chunks carrying stable chunk IDs"""
+        with timed("chunk"):
+            chunks = self.text_splitter.split_documents([document])
+        filename = document.metadata.get("filename", "")
+        for i, chunk in enumerate(chunks):
+            chunk.metadata["chunk_id"] = make_chunk_id(filename, sha256, self.settings_key, i)
+            chunk.metadata["sha256"] = sha256
+        return chunks
+    
+    def embed(self, chunks: List[Document]) -> List[List[float]]:
+        """Embed the chunks of a document"""
+        if not chunks:
+            return []
+        with timed("embed"):
+            return self.embedding_model.embed_documents([chunk.page_content for chunk in chunks])
+    
+    def upsert(self, vectorstore: Chroma, chunks: List[Document], vectors: List[List[float]],
+               keyword_index: Optional[BM25Journal] = None) -> List[str]:
+        """Write embedded chunks to the vector store (and keyword index) under their chunk IDs"""
+        ids = [chunk.metadata["chunk_id"] for chunk in chunks]
+        if chunks:
+            with timed("upsert"):
+                vectorstore._collection.upsert(
+                    ids=ids,
+                    embeddings=vectors,
+                    documents=[chunk.page_content for chunk in chunks],
+                    metadatas=[chunk.metadata for chunk in chunks]
+                )
+        if keyword_index is not None:
+            for chunk, chunk_id in zip(chunks, ids):
+                keyword_index.add(chunk_id, chunk.page_content)
+        return ids
+    
+    def add_document(self, vectorstore: Chroma, document: Document, sha256: str,
+                     keyword_index: Optional[BM25Journal] = None) -> List[str]:
+        """Split a single document into chunks and upsert them under stable chunk IDs"""
+        chunks = self.chunk(document, sha256)
+        return self.upsert(vectorstore, chunks, self.embed(chunks), keyword_index)
+
+
+class _Work:
+    """A document on its way through the ingestion stages"""
+    
+    def __init__(self, document: Document, sha256: str):
+        self.document = document
+        self.sha256 = sha256
+        self.chunks: List[Document] = []
+        self.vectors: List[List[float]] = []
+
+
+def stream_documents(documents: Iterable[Document], vectorizer: PatentVectorizer, vectorstore: Chroma,
+                     keyword_index: BM25Journal,
+                     manifest: IngestionManifest, metadata_store: PatentMetadataStore,
+                     progress: IngestionProgress,
+                     sha256_of: Callable[[Document], str],
+                     record: Callable[[Document, str, List[str]], None],
+                     checkpoint_every: int = CHECKPOINT_FILES,
+                     queue_size: int = QUEUE_SIZE,
+                     embed_workers: int = EMBED_WORKERS) -> int:
+    """Chunk, embed and commit documents as a bounded pipeline, returning the number of chunks written
+    
+    Extraction (the documents iterator), chunking and embedding overlap, with at
+    most queue_size documents waiting between stages. This thread is the only
+    writer: it upserts each document's chunks, records it with record(), and
+    every checkpoint_every documents appends the keyword index changes to its
+    journal and commits the manifest. Only those documents are held between
+    checkpoints, so memory does not grow with the number of documents. A
+    re-run after an interrupt skips every document recorded by the last
+    checkpoint.
+    """
+    def chunk(work: _Work) -> _Work:
+        name = work.document.metadata["filename"]
+        if not work.document.page_content:
+            raise ValueError(work.document.metadata.get("error", "No text could be extracted"))
+        progress.on_file_parsed(name)
+        work.chunks = vectorizer.chunk(work.document, work.sha256)
+        return work
+    
+    def embed(work: _Work) -> _Work:
+        work.vectors = vectorizer.embed(work.chunks)
+        return work
+    
+    def checkpoint() -> None:
+        # Keyword index first: a committed manifest entry is always fully indexed
+        keyword_index.flush()
+        manifest.save()
+    
+    stages = [Stage("chunk", chunk), Stage("embed", embed, workers=embed_workers)]
+    source = (_Work(doc, sha256_of(doc)) for doc in documents)
+    total_chunks = 0
+    uncommitted = 0
+    try:
+        for work, failure in run_pipeline(source, stages, queue_size=queue_size):
+            if failure is not None:
+                name = failure.item.document.metadata["filename"]
+                logger.error(f"Error in {failure.stage} for {name}: {str(failure.error)}")
+                progress.on_file_failed(name, str(failure.error))
+                continue
+            doc = work.document
+            name = doc.metadata["filename"]
+            try:
+                chunk_ids = vectorizer.upsert(vectorstore, work.chunks, work.vectors, keyword_index)
+            except Exception as e:
+                logger.error(f"Error storing {name}: {str(e)}")
+                progress.on_file_failed(name, str(e))
+                continue
+            record(doc, work.sha256, chunk_ids)
             
-        # Split documents into chunks
-        logger.info(f"Splitting {len(documents)} documents into chunks")
-        chunks = self.text_splitter.split_documents(documents)
-        logger.info(f"Created {len(chunks)} chunks from {len(documents)} documents")
-        
-        # Create and persist the vector database
-        logger.info(f"Creating vector database in {persist_directory}")
-        vectorstore = Chroma.from_documents(
-            documents=chunks,
-            embedding=self.embedding_model,
-            persist_directory=persist_directory
-        )
-        
-        # Persist the database
-        vectorstore.persist()
-        logger.info(f"Vector database created with {len(chunks)} chunks")
-        
-        return vectorstore
+            # Index the patent's number, abstract and claims for direct lookup
+            metadata = PatentMetadata(doc.page_content, name)
+            metadata_store.upsert(name, metadata.patent_number, metadata.title,
+                                  metadata.abstract, metadata.claims, chunk_ids,
+                                  [chunk.metadata.get("section") for chunk in work.chunks])
+            progress.on_chunks_embedded(name, len(chunk_ids))
+            total_chunks += len(chunk_ids)
+            
+            uncommitted += 1
+            if uncommitted >= checkpoint_every:
+                checkpoint()
+                uncommitted = 0
+    finally:
+        # Also on an interrupt: everything upserted so far is kept
+        checkpoint()
+    return total_chunks
 
 
-def ingest_patents(data_dir: str, db_dir: str) -> None:
-    """Main function to ingest patent documents"""
-    logger.info(f"Starting patent document ingestion from {data_dir}")
+def backfill_metadata(processor: "PatentDocumentProcessor", vectorizer: "PatentVectorizer",
+                      manifest: IngestionManifest, metadata_store: PatentMetadataStore,
+                      paths: List[Path], hashes: Dict[str, str]) -> int:
+    """Record metadata for already-ingested patents from their text, without re-embedding them"""
+    backfilled = 0
+    for doc in processor.iter_documents(paths):
+        name = doc.metadata["filename"]
+        if not doc.page_content:
+            continue
+        chunk_ids = manifest.chunk_ids(name)
+        # Chunk IDs are deterministic, so re-chunking recovers each stored chunk's section
+        sections = {chunk.metadata["chunk_id"]: chunk.metadata.get("section")
+                    for chunk in vectorizer.chunk(doc, hashes[name])}
+        metadata = PatentMetadata(doc.page_content, name)
+        metadata_store.upsert(name, metadata.patent_number, metadata.title, metadata.abstract,
+                              metadata.claims, chunk_ids, [sections.get(chunk_id) for chunk_id in chunk_ids])
+        backfilled += 1
+    if backfilled:
+        logger.info(f"Recorded metadata for {backfilled} already ingested patent documents")
+    return backfilled
+
+
+def refresh_vector_index(vectorstore: Chroma, db_dir: str) -> None:
+    """Re-export the memory-mapped index when it is in use; searches reopen it on their next query
+
+    An empty collection is exported too, so an index left over from before
+    every chunk was deleted does not keep serving them.
+    """
+    if VECTOR_BACKEND == "mmap" or os.path.isdir(index_path(db_dir)):
+        with timed("export_index"):
+            index = export_from_chroma(vectorstore, index_path(db_dir))
+        logger.info(f"Exported {len(index)} vectors to the memory-mapped index")
+
+
+def ingest_patents(data_dir: str, db_dir: str, rebuild: bool = False,
+                   progress: Optional[IngestionProgress] = None,
+                   workers: int = 1) -> Optional[Chroma]:
+    """Main function to ingest patent documents
     
-    # Process documents
-    processor = PatentDocumentProcessor(data_dir)
-    documents = processor.process_directory()
+    Only files that are new or whose content (or the chunker settings) changed
+    since the last run are parsed and embedded. Vectors belonging to removed or
+    replaced files are deleted by their recorded chunk IDs. Progress is
+    checkpointed as files are committed, so an interrupted run picks up after
+    the last checkpoint.
+    """
+    logger.info(f"Starting patent document ingestion from {data_dir}")
+    progress = progress or IngestionProgress()
     
-    if not documents:
-        logger.warning("No documents were processed successfully")
-        return
+    processor = PatentDocumentProcessor(data_dir, workers=workers)
+    vectorizer = PatentVectorizer(cache_path=os.path.join(db_dir, CACHE_FILENAME))
+    manifest = IngestionManifest(db_dir, vectorizer.settings_key)
+    vectorstore = vectorizer.open_vectorstore(db_dir)
+    keyword_index = BM25Journal(os.path.join(db_dir, KEYWORD_INDEX_FILENAME))
+    metadata_store = PatentMetadataStore(os.path.join(db_dir, METADATA_DB_FILENAME))
     
-    # Vectorize documents
-    vectorizer = PatentVectorizer()
-    vectorstore = vectorizer.vectorize(documents, db_dir)
+    try:
+        if rebuild:
+            logger.info("Rebuilding vector database from scratch")
+            vectorstore.delete_collection()
+            vectorstore = vectorizer.open_vectorstore(db_dir)
+            manifest.clear()
+            keyword_index.clear()
+            metadata_store.clear()
+            # Commit the reset now: there may be nothing left to re-ingest
+            manifest.save()
+        
+        # Work out which files need (re-)embedding
+        files = {path.name: path for path in processor.patent_files()}
+        hashes = {name: manifest.fingerprint(path) for name, path in files.items()}
+        changed, removed = manifest.diff(hashes)
+        
+        # Stores ingested before the metadata store existed (or whose store was
+        # deleted) have no rows for patents that are otherwise up to date
+        if not len(metadata_store) and len(manifest):
+            pending = set(changed)
+            backfill_metadata(processor, vectorizer, manifest, metadata_store,
+                              [path for name, path in files.items() if name not in pending], hashes)
+        
+        if not changed and not removed:
+            logger.info("All patent documents are up to date")
+            if rebuild:
+                refresh_vector_index(vectorstore, db_dir)
+            return vectorstore
+        logger.info(f"{len(changed)} new or changed and {len(removed)} removed patent documents"
+                    f" ({len(files) - len(changed)} already ingested)")
+        
+        # Drop vectors of removed files and of the previous version of changed files
+        stale_ids = []
+        for name in removed + changed:
+            stale_ids.extend(manifest.chunk_ids(name))
+            manifest.forget(name)
+            metadata_store.remove(name)
+        if stale_ids:
+            vectorstore.delete(ids=stale_ids)
+            keyword_index.remove_many(stale_ids)
+            logger.info(f"Deleted {len(stale_ids)} stale chunks")
+        
+        # Persist the deletions before any new work, so an interrupted run resumes cleanly
+        keyword_index.flush()
+        manifest.save()
+        
+        # Parse, chunk and embed only what changed
+        documents = processor.iter_documents(files[name] for name in changed)
+        total_chunks = stream_documents(
+            documents, vectorizer, vectorstore, keyword_index,
+            manifest, metadata_store, progress,
+            sha256_of=lambda doc: hashes[doc.metadata["filename"]],
+            record=lambda doc, sha256, chunk_ids: manifest.record(files[doc.metadata["filename"]], sha256, chunk_ids)
+        )
+    finally:
+        metadata_store.close()
+        manifest.close()
+    keyword_index.compact()
     
-    logger.info("Patent document ingestion complete")
+    refresh_vector_index(vectorstore, db_dir)
+    logger.info(f"Patent document ingestion complete: embedded {total_chunks} chunks")
     return vectorstore
 
 
@@ -195,12 +578,20 @@ if __name__ == "__main__":
                         help="Directory containing patent documents")
     parser.add_argument("--db-dir", type=str, default="../chromadb",
                         help="Directory to store vector database")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Drop the vector database and re-embed every document")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of processes used to parse documents")
     args = parser.parse_args()
     
+    # Configure logging
+    logging.basicConfig(level=logging.INFO, 
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
     # Convert relative paths to absolute
     base_dir = Path(__file__).parent.parent.parent
     data_dir = str(base_dir / args.data_dir)
     db_dir = str(base_dir / args.db_dir)
     
     # Ingest patents
-    ingest_patents(data_dir, db_dir)
+    ingest_patents(data_dir, db_dir, rebuild=args.rebuild, workers=args.workers)
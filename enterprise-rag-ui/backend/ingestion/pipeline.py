@@ -0,0 +1,150 @@
+"""
+Streaming Ingestion Pipeline
+
+Runs ingestion as a chain of stages (for example chunk, then embed) joined by
+bounded queues. Each stage runs on its own worker threads; when a downstream
+stage falls behind, its input queue fills up and the stages before it block,
+so at most a few queue lengths of documents are in memory however large the
+corpus is. Results come out of the pipeline in the calling thread, which is
+where the single writer commits them.
+
+An item that fails in a stage is passed on as a failure instead of stopping
+the run, so one bad file does not cost the rest of the batch.
+"""
+
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_QUEUE_SIZE = 8
+
+_DONE = object()
+
+# How often blocked puts and gets wake up to check whether the run was stopped
+_POLL_SECONDS = 0.1
+
+
+class Stage:
+    """One pipeline step: fn maps an item to the next stage's item"""
+
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+
+
+class Failure:
+    """An item that raised in a stage, carried through to the consumer"""
+
+    def __init__(self, item: Any, stage: str, error: Exception):
+        self.item = item
+        self.stage = stage
+        self.error = error
+
+
+class _Stopped(Exception):
+    pass
+
+
+def run_pipeline(source: Iterable[Any], stages: List[Stage],
+                 queue_size: int = DEFAULT_QUEUE_SIZE) -> Iterator[Tuple[Any, Optional[Failure]]]:
+    """Feed source through the stages, yielding (result, None) or (None, Failure) as items finish
+
+    With more than one worker per stage, items may finish out of order.
+    Closing the returned generator stops every stage.
+    """
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+
+    def put(q: queue.Queue, item: Any) -> None:
+        while True:
+            if stop.is_set():
+                raise _Stopped()
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def get(q: queue.Queue) -> Any:
+        while True:
+            if stop.is_set():
+                raise _Stopped()
+            try:
+                return q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+
+    def feed() -> None:
+        items = iter(source)
+        try:
+            for item in items:
+                put(queues[0], item)
+            put(queues[0], _DONE)
+        except _Stopped:
+            pass
+        except BaseException as e:  # the source itself failed: end the run with its error
+            errors.append(e)
+            try:
+                put(queues[0], _DONE)
+            except _Stopped:
+                pass
+        finally:
+            # Release what a generator source holds (open files, worker processes)
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+
+    def work(stage: Stage, inbox: queue.Queue, outbox: queue.Queue, finished: List[int],
+             lock: threading.Lock) -> None:
+        try:
+            while True:
+                item = get(inbox)
+                if item is _DONE:
+                    # Let the stage's other workers see the end too; the last one passes it on
+                    put(inbox, _DONE)
+                    with lock:
+                        finished[0] += 1
+                        last = finished[0] == stage.workers
+                    if last:
+                        put(outbox, _DONE)
+                    return
+                if isinstance(item, Failure):
+                    put(outbox, item)
+                    continue
+                try:
+                    result = stage.fn(item)
+                except Exception as e:
+                    put(outbox, Failure(item, stage.name, e))
+                    continue
+                put(outbox, result)
+        except _Stopped:
+            pass
+
+    threads = [threading.Thread(target=feed, name="ingest-source", daemon=True)]
+    for i, stage in enumerate(stages):
+        finished, lock = [0], threading.Lock()
+        for n in range(stage.workers):
+            threads.append(threading.Thread(
+                target=work, args=(stage, queues[i], queues[i + 1], finished, lock),
+                name=f"ingest-{stage.name}-{n}", daemon=True
+            ))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                break
+            if isinstance(item, Failure):
+                yield None, item
+            else:
+                yield item, None
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
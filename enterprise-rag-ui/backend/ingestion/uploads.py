@@ -0,0 +1,233 @@
+"""
+Streaming Patent Uploads
+
+Receives a multipart upload straight from the request body and writes the file
+into the data directory exactly once, hashing it as it streams. Nothing is
+spooled to a temporary file first and the file is never held in memory, so
+large scanned PDFs cost one sequential write. The body is received on the
+event loop, but parsed and written in WRITE_BLOCK_SIZE slices on a worker
+thread, so disk writes never block other requests. A file whose content is already
+in the data directory (under any name) is rejected before it is ingested again.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+from ingestion.loaders import supported_extensions
+from ingestion.manifest import IngestionManifest, file_sha256
+
+# Only formats ingestion has a loader for
+ALLOWED_EXTENSIONS = set(supported_extensions())
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "1024")) * 1024 * 1024
+
+# Buffered writes go to disk in blocks of this size
+WRITE_BLOCK_SIZE = 1 << 20
+
+
+class UploadRejected(Exception):
+    """An upload that was refused, with the HTTP status to report"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def safe_filename(filename: str) -> str:
+    """Strip directories and unusual characters from a client-supplied file name"""
+    name = os.path.basename(filename.replace("\\", "/")).strip()
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("._")
+    return name
+
+
+class ContentIndex:
+    """SHA-256 of every file in the data directory, for rejecting duplicate uploads
+
+    Hashes are reused from the ingestion manifest, or from the previous scan,
+    while a file's size and mtime are unchanged, so rescanning is only a stat
+    per file.
+    """
+
+    def __init__(self, data_dir: str, db_dir: str):
+        self.data_dir = Path(data_dir)
+        self.db_dir = db_dir
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[int, int, str]] = {}  # name -> (size, mtime_ns, sha256)
+        self._seeded = False
+
+    def _refresh(self) -> None:
+        if not self._seeded:
+            # The settings key is irrelevant here: only the stored hashes are used
+            manifest = IngestionManifest(self.db_dir, settings_key="")
+            for name, size, mtime_ns, sha256 in manifest.file_entries():
+                self._files[name] = (size, mtime_ns, sha256)
+            manifest.close()
+            self._seeded = True
+
+        present = set()
+        for path in self.data_dir.iterdir():
+            if not path.is_file() or path.suffix.lower() not in ALLOWED_EXTENSIONS:
+                continue
+            stat = path.stat()
+            present.add(path.name)
+            known = self._files.get(path.name)
+            if known is None or known[:2] != (stat.st_size, stat.st_mtime_ns):
+                self._files[path.name] = (stat.st_size, stat.st_mtime_ns, file_sha256(str(path)))
+        for name in set(self._files) - present:
+            del self._files[name]
+
+    def _find(self, sha256: str) -> Optional[str]:
+        for name, (_, _, digest) in self._files.items():
+            if digest == sha256:
+                return name
+        return None
+
+    def find(self, sha256: str) -> Optional[str]:
+        """Return the name of a file in the data directory with this content, if any"""
+        with self._lock:
+            self._refresh()
+            return self._find(sha256)
+
+    def store(self, tmp_path: Path, final_path: Path, sha256: str) -> Optional[str]:
+        """Move an upload into place unless its content is already present
+
+        Returns the name of the existing file for a duplicate (leaving tmp_path
+        untouched), or None once the file has been stored.
+        """
+        with self._lock:
+            self._refresh()
+            duplicate = self._find(sha256)
+            if duplicate is not None:
+                return duplicate
+            os.replace(tmp_path, final_path)
+            stat = final_path.stat()
+            self._files[final_path.name] = (stat.st_size, stat.st_mtime_ns, sha256)
+        return None
+
+
+class _FilePart:
+    """Writes the first file part of a multipart body to disk while hashing it"""
+
+    def __init__(self, data_dir: Path, max_bytes: int):
+        self.data_dir = data_dir
+        self.max_bytes = max_bytes
+        self.filename: Optional[str] = None
+        self.tmp_path: Optional[Path] = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self._file = None
+        self.complete = False
+        self._writing = False
+        self._headers: Dict[bytes, bytes] = {}
+        self._field = b""
+        self._value = b""
+
+    # Callbacks from MultipartParser
+    def on_part_begin(self) -> None:
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._field.lower()] = self._value
+        self._field, self._value = b"", b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        if self.complete or filename is None:
+            return  # only the first file part is stored; other fields are ignored
+        self.filename = safe_filename(filename.decode("utf-8", "replace"))
+        if not self.filename or Path(self.filename).suffix.lower() not in ALLOWED_EXTENSIONS:
+            allowed = ", ".join(extension.lstrip(".") for extension in sorted(ALLOWED_EXTENSIONS))
+            raise UploadRejected(400, f"Invalid file type. Allowed types: {allowed}")
+        self.tmp_path = self.data_dir / f".upload-{uuid.uuid4().hex}.part"
+        self._file = open(self.tmp_path, "wb", buffering=WRITE_BLOCK_SIZE)
+        self._writing = True
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._writing:
+            return
+        block = data[start:end]
+        self.size += len(block)
+        if self.size > self.max_bytes:
+            raise UploadRejected(413, f"File exceeds the {self.max_bytes // (1024 * 1024)}MB upload limit")
+        self.digest.update(block)
+        self._file.write(block)
+
+    def on_part_end(self) -> None:
+        if self._writing:
+            self._file.close()
+            self._writing = False
+            self.complete = True
+
+    def discard(self) -> None:
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if self.tmp_path is not None and self.tmp_path.exists():
+            self.tmp_path.unlink()
+
+
+def _feed(parser: MultipartParser, chunks: List[bytes], finalize: bool = False) -> None:
+    """Parse body chunks, writing file data as it is found (blocking; run off the event loop)"""
+    for chunk in chunks:
+        parser.write(chunk)
+    if finalize:
+        parser.finalize()
+
+
+async def receive_upload(content_type: str, body: AsyncIterator[bytes], data_dir: Path,
+                         content_index: ContentIndex,
+                         max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[str, str, int]:
+    """Stream a multipart upload into data_dir, returning (filename, sha256, size)
+
+    Raises UploadRejected for bad requests, oversized files and duplicates.
+    """
+    mimetype, options = parse_options_header(content_type or "")
+    boundary = options.get(b"boundary")
+    if mimetype != b"multipart/form-data" or not boundary:
+        raise UploadRejected(400, "Expected a multipart/form-data upload")
+
+    part = _FilePart(data_dir, max_bytes)
+    parser = MultipartParser(boundary, {
+        "on_part_begin": part.on_part_begin,
+        "on_header_field": part.on_header_field,
+        "on_header_value": part.on_header_value,
+        "on_header_end": part.on_header_end,
+        "on_headers_finished": part.on_headers_finished,
+        "on_part_data": part.on_part_data,
+        "on_part_end": part.on_part_end,
+    })
+    try:
+        pending, pending_bytes = [], 0
+        async for chunk in body:
+            pending.append(chunk)
+            pending_bytes += len(chunk)
+            if pending_bytes >= WRITE_BLOCK_SIZE:
+                await asyncio.to_thread(_feed, parser, pending)
+                pending, pending_bytes = [], 0
+        await asyncio.to_thread(_feed, parser, pending, finalize=True)
+        if not part.complete:
+            raise UploadRejected(400, "No file part")
+
+        sha256 = part.digest.hexdigest()
+        # Rescanning may hash files added behind our back, so keep it off the event loop
+        duplicate = await asyncio.to_thread(content_index.store, part.tmp_path, data_dir / part.filename, sha256)
+        if duplicate is not None:
+            raise UploadRejected(409, f"{part.filename} is identical to {duplicate}, which is already uploaded")
+        return part.filename, sha256, part.size
+    except BaseException:
+        part.discard()
+        raise
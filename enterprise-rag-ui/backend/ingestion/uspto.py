@@ -0,0 +1,208 @@
+"""
+USPTO Bulk Grant Import
+
+Imports the weekly patent grant full-text dumps published by the USPTO
+(ipgYYMMDD.xml, or the .zip it is distributed in). A dump is one file holding
+a few thousand complete XML documents back to back, each starting with its own
+<?xml ...?> declaration, so it cannot be parsed as a single tree. The dump is
+read line by line and each patent is parsed on its own as soon as its closing
+tag is reached. The manifest and keyword index are written incrementally
+(SQLite rows and an append-only journal), so import memory is bounded by the
+pipeline queues and one checkpoint's worth of chunks, however large the dump
+is.
+
+Each patent becomes a Document in the same "Title / Abstract / Description /
+Claims" layout the PDF extractor produces, named "<dump>#<patent number>", and
+goes through the same chunk, embed and upsert pipeline as PDF ingestion.
+Patents already recorded in the manifest are skipped before chunking, so an
+interrupted import resumes where its last checkpoint left off.
+"""
+
+import hashlib
+import html.entities
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Callable, Iterator, List, Optional, Tuple
+
+from langchain.docstore.document import Document
+
+from embeddings.cache import CACHE_FILENAME
+from ingestion.manifest import IngestionManifest
+from ingestion.metadata_store import METADATA_DB_FILENAME, PatentMetadataStore
+from ingestion.patent_ingestion import (IngestionProgress, PatentVectorizer, refresh_vector_index,
+                                        stream_documents)
+from retriever.bm25 import INDEX_FILENAME as KEYWORD_INDEX_FILENAME, BM25Journal
+
+logger = logging.getLogger(__name__)
+
+XML_DECLARATION = b"<?xml"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@contextmanager
+def open_dump(path: str) -> Iterator[IO[bytes]]:
+    """Open a grant dump for streaming, reading an .xml dump straight out of its .zip"""
+    if not zipfile.is_zipfile(path):
+        with open(path, "rb") as f:
+            yield f
+        return
+    with zipfile.ZipFile(path) as archive:
+        members = [name for name in archive.namelist() if name.lower().endswith(".xml")]
+        if not members:
+            raise ValueError(f"No XML dump found in {path}")
+        with archive.open(members[0]) as f:
+            yield f
+
+
+def iter_grant_xml(f: IO[bytes]) -> Iterator[bytes]:
+    """Split a concatenated dump into the raw XML of each patent"""
+    lines: List[bytes] = []
+    for line in f:
+        if line.startswith(XML_DECLARATION) and lines:
+            yield b"".join(lines)
+            lines = []
+        lines.append(line)
+    if any(line.strip() for line in lines):
+        yield b"".join(lines)
+
+
+def _parser() -> ET.XMLParser:
+    # The dumps use HTML named entities (&mdash;, &lsquo;, ...) declared only in the external DTD
+    parser = ET.XMLParser()
+    parser.entity.update(html.entities.entitydefs)
+    return parser
+
+
+def _text(element: Optional[ET.Element]) -> str:
+    if element is None:
+        return ""
+    return _WHITESPACE.sub(" ", "".join(element.itertext())).strip()
+
+
+def parse_grant(xml: bytes) -> Optional[Tuple[str, str]]:
+    """Parse one patent, returning (patent number, text), or None if it is not a grant"""
+    root = ET.fromstring(xml, parser=_parser())
+    if root.tag != "us-patent-grant":
+        return None
+
+    document_id = root.find("us-bibliographic-data-grant/publication-reference/document-id")
+    country = _text(document_id.find("country")) if document_id is not None else ""
+    number = _text(document_id.find("doc-number")) if document_id is not None else ""
+    # "07654321" -> "7654321", "D0950000" -> "D950000"
+    prefix, digits = re.match(r"([A-Z]*)(\d*)", number).groups()
+    patent_number = f"{country or 'US'}{prefix}{digits.lstrip('0')}"
+
+    title = _text(root.find("us-bibliographic-data-grant/invention-title"))
+    abstract = " ".join(_text(p) for p in root.iterfind("abstract/p"))
+    description = "\n\n".join(
+        _text(element) for element in root.iterfind("description/*")
+        if element.tag in ("heading", "p") and _text(element)
+    )
+    claims = []
+    for i, claim in enumerate(root.iterfind("claims/claim"), start=1):
+        # Claim text normally starts with its own number ("1. A method ...")
+        claim_text = _text(claim)
+        claims.append(claim_text if re.match(r"\d+\.\s", claim_text) else f"{i}. {claim_text}")
+
+    # Same section layout as the PDF extractor, with the claims last
+    text = (f"Title: {title}\nAbstract: {abstract}\n\n"
+            f"Description:\n{description}\n\n"
+            "Claims:\n" + "\n".join(claims))
+    return patent_number, text
+
+
+def iter_grant_documents(path: str, skip: Callable[[str, str], bool] = lambda name, sha256: False
+                         ) -> Iterator[Document]:
+    """Yield a Document per patent in a dump, leaving out those for which skip(name, sha256) is true
+
+    Each document's metadata carries its SHA-256 (of its XML). Patents that
+    fail to parse are yielded with empty content and an "error" metadata key.
+    """
+    dump = Path(path).name
+    with open_dump(path) as f:
+        for xml in iter_grant_xml(f):
+            sha256 = hashlib.sha256(xml).hexdigest()
+            try:
+                parsed = parse_grant(xml)
+            except ET.ParseError as e:
+                name = f"{dump}#{sha256[:12]}"
+                yield Document(page_content="", metadata={
+                    "filename": name, "source": dump, "sha256": sha256, "error": str(e)
+                })
+                continue
+            if parsed is None:
+                continue
+            patent_number, text = parsed
+            name = f"{dump}#{patent_number}"
+            if skip(name, sha256):
+                continue
+            yield Document(page_content=text, metadata={
+                "filename": name, "source": dump, "sha256": sha256,
+                "patent_number": patent_number, "file_type": "uspto-xml"
+            })
+
+
+def import_dump(path: str, db_dir: str, progress: Optional[IngestionProgress] = None) -> int:
+    """Import a weekly grant dump into the vector database, returning the number of chunks written"""
+    logger.info(f"Importing USPTO grant dump {path}")
+    progress = progress or IngestionProgress()
+    dump = Path(path).name
+
+    vectorizer = PatentVectorizer(cache_path=os.path.join(db_dir, CACHE_FILENAME))
+    manifest = IngestionManifest(db_dir, vectorizer.settings_key)
+    vectorstore = vectorizer.open_vectorstore(db_dir)
+    # Appended to, never loaded: memory does not grow with the size of the corpus
+    keyword_index = BM25Journal(os.path.join(db_dir, KEYWORD_INDEX_FILENAME))
+    metadata_store = PatentMetadataStore(os.path.join(db_dir, METADATA_DB_FILENAME))
+
+    try:
+        already = manifest.count(source=dump)
+        if already:
+            logger.info(f"Resuming {dump}: {already} patents already imported")
+
+        def record(doc: Document, sha256: str, chunk_ids: List[str]) -> None:
+            # A patent seen before with different content: drop its previous chunks
+            name = doc.metadata["filename"]
+            stale_ids = manifest.chunk_ids(name)
+            if stale_ids:
+                vectorstore.delete(ids=stale_ids)
+                keyword_index.remove_many(stale_ids)
+            manifest.record_document(name, sha256, chunk_ids, source=dump)
+
+        documents = iter_grant_documents(path, skip=manifest.is_current)
+        # Checkpoints on the way out too, so a failed import resumes after its last committed patent
+        total_chunks = stream_documents(
+            documents, vectorizer, vectorstore, keyword_index,
+            manifest, metadata_store, progress,
+            sha256_of=lambda doc: doc.metadata["sha256"],
+            record=record
+        )
+    finally:
+        metadata_store.close()
+        manifest.close()
+
+    refresh_vector_index(vectorstore, db_dir)
+    logger.info(f"USPTO import of {dump} complete: embedded {total_chunks} chunks")
+    return total_chunks
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Import USPTO weekly grant dumps into the vector database")
+    parser.add_argument("dumps", nargs="+", help="ipgYYMMDD.xml or .zip files")
+    parser.add_argument("--db-dir", type=str, default="../chromadb",
+                        help="Directory to store vector database")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    db_dir = str(Path(__file__).parent.parent.parent / args.db_dir)
+    for dump_path in args.dumps:
+        import_dump(dump_path, db_dir)
@@ -0,0 +1,145 @@
+"""
+Answer Cache
+
+Caches LLM answers so repeated questions skip the model call. Lookups are
+two-tier: an exact match on the normalized question, then a near-duplicate
+match on the question embedding above a cosine-similarity threshold. Every
+entry is keyed by the IDs of the chunks that were retrieved for it, so an entry
+stops matching as soon as the index returns different context. Entries expire
+after a TTL and the least recently used ones are evicted beyond a size limit.
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from metrics import CACHE_LOOKUPS
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_SIZE", "1000"))
+DEFAULT_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL", "3600"))
+DEFAULT_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?.!")
+
+
+def context_key(docs: List[Any]) -> str:
+    """Fingerprint the set of retrieved chunks by their IDs (or content for legacy chunks)"""
+    ids = []
+    for doc in docs:
+        chunk_id = doc.metadata.get("chunk_id") if doc.metadata else None
+        ids.append(chunk_id or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest())
+    return hashlib.sha256("|".join(sorted(ids)).encode("utf-8")).hexdigest()
+
+
+def _cosine(a: List[float], a_norm: float, b: List[float], b_norm: float) -> float:
+    if not a_norm or not b_norm:
+        return 0.0
+    return sum(x * y for x, y in zip(a, b)) / (a_norm * b_norm)
+
+
+class AnswerCache:
+    """Thread-safe LRU/TTL cache of answers keyed by question and retrieved context"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 similarity_threshold: float = DEFAULT_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        # context key -> exact keys sharing it, for near-duplicate lookups
+        self._by_context: Dict[str, Set[Tuple[str, str]]] = {}
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def lookup(self, question: str, context: str,
+               embedding: Optional[List[float]] = None) -> Optional[str]:
+        """Return a cached answer for the question and retrieved context, if any"""
+        key = (normalize_question(question), context)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry, now):
+                    self._entries.move_to_end(key)
+                    self.exact_hits += 1
+                    CACHE_LOOKUPS.inc(cache="answer", result="exact")
+                    return entry["answer"]
+                self._remove(key)
+
+            if embedding is not None:
+                norm = math.sqrt(sum(x * x for x in embedding))
+                best_key, best_score = None, self.similarity_threshold
+                for candidate in list(self._by_context.get(context, ())):
+                    entry = self._entries[candidate]
+                    if self._expired(entry, now) or entry["embedding"] is None:
+                        continue
+                    score = _cosine(embedding, norm, entry["embedding"], entry["norm"])
+                    if score >= best_score:
+                        best_key, best_score = candidate, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    CACHE_LOOKUPS.inc(cache="answer", result="semantic")
+                    return self._entries[best_key]["answer"]
+
+            self.misses += 1
+            CACHE_LOOKUPS.inc(cache="answer", result="miss")
+            return None
+
+    def store(self, question: str, context: str, answer: str,
+              embedding: Optional[List[float]] = None) -> None:
+        """Cache an answer for the question and retrieved context"""
+        key = (normalize_question(question), context)
+        norm = math.sqrt(sum(x * x for x in embedding)) if embedding is not None else 0.0
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "embedding": list(embedding) if embedding is not None else None,
+                "norm": norm,
+                "created_at": time.time(),
+            }
+            self._entries.move_to_end(key)
+            self._by_context.setdefault(context, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        """Drop every entry, e.g. after a full re-index"""
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Report hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry["created_at"] > self.ttl_seconds
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        self._entries.pop(key, None)
+        keys = self._by_context.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_context[key[1]]
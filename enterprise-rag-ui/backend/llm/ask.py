@@ -1,14 +1,25 @@
-from retriever.search import retrieve_context
-from langchain_community.llms import Ollama
-from langchain.chains.question_answering import load_qa_chain
+import logging
+import time
+
+from retriever.search import embed_query, retrieve_context, aembed_query, aretrieve_context, get_chunks, keyword_index
+from concurrency import get_limiter
+from llm.answer_cache import AnswerCache, context_key
+from llm.context import estimate_tokens, pack_context
+from llm.relevance import is_patent_related
+from metrics import counter, observe_stage, timed
+from resources import lazy_resource
 from langchain.prompts import PromptTemplate
-from langchain_groq import ChatGroq
 from dotenv import load_dotenv
-import re
-
 load_dotenv()
-# 1. Load the local LLM from Ollama
-llm = ChatGroq(model="llama3-70b-8192")  # You can change to "llama2", "llama3", etc.
+
+logger = logging.getLogger(__name__)
+
+# 1. Load the LLM from Groq on first use, so importing this module stays cheap
+def _load_llm():
+    from langchain_groq import ChatGroq
+    return ChatGroq(model="llama3-70b-8192")  # You can change to "llama2", "llama3", etc.
+
+llm = lazy_resource("llm", _load_llm)
 
 # 2. Custom prompt to guide LLM
 prompt_template = PromptTemplate.from_template("""
@@ -39,63 +50,182 @@ Question:
 Answer:""")
 
 # 3. Chain: combine retriever + LLM + prompt
-qa_chain = load_qa_chain(llm=llm, chain_type="stuff", prompt=prompt_template)
-
-# Patent-related keywords for filtering questions
-PATENT_KEYWORDS = [
-    'patent', 'intellectual property', 'ip', 'invention', 'inventor', 'claim', 
-    'prior art', 'novelty', 'non-obvious', 'utility', 'provisional', 'pct', 
-    'uspto', 'epo', 'wipo', 'trademark', 'copyright', 'trade secret', 
-    'infringement', 'licensing', 'royalty', 'assignee', 'assignor', 'filing', 
-    'examination', 'prosecution', 'office action', 'rejection', 'allowance',
-    'grant', 'issue', 'maintenance', 'term', 'expiration', 'invalidation',
-    'reexamination', 'continuation', 'divisional', 'cip', 'rce', 'ipr', 'pgr',
-    'interference', 'opposition', 'appeal', 'litigation', 'injunction', 'damages'
-]
-
-def is_patent_related(question):
-    """Check if a question is related to patents or intellectual property"""
-    # Convert to lowercase for case-insensitive matching
-    question_lower = question.lower()
-    
-    # Check for patent-related keywords
-    for keyword in PATENT_KEYWORDS:
-        if keyword in question_lower:
-            return True
-    
-    # Use regex to catch more complex patterns
-    patent_patterns = [
-        r'\b[a-z]{2}\d{6,}\b',  # Basic patent number pattern (e.g., US7654321)
-        r'\b\d{2}/\d{3},\d{3}\b',  # Application number format
-        r'\b35 U\.?S\.?C\.?\b',  # US patent law reference
-        r'\bpatentable\b',
-        r'\binvent\w*\b'
-    ]
-    
-    for pattern in patent_patterns:
-        if re.search(pattern, question_lower):
-            return True
-    
-    return False
+def _load_qa_chain():
+    from langchain.chains.question_answering import load_qa_chain
+    return load_qa_chain(llm=llm.get(), chain_type="stuff", prompt=prompt_template)
+
+qa_chain = lazy_resource("qa_chain", _load_qa_chain)
+
+# Repeated and near-duplicate questions over the same context reuse earlier answers
+answer_cache = AnswerCache()
+
+# Questions by outcome, and LLM tokens (estimated from text length, like the context budget)
+QUESTIONS = counter("rag_questions_total", "Questions by outcome", ["outcome"])
+LLM_TOKENS = counter("rag_llm_tokens_total", "Estimated tokens sent to and received from the LLM", ["direction"])
+FOLLOW_UPS = counter("rag_follow_ups_total", "Conversation follow-ups by whether the previous turn's chunks were reused",
+                     ["outcome"])
+
+# Reply given to questions that are not about patents
+OFF_TOPIC_ANSWER = "I'm a specialized Patent Assistant and can only answer questions related to patents, intellectual property, or the patent application process. Please ask a question related to these topics."
+
+def build_context(docs):
+    """Dedupe, merge and pack retrieved chunks into the context token budget"""
+    with timed("context_packing"):
+        packed = pack_context(docs)
+    logger.debug("Context: %d chunks, %d/%d tokens (%d duplicates, %d merged, %d dropped)",
+                 len(packed.documents), packed.tokens, packed.budget,
+                 packed.duplicates, packed.merged, packed.dropped)
+    return packed.documents
+
+def check_relevance(question):
+    """Run the patent-relevance guardrail, counting off-topic questions"""
+    with timed("guardrail"):
+        related = is_patent_related(question)
+    if not related:
+        logger.debug("Question is not related to patents")
+        QUESTIONS.inc(outcome="off_topic")
+    return related
+
+def lookup_answer(question, context, query_embedding):
+    """Look up a cached answer, counting hits as answered questions"""
+    cached = answer_cache.lookup(question, context, query_embedding)
+    if cached is not None:
+        logger.debug("Answer served from cache")
+        QUESTIONS.inc(outcome="cached")
+    return cached
+
+def record_llm_call(prompt_text, answer):
+    """Count an answered question and its estimated prompt and completion tokens"""
+    QUESTIONS.inc(outcome="answered")
+    LLM_TOKENS.inc(estimate_tokens(prompt_text), direction="prompt")
+    LLM_TOKENS.inc(estimate_tokens(answer), direction="completion")
+
+def _prompt(question, docs):
+    """Build the same prompt the "stuff" chain would"""
+    return prompt_template.format(
+        context="\n\n".join(doc.page_content for doc in docs),
+        question=question
+    )
 
 # 4. Function to answer the question
 def answer_question(question):
-    print(f"🔍 Asking question: {question}")  # Debugging line
+    logger.debug("Asking question: %s", question)
     
     # Check if the question is patent-related
-    if not is_patent_related(question):
-        print("❌ Question is not related to patents")
-        return "I'm a specialized Patent Assistant and can only answer questions related to patents, intellectual property, or the patent application process. Please ask a question related to these topics."
+    if not check_relevance(question):
+        return OFF_TOPIC_ANSWER
+    
+    # Retrieve relevant documents, embedding the question only once
+    query_embedding = embed_query(question)
+    docs = retrieve_context(question, query_embedding=query_embedding)
+    logger.debug("Retrieved %d documents", len(docs))
     
-    # Retrieve relevant documents
-    docs = retrieve_context(question)
-    print(f"📚 Retrieved {len(docs)} documents")  # Debugging line
+    # Reuse the answer to the same (or a near-identical) question over the same chunks
+    context = context_key(docs)
+    cached = lookup_answer(question, context, query_embedding)
+    if cached is not None:
+        return cached
     
     # If no relevant documents found but question is patent-related,
     # still try to answer with general patent knowledge
-    answer = qa_chain.run(input_documents=docs, question=question)
+    docs = build_context(docs)
+    with timed("llm_total"):
+        answer = qa_chain.get().run(input_documents=docs, question=question)
+    record_llm_call(_prompt(question, docs), answer)
+    answer_cache.store(question, context, answer, query_embedding)
+    
+    logger.debug("Final answer: %s", answer)
+    return answer
+
+
+async def aresolve_context(question, follow_up=None):
+    """Retrieve context for a question, or reuse the previous turn's chunks when they cover a follow-up
+    
+    Returns the chunks and the query embedding (None when the chunks were reused without embedding).
+    """
+    if follow_up is not None and follow_up.is_follow_up and follow_up.reuse_chunk_ids:
+        docs = await get_limiter("chroma").run(get_chunks, follow_up.reuse_chunk_ids)
+        if docs and follow_up.covered_by(docs, keyword_index()):
+            FOLLOW_UPS.inc(outcome="reused")
+            logger.debug("Follow-up answered from the previous turn's %d chunks", len(docs))
+            return docs, None
+        FOLLOW_UPS.inc(outcome="retrieved")
     
-    print("\n🧠 Final Answer:\n")
-    print(answer)  # This will show the final answer
+    query_embedding = await aembed_query(question)
+    docs = await aretrieve_context(question, query_embedding=query_embedding)
+    logger.debug("Retrieved %d documents", len(docs))
+    return docs, query_embedding
+
+
+async def aanswer_question(question, sources=None, follow_up=None):
+    """Async answer_question: embedding, retrieval and the LLM call never block the event loop
+    
+    The retrieved chunks are appended to sources, when given, so a conversation can record them.
+    A condensed follow-up (llm/followup.py) may be answered from the previous turn's chunks.
+    """
+    logger.debug("Asking question: %s", question)
+    
+    # A follow-up is checked as asked, not with the topic appended to it
+    if not check_relevance(follow_up.relevance_text if follow_up is not None else question):
+        return OFF_TOPIC_ANSWER
+    
+    docs, query_embedding = await aresolve_context(question, follow_up)
+    return await aanswer_from_documents(question, docs, query_embedding, sources)
+
+
+async def aanswer_from_documents(question, docs, query_embedding=None, sources=None):
+    """Answer a question over documents the caller already has, e.g. from a direct patent lookup"""
+    if sources is not None:
+        sources.extend(docs)
+    context = context_key(docs)
+    cached = lookup_answer(question, context, query_embedding)
+    if cached is not None:
+        return cached
+    
+    docs = build_context(docs)
+    queued = time.perf_counter()
+    async with get_limiter("groq"):
+        observe_stage("llm_queue", time.perf_counter() - queued)
+        with timed("llm_total"):
+            result = await qa_chain.get().ainvoke({"input_documents": docs, "question": question})
+    answer = result["output_text"]
+    record_llm_call(_prompt(question, docs), answer)
+    answer_cache.store(question, context, answer, query_embedding)
     return answer
 
+
+async def astream_answer(question, sources=None, follow_up=None):
+    """Answer a question like aanswer_question, yielding the answer as it is generated (retrieved chunks go to sources)"""
+    logger.debug("Streaming answer to: %s", question)
+    
+    if not check_relevance(follow_up.relevance_text if follow_up is not None else question):
+        yield OFF_TOPIC_ANSWER
+        return
+    
+    docs, query_embedding = await aresolve_context(question, follow_up)
+    if sources is not None:
+        sources.extend(docs)
+    
+    context = context_key(docs)
+    cached = lookup_answer(question, context, query_embedding)
+    if cached is not None:
+        yield cached
+        return
+    
+    prompt = _prompt(question, build_context(docs))
+    parts = []
+    queued = time.perf_counter()
+    async with get_limiter("groq"):
+        observe_stage("llm_queue", time.perf_counter() - queued)
+        with timed("llm_total"):
+            start = time.perf_counter()
+            async for chunk in llm.get().astream(prompt):
+                if chunk.content:
+                    if not parts:
+                        observe_stage("llm_first_token", time.perf_counter() - start)
+                    parts.append(chunk.content)
+                    yield chunk.content
+    
+    answer = "".join(parts)
+    record_llm_call(prompt, answer)
+    answer_cache.store(question, context, answer, query_embedding)
@@ -0,0 +1,190 @@
+"""
+Context Packing
+
+Assembles the retrieved chunks into the context sent to the LLM. Chunks from
+the same patent that are adjacent or overlap are merged, exact and
+near-duplicate chunks are dropped, and the remaining content is packed in rank
+order into a token budget sized for the model's context window. Prompt tokens
+drive both latency and cost, so retrieving more chunks never grows the prompt
+past the budget.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.docstore.document import Document
+
+# Context budget for llama3-70b-8192, leaving room for the prompt and the answer
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "4000"))
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("CONTEXT_DUPLICATE_THRESHOLD", "0.85"))
+
+# Truncating the last chunk is only worth it if a useful amount of it fits
+MIN_TRUNCATED_TOKENS = 64
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 500
+
+CHUNK_INDEX_PATTERN = re.compile(r"-(\d+)$")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token for English patent text)"""
+    return max(1, len(text) // 4)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = text.split()
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _source(doc: Document) -> Optional[str]:
+    metadata = doc.metadata or {}
+    return metadata.get("sha256") or metadata.get("filename") or metadata.get("source")
+
+
+def _chunk_index(doc: Document) -> Optional[int]:
+    """Position of a chunk within its patent, taken from its chunk ID"""
+    match = CHUNK_INDEX_PATTERN.search((doc.metadata or {}).get("chunk_id") or "")
+    return int(match.group(1)) if match else None
+
+
+def _overlap(first: str, second: str) -> int:
+    """Length of the longest suffix of first that is a prefix of second"""
+    for size in range(min(len(first), len(second), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+class PackedContext:
+    """The documents sent to the LLM and the tokens they use"""
+
+    def __init__(self, documents: List[Document], tokens: int, budget: int,
+                 retrieved: int, duplicates: int, merged: int, dropped: int):
+        self.documents = documents
+        self.tokens = tokens
+        self.budget = budget
+        self.retrieved = retrieved
+        self.duplicates = duplicates
+        self.merged = merged
+        self.dropped = dropped
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self.documents),
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "retrieved": self.retrieved,
+            "duplicates": self.duplicates,
+            "merged": self.merged,
+            "dropped": self.dropped,
+        }
+
+
+def deduplicate(docs: List[Document],
+                threshold: float = NEAR_DUPLICATE_THRESHOLD) -> Tuple[List[Document], int]:
+    """Drop chunks that repeat (or are contained in) a higher-ranked chunk"""
+    kept: List[Tuple[Document, str, set]] = []
+    for doc in docs:
+        text = _normalize(doc.page_content)
+        if not text:
+            continue
+        shingles = _shingles(text)
+        duplicate = False
+        for _, kept_text, kept_shingles in kept:
+            if text in kept_text:
+                duplicate = True
+            else:
+                union = len(shingles | kept_shingles)
+                duplicate = union > 0 and len(shingles & kept_shingles) / union >= threshold
+            if duplicate:
+                break
+        if not duplicate:
+            kept.append((doc, text, shingles))
+    return [doc for doc, _, _ in kept], len(docs) - len(kept)
+
+
+def merge_adjacent(docs: List[Document]) -> Tuple[List[Document], int]:
+    """Merge chunks of the same patent that are neighbours or overlap, keeping rank order"""
+    merged: List[Dict[str, Any]] = []
+    merges = 0
+    for doc in docs:
+        source, index = _source(doc), _chunk_index(doc)
+        target = None
+        if source is not None:
+            for group in merged:
+                if group["source"] != source:
+                    continue
+                if index is not None and group["first"] is not None and \
+                        (index == group["first"] - 1 or index == group["last"] + 1):
+                    target = group
+                elif _overlap(group["text"], doc.page_content) or _overlap(doc.page_content, group["text"]):
+                    target = group
+                if target:
+                    break
+        if target is None:
+            merged.append({"source": source, "first": index, "last": index, "text": doc.page_content,
+                           "metadata": dict(doc.metadata or {}),
+                           "chunk_ids": [doc.metadata.get("chunk_id")] if doc.metadata else []})
+            continue
+
+        # Keep the merged text in document order, without repeating the overlap
+        if index is not None and target["first"] is not None and index < target["first"]:
+            before, after = doc.page_content, target["text"]
+            target["first"] = index
+        elif index is not None and target["last"] is not None and index > target["last"]:
+            before, after = target["text"], doc.page_content
+            target["last"] = index
+        elif _overlap(doc.page_content, target["text"]) > _overlap(target["text"], doc.page_content):
+            before, after = doc.page_content, target["text"]
+        else:
+            before, after = target["text"], doc.page_content
+        size = _overlap(before, after)
+        target["text"] = before + after[size:] if size else f"{before}\n\n{after}"
+        target["chunk_ids"].append((doc.metadata or {}).get("chunk_id"))
+        merges += 1
+
+    documents = []
+    for group in merged:
+        metadata = group["metadata"]
+        ids = [chunk_id for chunk_id in group["chunk_ids"] if chunk_id]
+        if len(ids) > 1:
+            metadata["chunk_id"] = "+".join(ids)
+        documents.append(Document(page_content=group["text"], metadata=metadata))
+    return documents, merges
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut text to a token budget, at a sentence boundary if there is one"""
+    cut = text[:max_tokens * 4]
+    boundary = max(cut.rfind(". "), cut.rfind(".\n"))
+    if boundary > len(cut) // 2:
+        return cut[:boundary + 1]
+    return cut.rsplit(" ", 1)[0]
+
+
+def pack_context(docs: List[Document], budget: int = CONTEXT_TOKEN_BUDGET) -> PackedContext:
+    """Dedupe, merge and pack ranked chunks (best first) into the token budget"""
+    unique, duplicates = deduplicate(docs)
+    merged, merges = merge_adjacent(unique)
+
+    packed, tokens, dropped = [], 0, 0
+    for doc in merged:
+        doc_tokens = estimate_tokens(doc.page_content)
+        remaining = budget - tokens
+        if doc_tokens <= remaining:
+            packed.append(doc)
+            tokens += doc_tokens
+        elif remaining >= MIN_TRUNCATED_TOKENS:
+            text = _truncate(doc.page_content, remaining)
+            packed.append(Document(page_content=text, metadata={**doc.metadata, "truncated": True}))
+            tokens += estimate_tokens(text)
+        else:
+            dropped += 1
+    return PackedContext(packed, tokens, budget, len(docs), duplicates, merges, dropped)
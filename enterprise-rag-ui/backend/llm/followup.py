@@ -0,0 +1,137 @@
+"""
+Follow-up Questions
+
+Turns a follow-up such as "what about claim 3?" into a standalone question
+before any retrieval or LLM work is done, using only string heuristics.
+
+A question is read as a follow-up to the previous turn when it is short and
+refers back ("it", "this", "those"), opens with a continuation ("and",
+"what about"), or is a fragment of at most FOLLOW_UP_MAX_TERMS terms that
+names a claim or is only a question word ("claim 3?", "why?"). Other short
+fragments ("Thanks!", "Patent eligibility?") stand alone. It is read as a new
+topic when it names a patent the previous question did not.
+A follow-up is condensed by attaching the topic it follows up on, the first
+standalone question of the thread, so the condensed question stays short
+however long the thread gets:
+
+    What about claim 3? (following up on: What does US11391262 claim about the battery housing?)
+
+The previous turn's chunks are reused for a follow-up when they cover its
+new terms (and any claim it names); only otherwise is the condensed question
+retrieved afresh.
+
+The patent-relevance guardrail checks the question as it was asked. Only a
+fragment ("claim 3?", "why?") is checked with the topic it follows up on, so
+an off-topic question cannot pass by opening with "so" or "and".
+"""
+
+import os
+import re
+from typing import Optional, Sequence, Set
+
+from langchain.docstore.document import Document
+
+from retriever.bm25 import BM25Index, tokenize
+from retriever.rerank import CLAIM_NUMBER, PATENT_NUMBER, QUESTION_WORDS
+
+# Fragments of at most this many terms are follow-ups even without a referring word
+FOLLOW_UP_MAX_TERMS = int(os.environ.get("FOLLOW_UP_MAX_TERMS", "2"))
+# Longer questions use "this" and "that" within themselves, so they do not refer back
+REFERRING_MAX_TERMS = 6
+# IDF-weighted share of a follow-up's terms the previous chunks must contain to be reused
+FOLLOW_UP_MIN_COVERAGE = float(os.environ.get("FOLLOW_UP_MIN_COVERAGE", "0.6"))
+
+REFERRING_WORDS = frozenset([
+    "it", "its", "this", "that", "these", "those", "they", "them", "their", "theirs",
+    "same", "above", "former", "latter", "previous", "aforementioned",
+])
+# "and ...", "what about ...", "ok, how about ..."
+LEAD_IN = re.compile(
+    r"^(?:(?:and|but|also|so|then|ok|okay)\b[\s,]*)?(?:(?:what|how)\s+about\b|what\s+of\b)?[\s,]*",
+    re.IGNORECASE
+)
+TOPIC_SUFFIX = re.compile(r" \(following up on: (.*)\)$", re.DOTALL)
+
+
+class FollowUp:
+    """A question as asked in a conversation, and what it can reuse from the previous turn"""
+
+    def __init__(self, question: str, query: Optional[str] = None, focus: Optional[str] = None,
+                 reuse_chunk_ids: Sequence[str] = (), fragment: bool = False):
+        self.question = question
+        # Standalone question used for retrieval and the prompt
+        self.query = query or question
+        # The part of the question that is new, checked against the reused chunks
+        self.focus = focus or question
+        self.reuse_chunk_ids = list(reuse_chunk_ids)
+        # A fragment means nothing without its topic, so it inherits the topic's relevance
+        self.fragment = fragment
+
+    @property
+    def is_follow_up(self) -> bool:
+        return self.query != self.question
+
+    @property
+    def relevance_text(self) -> str:
+        """The text the patent-relevance guardrail checks"""
+        return self.query if self.fragment else self.question
+
+    def covered_by(self, docs: Sequence[Document], index: Optional[BM25Index] = None) -> bool:
+        """Whether the previous turn's chunks contain what this follow-up asks about"""
+        lowered = self.focus.lower()
+        for number in {int(n) for n in CLAIM_NUMBER.findall(lowered)}:
+            if not any(doc.metadata.get("claim_number") == number
+                       or f"claim {number}" in doc.page_content.lower() for doc in docs):
+                return False
+        terms = content_terms(self.focus)
+        if not terms:
+            return True
+        present: Set[str] = set()
+        for doc in docs:
+            present.update(tokenize(doc.page_content))
+        weights = {t: index.idf(t) if index is not None and len(index) else 1.0 for t in terms}
+        total = sum(weights.values()) or 1.0
+        return sum(w for t, w in weights.items() if t in present) / total >= FOLLOW_UP_MIN_COVERAGE
+
+
+def content_terms(text: str) -> Set[str]:
+    """Index terms of a question, without question words or words that refer back"""
+    return {t for t in tokenize(text) if t not in QUESTION_WORDS and t not in REFERRING_WORDS}
+
+
+def topic_of(query: str) -> str:
+    """The standalone question a (possibly condensed) question follows up on"""
+    match = TOPIC_SUFFIX.search(query)
+    return match.group(1) if match else query
+
+
+def condense_question(question: str, previous=None) -> FollowUp:
+    """Condense a follow-up to the previous turn (with query and chunk_ids) into a standalone question"""
+    question = question.strip()
+    if previous is None:
+        return FollowUp(question)
+
+    lead_in = LEAD_IN.match(question)
+    focus = question[lead_in.end():] or question
+    words = re.findall(r"[a-z']+", question.lower())
+    topic = topic_of(previous.query)
+
+    # Naming a patent the topic does not is a change of topic
+    named = set(PATENT_NUMBER.findall(question.lower().replace(",", "")))
+    if named - set(PATENT_NUMBER.findall(topic.lower().replace(",", ""))):
+        return FollowUp(question)
+
+    terms = content_terms(focus)
+    # "ok" or "okay" alone is an acknowledgement ("ok thanks"), not a continuation
+    continues = lead_in.group(0).strip(" ,").lower() not in ("", "ok", "okay")
+    refers_back = continues or (
+        len(terms) <= REFERRING_MAX_TERMS and any(w in REFERRING_WORDS for w in words)
+    )
+    # A fragment must point somewhere: a claim ("claim 3?") or the previous answer ("why?")
+    fragment = len(terms) <= FOLLOW_UP_MAX_TERMS and (
+        bool(CLAIM_NUMBER.search(focus.lower())) or (bool(words) and all(w in QUESTION_WORDS for w in words))
+    )
+    if not (refers_back or fragment):
+        return FollowUp(question)
+
+    return FollowUp(question, f"{question} (following up on: {topic})", focus, previous.chunk_ids, fragment)
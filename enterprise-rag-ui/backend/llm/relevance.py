@@ -0,0 +1,130 @@
+"""
+Patent Relevance Classifier
+
+Decides whether a question is about patents or intellectual property before
+any retrieval or LLM work is done. Every term, phrase and word stem is
+compiled once into a single word-boundary regex, factored into a prefix trie
+(one branch per first letter, then per next letter, and so on), so the regex
+engine rejects a non-matching word after a character or two instead of trying
+each term in turn. A question is scanned once, in a few microseconds.
+
+Each matched term adds its weight to a score and the question is
+patent-related when the score reaches 1.0. Unambiguous terms ("patent",
+"prior art", "uspto", patent numbers) score 1.0 on their own, and so do words
+that are rare outside patent practice ("provisional", "examiner",
+"anticipation", "frand"). Terms that are common in everyday English ("claim",
+"issue", "term", "grant", "file", "rejection") score 0.5, so they only count
+alongside another signal.
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+THRESHOLD = 1.0
+
+# Whole words and phrases
+TERMS: Dict[str, float] = {
+    **dict.fromkeys([
+        "intellectual property", "prior art", "trade secret", "trade secrets", "office action",
+        "office actions", "provisional application", "inter partes review", "post-grant review",
+        "independent claim", "independent claims", "dependent claim", "dependent claims",
+        "pct", "uspto", "epo", "wipo", "assignee", "assignor", "reexamination",
+        "continuation-in-part", "nonobvious", "non-obvious", "nonobviousness", "non-obviousness",
+        "35 u.s.c", "35 usc",
+        # Rare outside patent practice
+        "provisional", "provisionals", "nonprovisional", "non-provisional", "examiner", "examiners",
+        "anticipation", "anticipated by", "frand", "final rejection", "non-final rejection",
+        "the claims", "claim construction", "claim chart", "claim charts", "claim scope",
+        "claim language",
+    ], 1.0),
+    # Ambiguous in everyday English: need a second signal
+    **dict.fromkeys([
+        "claim", "claims", "novelty", "novel", "file", "files", "filed", "filing", "filings",
+        "examination", "grace period",
+        "prosecution", "rejection", "rejections", "allowance", "utility", "issue", "issued", "term",
+        "continuation", "divisional", "cip", "rce", "ipr", "pgr", "interference", "opposition",
+        "appeal", "litigation", "injunction", "damages", "maintenance fee", "maintenance fees",
+        "inventive step",
+    ], 0.5),
+    # Words that a stem below would otherwise match
+    **dict.fromkeys(["inventory", "inventories"], 0.0),
+    # Phrases that would otherwise add up to a false match ("file" + "claim")
+    **dict.fromkeys(["insurance claim", "insurance claims"], 0.0),
+}
+
+# Word prefixes, e.g. "patent" covers "patents", "patentable", "patented"
+STEMS: Dict[str, float] = {
+    **dict.fromkeys(["patent", "invent", "infring", "trademark", "copyright"], 1.0),
+    **dict.fromkeys(["licens", "royalt", "grant", "expir", "invalidat"], 0.5),
+}
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Build a regex matching any of the words, factored by common prefixes"""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+MATCHER = re.compile(rf"\b(?:{_trie_pattern(TERMS)}\b|{_trie_pattern(STEMS)}[\w-]*)")
+
+# Checked separately, and only when the question contains the trigger
+ACRONYM = re.compile(r"\bIP\b(?!\s+address)")  # "IP" only, case-sensitive, not an "IP address"
+NUMBERS = re.compile(
+    r"\b(?:(?:[a-z]{2}|(?:us|ep|wo|jp|cn|kr|de|gb|fr|ca|au) )\d{1,2},?\d{3},?\d{3}\d*"  # e.g. us7654321, us 11,391,262
+    r"|\d{2}/\d{3},\d{3}"  # application numbers, e.g. 16/123,456
+    r"|claims? \d+)\b"  # "claim 3"
+)
+DIGIT = re.compile(r"\d")
+
+
+def _weight(term: str) -> float:
+    weight = TERMS.get(term)
+    if weight is None:
+        weight = next(w for stem, w in STEMS.items() if term.startswith(stem))
+    return weight
+
+
+def _matches(question: str) -> Iterator[Tuple[str, float]]:
+    """Yield (term, weight) for every relevance signal in the question"""
+    lowered = question.lower()
+    for term in MATCHER.findall(lowered):
+        yield term, _weight(term)
+    if "IP" in question and ACRONYM.search(question):
+        yield "ip", 1.0
+    if DIGIT.search(lowered):
+        for term in NUMBERS.findall(lowered):
+            yield term, 1.0
+
+
+def relevance_score(question: str) -> Tuple[float, List[str]]:
+    """Score a question, returning (score, matched terms); each distinct term counts once"""
+    seen: Dict[str, float] = {}
+    for term, weight in _matches(question):
+        seen.setdefault(term, weight)
+    return sum(seen.values()), list(seen)
+
+
+def is_patent_related(question: str) -> bool:
+    """Check if a question is related to patents or intellectual property"""
+    # Same signals as _matches, in the order cheapest to decide: most related
+    # questions contain a decisive term, and most unrelated ones no term at all
+    lowered = question.lower()
+    terms = set(MATCHER.findall(lowered))
+    if terms and sum(map(_weight, terms)) >= THRESHOLD:
+        return True
+    if "IP" in question and ACRONYM.search(question):
+        return True
+    return bool(DIGIT.search(lowered) and NUMBERS.search(lowered))
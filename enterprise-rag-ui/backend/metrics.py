@@ -0,0 +1,253 @@
+"""
+Metrics and Tracing
+
+Counters, histograms and gauges for the RAG pipeline, rendered in the
+Prometheus text exposition format by the /metrics endpoint. Pipeline stages
+(the relevance guardrail, query embedding, vector and keyword search, context
+packing, the LLM call, ingestion parsing, chunking and embedding) are wrapped
+in timed(), which records the stage's duration in a histogram, counts the
+stage's errors, and adds a span to the current request's trace. A trace lives
+in a context variable, so it follows a request across awaits and into worker
+threads started with a copied context.
+"""
+
+import contextvars
+import math
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; covers microsecond guardrail checks up to minute-long LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    """Common naming and label handling; children are keyed by label values"""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, e.g. cache hits or errors"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Histogram(_Metric):
+    """Observed durations in cumulative buckets, with their sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            counts = self._values.get(self._key(labels))
+            return int(sum(counts[:-1])) if counts else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(counts)) for key, counts in self._values.items())
+        lines = []
+        for key, counts in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A current value read when metrics are rendered, e.g. in-flight upstream calls"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str],
+                 collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in sorted(self.collect().items())]
+
+
+REGISTRY: Dict[str, _Metric] = {}
+
+
+def _register(metric: _Metric) -> _Metric:
+    # Re-registering (e.g. on module reload) returns the existing metric
+    return REGISTRY.setdefault(metric.name, metric)
+
+
+def counter(name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+    """Register a counter"""
+    return _register(Counter(name, help, labels))
+
+
+def histogram(name: str, help: str, labels: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Register a histogram"""
+    return _register(Histogram(name, help, labels, buckets))
+
+
+def gauge(name: str, help: str, labels: Sequence[str],
+          collect: Callable[[], Dict[Tuple[str, ...], float]]) -> Gauge:
+    """Register a gauge whose values are collected at render time"""
+    return _register(Gauge(name, help, labels, collect))
+
+
+def render() -> str:
+    """Render every registered metric in the Prometheus text format"""
+    lines = []
+    for metric in REGISTRY.values():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = histogram("rag_stage_seconds", "Time spent in each pipeline stage", ["stage"])
+STAGE_ERRORS = counter("rag_stage_errors_total", "Pipeline stage failures", ["stage"])
+CACHE_LOOKUPS = counter("rag_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+
+
+class Trace:
+    """The stage timings of one request"""
+
+    def __init__(self, name: str = ""):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.spans.append((stage, seconds))
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Format the spans as a Server-Timing header (durations in milliseconds)"""
+        return ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.spans)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "seconds": round(self.seconds, 4),
+            "spans": [{"stage": stage, "seconds": round(seconds, 4)} for stage, seconds in self.spans],
+        }
+
+
+_current_trace: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("trace", default=None)
+
+
+def start_trace(name: str = "") -> Trace:
+    """Begin a trace for the current request (and the tasks and threads it starts)"""
+    trace = Trace(name)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record a stage duration measured by the caller"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time a pipeline stage, counting it as an error if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
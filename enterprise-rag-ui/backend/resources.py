@@ -0,0 +1,97 @@
+"""
+Lazy Resources
+
+Expensive clients (the Groq LLM and QA chain, the embedding client, the Chroma
+store) are built on first use instead of at import time, so the API starts and
+tests import instantly and a dependency that is down only fails the requests
+that need it. Each resource is built once, under a lock, by whichever thread
+needs it first. warm_up() builds them ahead of traffic and /ready reports which
+ones are loaded.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyResource:
+    """A thread-safe singleton built by a factory on first access"""
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self.factory = factory
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._value: Any = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self) -> Any:
+        """Return the resource, building it if this is the first access"""
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    # Not cached: the next access retries
+                    self.error = str(e)
+                    raise
+                self.load_seconds = time.perf_counter() - start
+                self.error = None
+                self._loaded = True
+        return self._value
+
+    def set(self, value: Any) -> None:
+        """Replace the resource, e.g. with a store built elsewhere"""
+        with self._lock:
+            self._value = value
+            self._loaded = True
+            self.error = None
+
+    def reset(self) -> None:
+        """Drop the resource so the next access builds it again"""
+        with self._lock:
+            self._value = None
+            self._loaded = False
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "loaded": self._loaded,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "error": self.error,
+        }
+
+
+RESOURCES: Dict[str, LazyResource] = {}
+
+
+def lazy_resource(name: str, factory: Callable[[], Any]) -> LazyResource:
+    """Register a lazily built resource under a name"""
+    resource = LazyResource(name, factory)
+    RESOURCES[name] = resource
+    return resource
+
+
+def warm_up(names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Build the named resources (all by default), logging rather than raising failures"""
+    for name in names or list(RESOURCES):
+        try:
+            RESOURCES[name].get()
+        except Exception as e:
+            logger.warning("Failed to load %s: %s", name, e)
+    return resource_status()
+
+
+def resource_status() -> Dict[str, Dict[str, Any]]:
+    """Report which resources are loaded"""
+    return {name: resource.status() for name, resource in RESOURCES.items()}
@@ -0,0 +1,251 @@
+"""
+BM25 Keyword Index
+
+An in-process inverted index over chunk texts, built at ingest time and stored
+as JSON next to the Chroma store. Patent queries are full of exact tokens
+(patent numbers, claim numbers, CPC codes, chemical names) that dense
+embeddings handle poorly; BM25 ranks those precisely and its results are fused
+with the vector results using reciprocal-rank fusion.
+
+Ingestion does not load or rewrite the index: a BM25Journal appends each
+checkpoint's added and removed chunks to "<index>.log", and loading replays
+the log over the JSON snapshot. Ingestion memory is therefore bounded by one
+checkpoint's chunks. The log is folded into the snapshot (compact()) only
+once it outgrows the snapshot, so rewrites stay linear in the index size.
+"""
+
+import heapq
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "bm25_index.json"
+LOG_SUFFIX = ".log"
+
+# Keeps compound tokens such as "us11391262", "h01l31/04" or "c6h12o6" intact
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[./-][a-z0-9]+)*")
+DIGIT_GROUP_PATTERN = re.compile(r"(?<=\d),(?=\d{3}\b)")
+STOPWORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "that", "the", "this", "to", "was", "with",
+])
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text into index terms, keeping compound identifiers whole"""
+    text = DIGIT_GROUP_PATTERN.sub("", text.lower())  # "11,391,262" -> "11391262"
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        # Also index the parts of compound tokens so "h01l31" matches "h01l31/04"
+        if any(sep in token for sep in "./-"):
+            tokens.extend(part for part in re.split(r"[./-]", token) if part not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over chunks identified by their vector-store IDs"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_lengths: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, chunk_id: str, text: str) -> None:
+        """Index a chunk, replacing any previous text under the same ID"""
+        self.add_counts(chunk_id, Counter(tokenize(text)))
+
+    def add_counts(self, chunk_id: str, term_counts: Dict[str, int]) -> None:
+        """Index a chunk from its term frequencies, replacing any previous entry"""
+        if chunk_id in self.doc_lengths:
+            self.remove(chunk_id)
+        length = sum(term_counts.values())
+        self.doc_lengths[chunk_id] = length
+        self.total_length += length
+        for term, tf in term_counts.items():
+            self.postings.setdefault(term, {})[chunk_id] = tf
+
+    def remove(self, chunk_id: str) -> None:
+        """Remove a chunk from the index"""
+        self.remove_many([chunk_id])
+
+    def remove_many(self, chunk_ids: Iterable[str]) -> None:
+        """Remove several chunks in one pass over the postings"""
+        ids = {chunk_id for chunk_id in chunk_ids if chunk_id in self.doc_lengths}
+        if not ids:
+            return
+        for chunk_id in ids:
+            self.total_length -= self.doc_lengths.pop(chunk_id)
+        for term in list(self.postings):
+            docs = self.postings[term]
+            for chunk_id in ids.intersection(docs):
+                del docs[chunk_id]
+            if not docs:
+                del self.postings[term]
+
+    def idf(self, term: str) -> float:
+        """Inverse document frequency of an index term (highest for terms no chunk contains)"""
+        n_docs = len(self.doc_lengths)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Return the top-k (chunk_id, score) pairs for a query"""
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return []
+        avg_length = self.total_length / n_docs or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf(term)
+            for chunk_id, tf in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[chunk_id] / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def apply(self, change: Dict[str, Any]) -> None:
+        """Apply one journal entry: {"add": id, "tf": {term: count}} or {"remove": [ids]}"""
+        if "add" in change:
+            self.add_counts(change["add"], change["tf"])
+        else:
+            self.remove_many(change["remove"])
+
+    def replay(self, log_path: str, offset: int = 0) -> int:
+        """Apply the journal from a byte offset, returning the offset after its last complete entry"""
+        try:
+            f = open(log_path, "rb")
+        except FileNotFoundError:
+            return offset
+        with f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # still being written; picked up by the next replay
+                offset += len(line)
+                self.apply(json.loads(line))
+        return offset
+
+    def save(self, path: str) -> None:
+        """Atomically write the index as JSON; the snapshot supersedes any journal"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "doc_lengths": self.doc_lengths,
+                       "postings": self.postings}, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        if os.path.exists(path + LOG_SUFFIX):
+            os.remove(path + LOG_SUFFIX)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Load an index and replay its journal, or return an empty one if there is neither"""
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            index = cls(k1=data["k1"], b=data["b"])
+            index.doc_lengths = data["doc_lengths"]
+            index.postings = data["postings"]
+            index.total_length = sum(index.doc_lengths.values())
+        else:
+            index = cls()
+        index.replay(path + LOG_SUFFIX)
+        return index
+
+
+class BM25Journal:
+    """Append-only log of keyword index changes, written by ingestion without loading the index"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.log_path = path + LOG_SUFFIX
+        self._pending: List[str] = []
+        self._trimmed = False
+
+    def add(self, chunk_id: str, text: str) -> None:
+        self._pending.append(json.dumps({"add": chunk_id, "tf": Counter(tokenize(text))},
+                                        separators=(",", ":")))
+
+    def remove_many(self, chunk_ids: Iterable[str]) -> None:
+        ids = list(chunk_ids)
+        if ids:
+            self._pending.append(json.dumps({"remove": ids}, separators=(",", ":")))
+
+    def flush(self) -> None:
+        """Durably append the changes made since the last flush"""
+        if not self._pending:
+            return
+        if not self._trimmed:
+            self._trim_partial_entry()
+            self._trimmed = True
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(self._pending) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending = []
+
+    def _trim_partial_entry(self) -> None:
+        """Cut off an entry left half-written by a crash, so new entries start on their own line"""
+        try:
+            f = open(self.log_path, "r+b")
+        except FileNotFoundError:
+            return
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                step = min(position, 1 << 16)
+                position -= step
+                f.seek(position)
+                block = f.read(step)
+                if position + step == end and block.endswith(b"\n"):
+                    return
+                newline = block.rfind(b"\n")
+                if newline >= 0:
+                    f.truncate(position + newline + 1)
+                    return
+            f.truncate(0)
+
+    def clear(self) -> None:
+        """Drop the index and its journal, e.g. before a full rebuild"""
+        self._pending = []
+        for path in (self.path, self.log_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def compact(self) -> bool:
+        """Fold the journal into the snapshot once it is larger than the snapshot"""
+        self.flush()
+        log_size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        snapshot_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if not log_size or log_size <= snapshot_size:
+            return False
+        BM25Index.load(self.path).save(self.path)
+        logger.info(f"Compacted the keyword index journal ({log_size} bytes) into {self.path}")
+        return True
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]],
+                           weights: Optional[Sequence[float]] = None,
+                           k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists: score(id) = sum of weight / (k + rank) over the lists"""
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,339 @@
+"""
+Memory-Mapped Vector Index
+
+A read-mostly alternative to Chroma's HNSW index. Embeddings are L2-normalized
+and stored quantized (int8 with a per-vector scale, or float16) in NumPy files
+that are opened with mmap, so every uvicorn worker shares one page-cached copy
+instead of loading its own. A query scans the quantized vectors in blocks with
+a matrix-vector product (or, for large corpora, only the closest inverted-file
+lists), then optionally re-scores the best candidates against the float32
+vectors, of which only the candidates' rows are ever paged in.
+
+The index is exported from the Chroma collection the ingestion pipeline writes
+and is rebuilt after each ingestion run (to an empty index when the collection
+is empty); readers pick up the new files on their next query. A server started
+with VECTOR_BACKEND=mmap before any export exports the index on first load. It
+exposes the two Chroma calls the retriever makes, similarity_search_by_vector
+and get, so it can stand in for the Chroma store.
+
+Layout of the index directory:
+    meta.json         dtype, dimension, count, number of inverted lists
+    vectors.npy       quantized vectors (count x dim), ordered by inverted list
+    scales.npy        per-vector dequantization scale (int8 only)
+    rows.npy          original row of each vector in vectors.npy
+    full.npy          float32 vectors in original row order (for re-ranking)
+    centroids.npy     inverted-list centroids, and list_offsets.npy their slices
+    docs.jsonl        chunk ID, text and metadata per original row, and
+    doc_offsets.npy   the byte offset of each line (plus the end of the file)
+    ids.txt           chunk IDs in original row order
+"""
+
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.docstore.document import Document
+
+# "chroma" serves dense search from the Chroma store, "mmap" from this index
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")
+
+INDEX_DIRNAME = "mmap_index"
+DEFAULT_DTYPE = os.environ.get("MMAP_INDEX_DTYPE", "int8")  # int8 or float16
+# Candidates re-scored with float32 vectors per query; 0 keeps no float32 copy
+RERANK_CANDIDATES = int(os.environ.get("MMAP_RERANK_CANDIDATES", "50"))
+# Corpora at least this large are split into inverted lists, of which NPROBE are scanned
+IVF_MIN_VECTORS = int(os.environ.get("MMAP_IVF_MIN_VECTORS", "50000"))
+IVF_NPROBE = int(os.environ.get("MMAP_IVF_NPROBE", "32"))
+
+# Rows dequantized per matrix-vector product (bounds the float32 scratch space)
+SCAN_BLOCK_ROWS = 8192
+EXPORT_BATCH_SIZE = 1000
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _quantize(block: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Quantize normalized float32 rows, returning (values, per-row scales or None)"""
+    if dtype == "float16":
+        return block.astype(np.float16), None
+    scales = np.abs(block).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    values = np.clip(np.rint(block / scales[:, None]), -127, 127).astype(np.int8)
+    return values, scales.astype(np.float32)
+
+
+def _kmeans(sample: np.ndarray, n_lists: int, iterations: int = 8, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on normalized rows, returning normalized centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        # Sum each list's members in one pass over the rows sorted by list
+        order = np.argsort(assignment, kind="stable")
+        used, starts = np.unique(assignment[order], return_index=True)
+        sums = np.add.reduceat(sample[order], starts, axis=0)
+        empty = np.setdiff1d(np.arange(n_lists), used)
+        centroids[used] = sums
+        centroids[empty] = sample[rng.integers(len(sample), size=len(empty))]  # re-seed empty lists
+        centroids = _normalize(centroids)
+    return centroids.astype(np.float32)
+
+
+def _top(scores: np.ndarray, n: int) -> np.ndarray:
+    """Positions of the n highest scores, best first"""
+    n = min(n, len(scores))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, n - 1)[:n]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def build_index(path: str, batches: Iterable[Tuple[Sequence[str], Sequence[Sequence[float]],
+                                                  Sequence[str], Sequence[Dict[str, Any]]]],
+                count: int, dtype: str = DEFAULT_DTYPE, keep_float32: bool = RERANK_CANDIDATES > 0,
+                ivf_min_vectors: int = IVF_MIN_VECTORS) -> "MmapVectorIndex":
+    """Write an index from batches of (ids, embeddings, documents, metadatas)
+
+    The files are written to a temporary directory and swapped in, so readers
+    never see a partial index.
+    """
+    if dtype not in ("int8", "float16"):
+        raise ValueError(f"Unsupported index dtype {dtype!r}; use int8 or float16")
+    if count < 0:
+        raise ValueError(f"Invalid vector count {count}")
+    final = Path(path)
+    tmp = final.parent / f".{final.name}.tmp-{uuid.uuid4().hex[:8]}"
+    tmp.mkdir(parents=True)
+    try:
+        # Pass 1: normalized float32 vectors and documents, in original order
+        full = None
+        offset = 0
+        doc_offsets = np.zeros(count + 1, dtype=np.int64)
+        written = 0
+        with open(tmp / "docs.jsonl", "wb") as docs, open(tmp / "ids.txt", "w", encoding="utf-8") as id_file:
+            for ids, embeddings, documents, metadatas in batches:
+                block = _normalize(np.asarray(embeddings, dtype=np.float32))
+                if full is None:
+                    full = np.lib.format.open_memmap(tmp / "full.npy", mode="w+", dtype=np.float32,
+                                                     shape=(count, block.shape[1]))
+                full[written:written + len(block)] = block
+                for chunk_id, text, metadata in zip(ids, documents, metadatas):
+                    line = json.dumps({"id": chunk_id, "text": text, "metadata": metadata or {}}).encode("utf-8")
+                    doc_offsets[written] = offset
+                    docs.write(line + b"\n")
+                    id_file.write(chunk_id + "\n")
+                    offset += len(line) + 1
+                    written += 1
+        doc_offsets[-1] = offset
+        if written != count:
+            raise ValueError(f"Expected {count} vectors, got {written}")
+        if full is None:
+            # An empty store still gets an (empty) index, replacing any stale one
+            full = np.lib.format.open_memmap(tmp / "full.npy", mode="w+", dtype=np.float32, shape=(0, 0))
+        dim = full.shape[1] if full is not None else 0
+        np.save(tmp / "doc_offsets.npy", doc_offsets)
+
+        # Pass 2: group rows by inverted list, so each list is one contiguous slice
+        n_lists = int(2 * np.sqrt(count)) if count >= ivf_min_vectors else 0
+        if n_lists:
+            sample_rows = np.random.default_rng(0).choice(count, min(count, n_lists * 32), replace=False)
+            centroids = _kmeans(np.asarray(full[np.sort(sample_rows)]), n_lists)
+            assignment = np.concatenate([
+                np.argmax(full[start:start + SCAN_BLOCK_ROWS] @ centroids.T, axis=1)
+                for start in range(0, count, SCAN_BLOCK_ROWS)
+            ])
+            rows = np.argsort(assignment, kind="stable")
+            list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+            np.save(tmp / "centroids.npy", centroids)
+            np.save(tmp / "list_offsets.npy", list_offsets.astype(np.int64))
+        else:
+            rows = np.arange(count)
+        np.save(tmp / "rows.npy", rows.astype(np.int64))
+
+        # Pass 3: quantize in list order
+        vectors = np.lib.format.open_memmap(tmp / "vectors.npy", mode="w+",
+                                            dtype=np.int8 if dtype == "int8" else np.float16,
+                                            shape=(count, dim))
+        scales = np.ones(count, dtype=np.float32)
+        for start in range(0, count, SCAN_BLOCK_ROWS):
+            values, block_scales = _quantize(np.asarray(full[rows[start:start + SCAN_BLOCK_ROWS]]), dtype)
+            vectors[start:start + len(values)] = values
+            if block_scales is not None:
+                scales[start:start + len(values)] = block_scales
+        vectors.flush()
+        if dtype == "int8":
+            np.save(tmp / "scales.npy", scales)
+        del vectors, full
+        if not keep_float32:
+            (tmp / "full.npy").unlink()
+
+        with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"dtype": dtype, "dim": dim, "count": count, "lists": n_lists,
+                       "float32": keep_float32}, f)
+
+        # Swap the new index in; readers keep their mmaps of the old files until they reopen
+        old = None
+        if final.exists():
+            old = final.parent / f".{final.name}.old-{uuid.uuid4().hex[:8]}"
+            os.replace(final, old)
+        os.replace(tmp, final)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return MmapVectorIndex(str(final))
+
+
+def export_from_chroma(store: Any, path: str, **kwargs: Any) -> "MmapVectorIndex":
+    """Build an index from every chunk in a (LangChain) Chroma store"""
+    count = store._collection.count()
+
+    def batches() -> Iterator[Tuple[List[str], List[List[float]], List[str], List[Dict[str, Any]]]]:
+        for offset in range(0, count, EXPORT_BATCH_SIZE):
+            page = store.get(include=["embeddings", "documents", "metadatas"],
+                             limit=EXPORT_BATCH_SIZE, offset=offset)
+            yield page["ids"], page["embeddings"], page["documents"], page["metadatas"]
+
+    return build_index(path, batches(), count, **kwargs)
+
+
+def index_path(db_dir: str) -> str:
+    return os.path.join(db_dir, INDEX_DIRNAME)
+
+
+class MmapVectorIndex:
+    """Read-only view of an index directory, searched by cosine similarity"""
+
+    def __init__(self, path: str, rerank_candidates: int = RERANK_CANDIDATES, nprobe: int = IVF_NPROBE):
+        self.path = Path(path)
+        self.rerank_candidates = rerank_candidates
+        self.nprobe = nprobe
+        meta_path = self.path / "meta.json"
+        stat = meta_path.stat()
+        self._version = (stat.st_ino, stat.st_mtime_ns)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.count = self.meta["count"]
+
+        load = lambda name: np.load(self.path / name, mmap_mode="r")  # noqa: E731
+        self.vectors = load("vectors.npy")
+        self.scales = load("scales.npy") if self.meta["dtype"] == "int8" else None
+        self.rows = load("rows.npy")
+        self.full = load("full.npy") if self.meta["float32"] else None
+        self.centroids = np.load(self.path / "centroids.npy") if self.meta["lists"] else None
+        self.list_offsets = np.load(self.path / "list_offsets.npy") if self.meta["lists"] else None
+        self.doc_offsets = load("doc_offsets.npy")
+        # Read with pread, which is safe to share between threads
+        self._docs_fd = os.open(self.path / "docs.jsonl", os.O_RDONLY)
+        self._positions: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def is_stale(self) -> bool:
+        """Whether the index on disk has been rebuilt since this view was opened"""
+        try:
+            stat = (self.path / "meta.json").stat()
+        except FileNotFoundError:
+            return False  # mid-swap; keep serving this version
+        return (stat.st_ino, stat.st_mtime_ns) != self._version
+
+    def _scan(self, query: np.ndarray, start: int, end: int) -> np.ndarray:
+        """Approximate scores of vectors[start:end], dequantized block by block"""
+        scores = np.empty(end - start, dtype=np.float32)
+        for block_start in range(start, end, SCAN_BLOCK_ROWS):
+            block_end = min(block_start + SCAN_BLOCK_ROWS, end)
+            block = self.vectors[block_start:block_end].astype(np.float32) @ query
+            if self.scales is not None:
+                block *= self.scales[block_start:block_end]
+            scores[block_start - start:block_end - start] = block
+        return scores
+
+    def search(self, embedding: Sequence[float], k: int) -> List[Tuple[int, float]]:
+        """Return (original row, cosine similarity) of the k nearest vectors, best first"""
+        if not self.count or k <= 0:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        wanted = max(k, self.rerank_candidates) if self.full is not None else k
+
+        if self.centroids is not None:
+            lists = _top(self.centroids @ query, self.nprobe)
+            spans = [(int(self.list_offsets[i]), int(self.list_offsets[i + 1])) for i in lists]
+            positions = np.concatenate([np.arange(start, end) for start, end in spans])
+            scores = np.concatenate([self._scan(query, start, end) for start, end in spans])
+        else:
+            positions = None
+            scores = self._scan(query, 0, self.count)
+
+        best = _top(scores, wanted)
+        candidates = best if positions is None else positions[best]
+        rows = np.asarray(self.rows[candidates])
+        scores = scores[best]
+
+        if self.full is not None:
+            # Exact scores for the shortlist; reading sorted rows keeps page faults sequential
+            order = np.argsort(rows)
+            exact = np.empty(len(rows), dtype=np.float32)
+            exact[order] = self.full[rows[order]] @ query
+            scores = exact
+        top = _top(scores, k)
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def _document(self, row: int) -> Document:
+        start, end = int(self.doc_offsets[row]), int(self.doc_offsets[row + 1])
+        record = json.loads(os.pread(self._docs_fd, end - start, start))
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+    def similarity_search_by_vector(self, embedding: Sequence[float], k: int = 4) -> List[Document]:
+        """The k most similar chunks, as the Chroma store returns them"""
+        return [self._document(row) for row, _ in self.search(embedding, k)]
+
+    def get(self, ids: Sequence[str], include: Sequence[str] = ("documents", "metadatas")) -> Dict[str, list]:
+        """Load chunks by ID, in the shape Chroma's get returns"""
+        if self._positions is None:
+            with open(self.path / "ids.txt", "r", encoding="utf-8") as f:
+                self._positions = {line.rstrip("\n"): row for row, line in enumerate(f)}
+        found = {"ids": [], "documents": [], "metadatas": []}
+        for chunk_id in ids:
+            row = self._positions.get(chunk_id)
+            if row is None:
+                continue
+            doc = self._document(row)
+            found["ids"].append(chunk_id)
+            found["documents"].append(doc.page_content)
+            found["metadatas"].append(doc.metadata)
+        return found
+
+    def close(self) -> None:
+        if self._docs_fd is not None:
+            os.close(self._docs_fd)
+            self._docs_fd = None
+
+    def __del__(self) -> None:
+        # A view replaced after a rebuild is closed once no request still holds it
+        if getattr(self, "_docs_fd", None) is not None:
+            self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Export the Chroma store into a memory-mapped index")
+    parser.add_argument("--db-dir", type=str, default=str(Path(__file__).parent.parent.parent / "chromadb"),
+                        help="Chroma directory; the index is written to <db-dir>/" + INDEX_DIRNAME)
+    parser.add_argument("--dtype", choices=["int8", "float16"], default=DEFAULT_DTYPE)
+    parser.add_argument("--no-float32", action="store_true", help="Do not keep float32 vectors for re-ranking")
+    args = parser.parse_args()
+
+    from langchain_community.vectorstores import Chroma
+    index = export_from_chroma(Chroma(persist_directory=args.db_dir), index_path(args.db_dir),
+                               dtype=args.dtype, keep_float32=not args.no_float32)
+    print(f"Exported {len(index)} vectors to {index.path}")
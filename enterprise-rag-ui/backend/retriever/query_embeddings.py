@@ -0,0 +1,209 @@
+"""
+Query Embedding Cache and Micro-Batching
+
+Every question is embedded before search can start, so that round trip to the
+embedding model is a fixed latency floor per request. Embeddings are kept in a
+size-bounded LRU cache keyed by (model, normalized question), so repeated
+questions skip the round trip entirely, and concurrent requests for the same
+question share one in-flight call.
+
+Distinct questions that arrive within a few milliseconds of each other can be
+grouped into one request by the micro-batcher: the first question in a batch
+waits at most the batch window for others to join, and a full batch is sent at
+once.
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from metrics import CACHE_LOOKUPS
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+# Milliseconds a query waits for others to batch with; 0 sends each query on its own
+BATCH_WINDOW_MS = float(os.environ.get("QUERY_EMBED_BATCH_WINDOW_MS", "5"))
+MAX_BATCH_SIZE = int(os.environ.get("QUERY_EMBED_MAX_BATCH", "32"))
+
+Vector = List[float]
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase and collapse whitespace, so trivially different questions share an entry"""
+    return " ".join(text.lower().split())
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU cache of query embeddings keyed by (model, normalized text)"""
+
+    def __init__(self, max_entries: int = QUERY_EMBEDDING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Vector]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model: str, text: str) -> Optional[Vector]:
+        key = (model, normalize_query(text))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(cache="query_embedding", result="miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        CACHE_LOOKUPS.inc(cache="query_embedding", result="hit")
+        return vector
+
+    def put(self, model: str, text: str, vector: Vector) -> None:
+        if self.max_entries <= 0:
+            return
+        key = (model, normalize_query(text))
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class MicroBatcher:
+    """Groups texts submitted within a short window into one embed_batch call"""
+
+    def __init__(self, embed_batch: Callable[[List[str]], Awaitable[List[Vector]]],
+                 window_seconds: float = BATCH_WINDOW_MS / 1000, max_batch_size: int = MAX_BATCH_SIZE):
+        self.embed_batch = embed_batch
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The event loop only holds weak references to tasks, so in-flight sends are kept here
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.texts = 0
+
+    async def embed(self, text: str) -> Vector:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def aclose(self) -> None:
+        """Cancel queued texts and in-flight batches, e.g. at shutdown"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        for _, future in batch:
+            future.cancel()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.texts += len(batch)
+        try:
+            vectors = await self.embed_batch([text for text, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+
+class QueryEmbedder:
+    """Embeds questions through the cache, sharing in-flight calls and optionally batching them"""
+
+    def __init__(self, embed_one: Callable[[str], Vector],
+                 aembed_one: Callable[[str], Awaitable[Vector]],
+                 aembed_batch: Optional[Callable[[List[str]], Awaitable[List[Vector]]]] = None,
+                 cache: Optional[QueryEmbeddingCache] = None,
+                 window_seconds: float = BATCH_WINDOW_MS / 1000,
+                 max_batch_size: int = MAX_BATCH_SIZE):
+        self.embed_one = embed_one
+        self.aembed_one = aembed_one
+        self.cache = cache if cache is not None else QueryEmbeddingCache()
+        self.batcher = (MicroBatcher(aembed_batch, window_seconds, max_batch_size)
+                        if aembed_batch is not None and window_seconds > 0 else None)
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    def embed(self, model: str, text: str) -> Vector:
+        """Embed a question, from the cache when possible"""
+        vector = self.cache.get(model, text)
+        if vector is None:
+            vector = self.embed_one(text)
+            self.cache.put(model, text, vector)
+        return vector
+
+    async def aembed(self, model: str, text: str) -> Vector:
+        """Embed a question without blocking, from the cache or a shared in-flight call"""
+        vector = self.cache.get(model, text)
+        if vector is not None:
+            return vector
+
+        key = (model, normalize_query(text))
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            return await asyncio.shield(in_flight)
+
+        async def fetch() -> Vector:
+            try:
+                vector = await (self.batcher.embed(text) if self.batcher else self.aembed_one(text))
+                self.cache.put(model, text, vector)
+                return vector
+            finally:
+                del self._in_flight[key]
+
+        future = self._in_flight[key] = asyncio.ensure_future(fetch())
+        # Shielded so a cancelled request does not cancel the call others are waiting on
+        return await asyncio.shield(future)
+
+    async def aclose(self) -> None:
+        """Cancel any batched embedding calls still in flight"""
+        if self.batcher is not None:
+            await self.batcher.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"cache": self.cache.stats(), "batching": self.batcher is not None}
+        if self.batcher is not None:
+            stats["batches"] = self.batcher.batches
+            stats["batched_queries"] = self.batcher.texts
+        return stats
@@ -0,0 +1,236 @@
+"""
+Re-ranking
+
+Second retrieval stage: the first stage (dense + BM25 fusion) cheaply gathers
+a wide pool of candidates, and a local CPU scorer re-orders the pool so only
+the best few chunks reach the prompt. Two scorers are available:
+
+- "overlap" (no dependencies): IDF-weighted coverage of the
+  question's terms, a bonus for matched word pairs, and bonuses when the
+  question names a patent number or claim number the chunk belongs to.
+- "cross-encoder": a small sentence-transformers cross-encoder, used when
+  that package is installed.
+
+Re-ranking is off unless RERANKER names a scorer (see retriever/search.py):
+neither scorer has been evaluated against real patent questions yet.
+
+Candidates are scored in batches. Scores are cached per (scorer, question,
+chunk), so a repeated question re-scores nothing. Each batch is sized from
+the measured time per candidate so it fits in what is left of the time
+budget; the first batch, before anything is measured, scores one candidate.
+If the budget runs out (or scoring fails), the first-stage order is used
+instead.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain.docstore.document import Document
+
+from metrics import CACHE_LOOKUPS, counter, timed
+from retriever.bm25 import BM25Index, tokenize
+from retriever.query_embeddings import normalize_query
+
+logger = logging.getLogger(__name__)
+
+RERANK_BUDGET_MS = float(os.environ.get("RERANK_BUDGET_MS", "100"))
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE", "16"))
+RERANK_CACHE_SIZE = int(os.environ.get("RERANK_CACHE_SIZE", "50000"))
+CROSS_ENCODER_MODEL = os.environ.get("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+RERANKS = counter("rag_reranks_total", "Re-ranking runs by outcome", ["outcome"])
+
+PATENT_NUMBER = re.compile(r"\b(?:us)?(\d{7,8})\b")
+CLAIM_NUMBER = re.compile(r"\bclaims? (\d+)\b")
+# Question words that say nothing about which chunk answers it
+QUESTION_WORDS = frozenset([
+    "what", "which", "who", "how", "why", "when", "where", "does", "do", "did", "can",
+    "about", "describe", "explain", "tell", "me", "its", "their", "there", "any",
+])
+
+
+class OverlapScorer:
+    """Scores chunks by how much of the question they contain, weighted by term rarity"""
+
+    name = "overlap"
+
+    def __init__(self, keyword_index: Optional[Callable[[], BM25Index]] = None,
+                 phrase_weight: float = 0.5, claim_weight: float = 1.0, patent_weight: float = 0.5):
+        # Called per batch, so a reloaded keyword index is picked up
+        self.keyword_index = keyword_index
+        self.phrase_weight = phrase_weight
+        self.claim_weight = claim_weight
+        self.patent_weight = patent_weight
+
+    def score(self, question: str, docs: Sequence[Document]) -> List[float]:
+        lowered = question.lower()
+        terms = [t for t in tokenize(lowered) if t not in QUESTION_WORDS]
+        index = self.keyword_index() if self.keyword_index else None
+        weights = {t: index.idf(t) if index is not None and len(index) else 1.0 for t in set(terms)}
+        total_weight = sum(weights.values()) or 1.0
+        pairs = set(zip(terms, terms[1:]))
+        numbers = set(PATENT_NUMBER.findall(lowered.replace(",", "")))
+        claims = {int(n) for n in CLAIM_NUMBER.findall(lowered)}
+
+        scores = []
+        for doc in docs:
+            doc_terms = tokenize(doc.page_content)
+            present = set(doc_terms)
+            score = sum(weight for term, weight in weights.items() if term in present) / total_weight
+            if pairs:
+                doc_pairs = set(zip(doc_terms, doc_terms[1:]))
+                score += self.phrase_weight * len(pairs & doc_pairs) / len(pairs)
+            if claims and doc.metadata.get("claim_number") in claims:
+                score += self.claim_weight
+            if numbers:
+                source = f"{doc.metadata.get('patent_number') or ''} {doc.metadata.get('filename', '')}"
+                if any(number in source for number in numbers):
+                    score += self.patent_weight
+            scores.append(score)
+        return scores
+
+
+class CrossEncoderScorer:
+    """Scores (question, chunk) pairs with a sentence-transformers cross-encoder on the CPU"""
+
+    name = "cross-encoder"
+
+    def __init__(self, model_name: str = CROSS_ENCODER_MODEL):
+        from sentence_transformers import CrossEncoder  # optional dependency
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def score(self, question: str, docs: Sequence[Document]) -> List[float]:
+        pairs = [(question, doc.page_content) for doc in docs]
+        return [float(s) for s in self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)]
+
+
+class ScoreCache:
+    """Thread-safe LRU cache of re-ranking scores keyed by (scorer, normalized question, chunk ID)"""
+
+    def __init__(self, max_entries: int = RERANK_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Sequence[Tuple[str, str, str]]) -> Dict[Tuple[str, str, str], float]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                score = self._entries.get(key)
+                if score is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = score
+        if found:
+            CACHE_LOOKUPS.inc(len(found), cache="rerank", result="hit")
+        if len(keys) > len(found):
+            CACHE_LOOKUPS.inc(len(keys) - len(found), cache="rerank", result="miss")
+        return found
+
+    def put_many(self, scores: Dict[Tuple[str, str, str], float]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key, score in scores.items():
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Reranker:
+    """Re-orders first-stage candidates with a scorer, within a time budget"""
+
+    def __init__(self, scorer, chunk_id: Callable[[Document], str],
+                 budget_seconds: float = RERANK_BUDGET_MS / 1000,
+                 batch_size: int = RERANK_BATCH_SIZE,
+                 cache: Optional[ScoreCache] = None):
+        self.scorer = scorer
+        self.chunk_id = chunk_id
+        self.budget_seconds = budget_seconds
+        self.batch_size = max(1, batch_size)
+        self.cache = cache if cache is not None else ScoreCache()
+        # Measured scoring time per candidate, used to size batches to the budget
+        self.seconds_per_candidate: Optional[float] = None
+
+    def rerank(self, question: str, candidates: List[Document], k: int) -> List[Document]:
+        """Return the k best candidates, or the first k in first-stage order if scoring overruns"""
+        if len(candidates) <= 1:
+            return candidates[:k]
+        with timed("rerank"):
+            scores = self._scores(question, candidates)
+        if scores is None:
+            return candidates[:k]
+        RERANKS.inc(outcome="reranked")
+        # Ties keep their first-stage order
+        order = sorted(range(len(candidates)), key=lambda i: -scores[i])
+        return [candidates[i] for i in order[:k]]
+
+    def _scores(self, question: str, candidates: List[Document]) -> Optional[List[float]]:
+        deadline = time.perf_counter() + self.budget_seconds
+        normalized = normalize_query(question)
+        keys = [(self.scorer.name, normalized, self.chunk_id(doc)) for doc in candidates]
+        scores = self.cache.get_many(keys)
+        pending = [i for i, key in enumerate(keys) if key not in scores]
+
+        done = 0
+        while done < len(pending):
+            batch_size = self._batch_size(deadline - time.perf_counter())
+            if batch_size < 1:
+                RERANKS.inc(outcome="timeout")
+                logger.debug("Re-ranking %r ran out of time after %d of %d candidates",
+                             question, done, len(pending))
+                return None
+            batch = pending[done:done + batch_size]
+            started = time.perf_counter()
+            try:
+                batch_scores = self.scorer.score(question, [candidates[i] for i in batch])
+            except Exception as e:
+                RERANKS.inc(outcome="error")
+                logger.warning("Re-ranking failed, keeping first-stage order: %s", e)
+                return None
+            self._measure((time.perf_counter() - started) / len(batch))
+            new_scores = {keys[i]: score for i, score in zip(batch, batch_scores)}
+            # Cached even if the budget runs out later, so a retry has less to score
+            self.cache.put_many(new_scores)
+            scores.update(new_scores)
+            done += len(batch)
+        return [scores[key] for key in keys]
+
+    def _batch_size(self, remaining: float) -> int:
+        """How many candidates to score next so the batch ends within the remaining budget"""
+        if remaining <= 0:
+            return 0
+        if self.seconds_per_candidate is None:
+            return 1
+        if self.seconds_per_candidate <= 0:
+            return self.batch_size
+        return min(self.batch_size, int(remaining / self.seconds_per_candidate))
+
+    def _measure(self, seconds: float) -> None:
+        # Rises at once on a slow batch and falls slowly, so batches err on the small side
+        previous = self.seconds_per_candidate
+        self.seconds_per_candidate = seconds if previous is None else max(seconds, 0.8 * previous + 0.2 * seconds)
+
+
+def load_scorer(name: str, keyword_index: Optional[Callable[[], BM25Index]] = None):
+    """Build the named scorer, falling back to the overlap scorer if a model cannot be loaded"""
+    if name == "cross-encoder":
+        try:
+            return CrossEncoderScorer()
+        except ImportError:
+            logger.warning("sentence-transformers is not installed; re-ranking with the overlap scorer")
+    elif name != "overlap":
+        raise ValueError(f"Unknown re-ranker: {name}")
+    return OverlapScorer(keyword_index)
@@ -1,23 +1,246 @@
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import Chroma
+from langchain.docstore.document import Document
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+import httpx
 
-embedding_model = OllamaEmbeddings(model="nomic-embed-text")
+from concurrency import get_limiter
+from metrics import timed
+from resources import lazy_resource
+from retriever.bm25 import INDEX_FILENAME, LOG_SUFFIX, BM25Index, reciprocal_rank_fusion
+from retriever.mmap_index import VECTOR_BACKEND, MmapVectorIndex, export_from_chroma, index_path
+from retriever.query_embeddings import QueryEmbedder
+from retriever.rerank import Reranker, load_scorer
 
-vectorstore = Chroma(
-    persist_directory="chromadb",
-    embedding_function=embedding_model
-)
+logger = logging.getLogger(__name__)
 
-retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+# Same store the ingestion pipeline writes to (enterprise-rag-ui/chromadb)
+DB_DIR = os.environ.get("CHROMA_DIR", str(Path(__file__).parent.parent.parent / "chromadb"))
 
-def retrieve_context(question: str):
-    results = retriever.get_relevant_documents(question)
+# Retrieval settings: final number of chunks, candidates taken from each
+# ranking, and the reciprocal-rank-fusion weights and constant
+RETRIEVAL_K = int(os.environ.get("RETRIEVAL_K", "3"))
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", "20"))
+VECTOR_WEIGHT = float(os.environ.get("HYBRID_VECTOR_WEIGHT", "1.0"))
+KEYWORD_WEIGHT = float(os.environ.get("HYBRID_KEYWORD_WEIGHT", "1.0"))
+RRF_K = int(os.environ.get("RRF_K", "60"))
+
+# Second stage: re-rank this many first-stage candidates with a local scorer
+# ("overlap" or "cross-encoder"). Off by default: the scorers have only been
+# compared on a synthetic benchmark, not on real patent questions
+RERANKER = os.environ.get("RERANKER", "none")
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "50"))
+
+# Batch concurrent query embeddings into one /api/embed request: "1", "0", or "auto".
+# That endpoint returns unit-length vectors while documents were embedded through
+# /api/embeddings, which does not normalize; the two only rank alike under cosine
+# similarity, so "auto" batches only for the memory-mapped index
+QUERY_EMBED_BATCH = os.environ.get("QUERY_EMBED_BATCH", "auto")
+
+def _load_embedding_model():
+    from langchain_community.embeddings import OllamaEmbeddings
+    return OllamaEmbeddings(model="nomic-embed-text")
+
+def _load_vectorstore():
+    from langchain_community.vectorstores import Chroma
+    if VECTOR_BACKEND == "mmap":
+        # Quantized, memory-mapped export of the Chroma store (see retriever/mmap_index.py)
+        path = index_path(DB_DIR)
+        if not os.path.isfile(os.path.join(path, "meta.json")):
+            logger.warning("No memory-mapped index in %s; exporting it from the Chroma store", DB_DIR)
+            return export_from_chroma(Chroma(persist_directory=DB_DIR), path)
+        return MmapVectorIndex(path)
+    return Chroma(
+        persist_directory=DB_DIR,
+        embedding_function=embedding_model.get()
+    )
+
+def _load_reranker():
+    if RERANKER == "none":
+        return None
+    return Reranker(load_scorer(RERANKER, keyword_index), _chunk_id)
+
+# Built on first use (or by warm_up), not at import time
+embedding_model = lazy_resource("embeddings", _load_embedding_model)
+vectorstore = lazy_resource("vectorstore", _load_vectorstore)
+reranker = lazy_resource("reranker", _load_reranker)
+
+# BM25 index written by ingestion; reloaded whenever its snapshot or journal changes
+_keyword_index = BM25Index()
+_keyword_index_version = None
+_keyword_index_lock = threading.Lock()
+
+def _keyword_index_files_version(path: str):
+    """(mtime, size) of the snapshot and its journal, or None if neither exists"""
+    version = []
+    for file_path in (path, path + LOG_SUFFIX):
+        try:
+            stat = os.stat(file_path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version) if any(version) else None
+
+def keyword_index() -> BM25Index:
+    """Return the BM25 index, reloading it if ingestion has written to it"""
+    global _keyword_index, _keyword_index_version
+    path = os.path.join(DB_DIR, INDEX_FILENAME)
+    version = _keyword_index_files_version(path)
+    if version is None:
+        return _keyword_index
+    if version != _keyword_index_version:
+        with _keyword_index_lock:
+            if version != _keyword_index_version:
+                # Loaded into a new object: searches in flight keep the old one
+                _keyword_index = BM25Index.load(path)
+                _keyword_index_version = version
+    return _keyword_index
+
+def current_vectorstore():
+    """Return the vector store, reopening the memory-mapped index if ingestion has rebuilt it"""
+    store = vectorstore.get()
+    if isinstance(store, MmapVectorIndex) and store.is_stale():
+        store = MmapVectorIndex(str(store.path))
+        vectorstore.set(store)
+    return store
+
+def _chunk_id(doc: Document) -> str:
+    """Identify a chunk by its stored ID (content hash for chunks ingested without one)"""
+    return doc.metadata.get("chunk_id") or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+def _fetch_chunks(ids):
+    """Load chunks by ID from the vector store"""
+    found = current_vectorstore().get(ids=list(ids), include=["documents", "metadatas"])
+    return {
+        chunk_id: Document(page_content=text, metadata=metadata or {})
+        for chunk_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+    }
+
+def get_chunks(ids):
+    """Load chunks by ID, in the given order, without any embedding or similarity search"""
+    chunks = _fetch_chunks(ids) if ids else {}
+    return [chunks[chunk_id] for chunk_id in ids if chunk_id in chunks]
+
+def first_stage_search(question: str, query_embedding, n: int):
+    """Fuse dense and BM25 rankings with reciprocal-rank fusion and return the top-n chunks"""
+    store = current_vectorstore()
+    index = keyword_index()
+    if not len(index):
+        with timed("vector_search"):
+            return store.similarity_search_by_vector(query_embedding, k=n)
+    
+    candidates = max(HYBRID_CANDIDATES, n)
+    with timed("vector_search"):
+        vector_docs = store.similarity_search_by_vector(query_embedding, k=candidates)
+    docs_by_id = {_chunk_id(doc): doc for doc in vector_docs}
+    with timed("keyword_search"):
+        keyword_ids = [chunk_id for chunk_id, _ in index.search(question, candidates)]
+    
+    fused = reciprocal_rank_fusion(
+        [list(docs_by_id), keyword_ids],
+        weights=[VECTOR_WEIGHT, KEYWORD_WEIGHT],
+        k=RRF_K
+    )
+    top_ids = [chunk_id for chunk_id, _ in fused[:n]]
     
-    print(f"\n🔍 Question: {question}")
-    print("\n📎 Top Matching Chunks:\n")
-    for i, doc in enumerate(results):
-        print(f"--- Chunk {i+1} ---")
-        print(doc.page_content[:500])  # print first 500 characters
-        print("\n")
+    # Keyword-only hits still have to be loaded from the store
+    missing = [chunk_id for chunk_id in top_ids if chunk_id not in docs_by_id]
+    if missing:
+        with timed("vector_search"):
+            docs_by_id.update(_fetch_chunks(missing))
+    return [docs_by_id[chunk_id] for chunk_id in top_ids if chunk_id in docs_by_id]
 
+def hybrid_search(question: str, query_embedding, k: int = RETRIEVAL_K):
+    """Return the top-k chunks: first-stage fusion, re-ranked over a wider pool when enabled"""
+    rerank = reranker.get()
+    if rerank is None:
+        return first_stage_search(question, query_embedding, k)
+    candidates = first_stage_search(question, query_embedding, max(k, RERANK_CANDIDATES))
+    return rerank.rerank(question, candidates, k)
+
+# Shared async HTTP client for query embeddings, created on first use
+_async_client = None
+
+def _client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(timeout=60)
+    return _async_client
+
+def _embed_one(question: str):
+    return embedding_model.get().embed_query(question)
+
+async def _aembed_one(question: str):
+    # Same request OllamaEmbeddings.embed_query makes, sent asynchronously
+    model = embedding_model.get()
+    payload = {
+        **model._default_params,
+        "prompt": f"{model.query_instruction}{question}",
+    }
+    async with get_limiter("ollama"):
+        response = await _client().post(f"{model.base_url}/api/embeddings", json=payload)
+    if response.status_code != 200:
+        raise ValueError(f"Error raised by inference API HTTP code: {response.status_code}, {response.text}")
+    return response.json()["embedding"]
+
+async def _aembed_batch(questions):
+    """Embed several questions in one request (Ollama's batch endpoint, 0.3 and later)"""
+    if len(questions) == 1:
+        return [await _aembed_one(questions[0])]
+    model = embedding_model.get()
+    payload = {
+        **model._default_params,
+        "input": [f"{model.query_instruction}{question}" for question in questions],
+    }
+    async with get_limiter("ollama"):
+        response = await _client().post(f"{model.base_url}/api/embed", json=payload)
+    if response.status_code == 404:
+        # Older Ollama without the batch endpoint: one request per question
+        return list(await asyncio.gather(*(_aembed_one(question) for question in questions)))
+    if response.status_code != 200:
+        raise ValueError(f"Error raised by inference API HTTP code: {response.status_code}, {response.text}")
+    return response.json()["embeddings"]
+
+_batch_queries = QUERY_EMBED_BATCH == "1" or (QUERY_EMBED_BATCH == "auto" and VECTOR_BACKEND == "mmap")
+
+# Repeated questions skip the embedding model; concurrent ones share calls (and batch)
+query_embedder = QueryEmbedder(_embed_one, _aembed_one, _aembed_batch if _batch_queries else None)
+
+def embed_query(question: str):
+    """Embed a question once so callers can reuse the vector"""
+    model = embedding_model.get()
+    with timed("embed_query"):
+        return query_embedder.embed(model.model, question)
+
+def retrieve_context(question: str, query_embedding=None):
+    if query_embedding is None:
+        query_embedding = embed_query(question)
+    results = hybrid_search(question, query_embedding)
+    
+    _log_results(question, results)
     return results
+
+async def aembed_query(question: str):
+    """Embed a question without blocking the event loop"""
+    model = embedding_model.get()
+    with timed("embed_query"):
+        return await query_embedder.aembed(model.model, question)
+
+async def aretrieve_context(question: str, query_embedding=None):
+    """Async retrieve_context: embeds asynchronously and runs the search on the Chroma pool"""
+    if query_embedding is None:
+        query_embedding = await aembed_query(question)
+    results = await get_limiter("chroma").run(hybrid_search, question, query_embedding)
+    
+    _log_results(question, results)
+    return results
+
+def _log_results(question, results):
+    # Skip building the message entirely unless debug logging is on
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    logger.debug("Top %d chunks for %r: %s", len(results), question,
+                 ", ".join(_chunk_id(doc)[:24] for doc in results))
@@ -0,0 +1,200 @@
+"""
+Document Loader Benchmark
+
+Writes the same synthetic patents as TXT, DOCX and PDF files and measures how
+fast each registered loader (backend/ingestion/loaders.py) extracts them,
+reporting per format:
+
+- files per second, input MB per second and extracted characters per second
+- the bytes on disk per patent
+
+Where the libraries are installed, the alternatives the loaders replaced are
+measured on the same files for comparison: plain read() for TXT, python-docx
+for DOCX and PyPDF2 for PDF.
+
+Usage (from enterprise-rag-ui):
+    python benchmarks/loader_benchmark.py --patents 200
+    python benchmarks/loader_benchmark.py --patents 10 --paragraphs 4000  # multi-MB files
+"""
+
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+from xml.sax.saxutils import escape
+
+import fitz  # PyMuPDF
+
+# Import backend modules the way the backend does
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from ingestion.loaders import LOADERS  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+WORDS = ("housing electrode substrate layer sensor signal controller module circuit assembly "
+         "configured coupled wherein comprising surface member portion channel fluid valve").split()
+
+
+def generate_patent(i: int, rng: random.Random, paragraphs: int = 40) -> List[str]:
+    """A patent as a list of paragraphs, in the layout the chunker expects"""
+    sentence = lambda n: " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+    body = [f"Title: Patent {i}", f"Abstract: {' '.join(sentence(14) for _ in range(4))}"]
+    body += [" ".join(sentence(16) for _ in range(5)) for _ in range(paragraphs)]
+    body.append("Claims:")
+    body += [f"{n}. {sentence(30)}" for n in range(1, 21)]
+    return body
+
+
+def write_txt(path: Path, paragraphs: List[str]) -> None:
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+
+
+_DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="word/document.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+
+
+def write_docx(path: Path, paragraphs: List[str]) -> None:
+    """A minimal but valid DOCX: one run per paragraph"""
+    body = "".join(f"<w:p><w:r><w:t>{escape(p)}</w:t></w:r></w:p>" for p in paragraphs)
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f'<w:body>{body}</w:body></w:document>')
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _DOCX_RELS)
+        archive.writestr("word/document.xml", document)
+
+
+def write_pdf(path: Path, paragraphs: List[str]) -> None:
+    doc = fitz.open()
+    text = "\n\n".join(paragraphs)
+    per_page = 2500  # characters that fit in the text box at 9pt
+    while text:
+        doc.new_page().insert_textbox(fitz.Rect(50, 50, 545, 790), text[:per_page], fontsize=9)
+        text = text[per_page:]
+    doc.save(str(path))
+    doc.close()
+
+
+WRITERS: Dict[str, Callable[[Path, List[str]], None]] = {
+    ".txt": write_txt,
+    ".docx": write_docx,
+    ".pdf": write_pdf,
+}
+
+
+def _read_txt(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def _python_docx(path: str) -> str:
+    import docx
+    return "\n\n".join(p.text for p in docx.Document(path).paragraphs)
+
+
+def _pypdf2(path: str) -> str:
+    from PyPDF2 import PdfReader
+    return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+
+
+# extension -> {name: loader}; alternatives whose library is missing are skipped
+ALTERNATIVES: Dict[str, Dict[str, Callable[[str], str]]] = {
+    ".txt": {"read": _read_txt},
+    ".docx": {"python-docx": _python_docx},
+    ".pdf": {"PyPDF2": _pypdf2},
+}
+
+
+def measure(loader: Callable[[str], str], files: List[Path], repeats: int) -> Dict[str, Any]:
+    """Extract every file repeats times and report throughput"""
+    total_bytes = sum(f.stat().st_size for f in files)
+    chars = 0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for f in files:
+            chars += len(loader(str(f)))
+    seconds = time.perf_counter() - start
+    return {
+        "files_per_s": round(len(files) * repeats / seconds, 1),
+        "input_mb_per_s": round(total_bytes * repeats / 2**20 / seconds, 2),
+        "chars_per_s": round(chars / seconds),
+        "ms_per_file": round(seconds * 1000 / (len(files) * repeats), 3),
+    }
+
+
+def run_benchmark(n_patents: int = 200, repeats: int = 3, paragraphs: int = 40) -> Dict[str, Any]:
+    rng = random.Random(11)
+    patents = [generate_patent(i, rng, paragraphs) for i in range(n_patents)]
+    work_dir = Path(tempfile.mkdtemp(prefix="loader-bench-"))
+    try:
+        results = {}
+        for extension, write in WRITERS.items():
+            files = []
+            for i, patent in enumerate(patents):
+                path = work_dir / f"US{10000000 + i}{extension}"
+                write(path, patent)
+                files.append(path)
+
+            loaders = {"registry": LOADERS[extension]}
+            for name, alternative in ALTERNATIVES.get(extension, {}).items():
+                try:
+                    alternative(str(files[0]))
+                except ImportError:
+                    continue
+                loaders[name] = alternative
+
+            results[extension.lstrip(".")] = {
+                "bytes_per_patent": sum(f.stat().st_size for f in files) // len(files),
+                "loaders": {name: measure(loader, files, repeats) for name, loader in loaders.items()},
+            }
+        return {"patents": n_patents, "paragraphs": paragraphs, "repeats": repeats, "formats": results}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark document extraction throughput per format")
+    parser.add_argument("--patents", type=int, default=200, help="Synthetic patents written per format")
+    parser.add_argument("--paragraphs", type=int, default=40,
+                        help="Description paragraphs per patent (about 800 bytes each)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the files")
+    parser.add_argument("--output", type=str, default=None,
+                        help="JSON output path (default: benchmarks/results/loaders-<timestamp>.json)")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.patents, args.repeats, args.paragraphs)
+    print(json.dumps(result, indent=2))
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"loaders-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"created_at": datetime.now().isoformat(), "result": result}, f, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Relevance Classifier Benchmark
+
+Compares the compiled patent-relevance classifier against the previous
+keyword-loop implementation on a labeled question set
+(benchmarks/data/relevance_questions.jsonl), reporting:
+
+- per-call latency (mean and p99, in microseconds)
+- precision, recall and accuracy for the "patent related" label
+- the misclassified questions
+
+Usage (from enterprise-rag-ui):
+    python benchmarks/relevance_benchmark.py
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+# Import backend modules the way the backend does
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from llm.relevance import is_patent_related  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+LABELED_QUESTIONS = Path(__file__).resolve().parent / "data" / "relevance_questions.jsonl"
+
+# The classifier this benchmark was written to replace, kept for comparison
+LEGACY_KEYWORDS = [
+    'patent', 'intellectual property', 'ip', 'invention', 'inventor', 'claim',
+    'prior art', 'novelty', 'non-obvious', 'utility', 'provisional', 'pct',
+    'uspto', 'epo', 'wipo', 'trademark', 'copyright', 'trade secret',
+    'infringement', 'licensing', 'royalty', 'assignee', 'assignor', 'filing',
+    'examination', 'prosecution', 'office action', 'rejection', 'allowance',
+    'grant', 'issue', 'maintenance', 'term', 'expiration', 'invalidation',
+    'reexamination', 'continuation', 'divisional', 'cip', 'rce', 'ipr', 'pgr',
+    'interference', 'opposition', 'appeal', 'litigation', 'injunction', 'damages'
+]
+
+
+def legacy_is_patent_related(question: str) -> bool:
+    question_lower = question.lower()
+    for keyword in LEGACY_KEYWORDS:
+        if keyword in question_lower:
+            return True
+    patent_patterns = [
+        r'\b[a-z]{2}\d{6,}\b',
+        r'\b\d{2}/\d{3},\d{3}\b',
+        r'\b35 U\.?S\.?C\.?\b',
+        r'\bpatentable\b',
+        r'\binvent\w*\b'
+    ]
+    for pattern in patent_patterns:
+        if re.search(pattern, question_lower):
+            return True
+    return False
+
+
+CLASSIFIERS: Dict[str, Callable[[str], bool]] = {
+    "legacy_keyword_loop": legacy_is_patent_related,
+    "compiled_matcher": is_patent_related,
+}
+
+
+def load_questions(path: Path = LABELED_QUESTIONS) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(classify: Callable[[str], bool], questions: List[Dict[str, Any]],
+             repeats: int = 200) -> Dict[str, Any]:
+    """Measure latency and label quality of one classifier"""
+    samples_us = []
+    for _ in range(repeats):
+        for item in questions:
+            start = time.perf_counter_ns()
+            classify(item["question"])
+            samples_us.append((time.perf_counter_ns() - start) / 1000)
+
+    predictions = [classify(item["question"]) for item in questions]
+    labels = [item["patent_related"] for item in questions]
+    tp = sum(p and l for p, l in zip(predictions, labels))
+    fp = sum(p and not l for p, l in zip(predictions, labels))
+    fn = sum(l and not p for p, l in zip(predictions, labels))
+    values = np.array(samples_us)
+    return {
+        "latency": {
+            "mean_us": round(float(values.mean()), 2),
+            "p99_us": round(float(np.percentile(values, 99)), 2),
+        },
+        "quality": {
+            "precision": round(tp / (tp + fp), 4) if tp + fp else 0.0,
+            "recall": round(tp / (tp + fn), 4) if tp + fn else 0.0,
+            "accuracy": round(sum(p == l for p, l in zip(predictions, labels)) / len(labels), 4),
+        },
+        "misclassified": [
+            item["question"] for item, p in zip(questions, predictions) if p != item["patent_related"]
+        ],
+    }
+
+
+def run_benchmark(repeats: int = 200) -> Dict[str, Any]:
+    questions = load_questions()
+    return {
+        "questions": len(questions),
+        "positives": sum(item["patent_related"] for item in questions),
+        "classifiers": {name: evaluate(fn, questions, repeats) for name, fn in CLASSIFIERS.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the patent-relevance classifier")
+    parser.add_argument("--repeats", type=int, default=200, help="Timed passes over the question set")
+    parser.add_argument("--output", type=str, default=None,
+                        help="JSON output path (default: benchmarks/results/relevance-<timestamp>.json)")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.repeats)
+    print(json.dumps(result, indent=2))
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"relevance-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"created_at": datetime.now().isoformat(), "result": result}, f, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Retrieval Benchmark
+
+Generates synthetic patent corpora, indexes them through the same Chroma + BM25
+path the backend uses, and measures:
+
+- ingest throughput (chunks/s) for the vector store and the keyword index
+- p50/p95/p99 query latency for dense, hybrid and re-ranked hybrid retrieval
+- memory: the process-wide peak resident set size (which includes
+  everything the process did before the run) and the on-disk index size
+- recall@k of the dense index against brute-force exact search, and the rate
+  at which each query's source chunk appears in the top-k (and at rank 1)
+
+Embeddings come from a deterministic local hashing model, so the benchmark
+runs offline and results are comparable between runs. Results are written as
+JSON for diffing.
+
+Usage (from enterprise-rag-ui):
+    python benchmarks/retrieval_benchmark.py --sizes 1000 10000 100000
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain.docstore.document import Document
+
+# Import backend modules the way the backend does
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from retriever.bm25 import INDEX_FILENAME, BM25Index  # noqa: E402
+from retriever.rerank import OverlapScorer, Reranker, ScoreCache  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+TECH_TERMS = [
+    "photovoltaic", "lithium", "electrode", "anode", "cathode", "inverter", "turbine",
+    "semiconductor", "transistor", "substrate", "polymer", "catalyst", "membrane",
+    "sensor", "actuator", "processor", "antenna", "waveguide", "laser", "optical",
+    "battery", "capacitor", "graphene", "silicon", "nanowire", "hydrogel", "enzyme",
+    "antibody", "peptide", "vaccine", "compressor", "valve", "rotor", "stator",
+    "encoder", "decoder", "neural", "network", "database", "encryption", "wireless",
+    "spectrum", "modulation", "thermal", "coolant", "alloy", "ceramic", "composite",
+]
+CLAIM_TEMPLATES = [
+    "{n}. A system comprising a {a} coupled to a {b}, wherein the {a} is configured to regulate the {c}.",
+    "{n}. The method of claim {p}, further comprising heating the {a} above the {b} threshold.",
+    "{n}. An apparatus including a {a} and a {b} arranged to store {c} energy.",
+    "{n}. The composition of claim {p}, wherein the {a} comprises {b} doped {c}.",
+]
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings via feature hashing, L2-normalized"""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for token in text.lower().split():
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def generate_corpus(n_chunks: int, seed: int = 7) -> List[Document]:
+    """Generate patent-like chunks with patent numbers, CPC codes and claims"""
+    rng = random.Random(seed)
+    chunks = []
+    while len(chunks) < n_chunks:
+        patent_number = f"US{rng.randint(10_000_000, 11_999_999)}"
+        cpc = f"{rng.choice('ABCDEFGH')}{rng.randint(1, 99):02d}{rng.choice('BCDFKLMN')}{rng.randint(1, 99)}/{rng.randint(0, 99):02d}"
+        for position in range(rng.randint(3, 12)):
+            terms = rng.sample(TECH_TERMS, 3)
+            claim = rng.choice(CLAIM_TEMPLATES).format(n=position + 1, p=max(1, position), a=terms[0],
+                                                       b=terms[1], c=terms[2])
+            filler = " ".join(rng.choice(TECH_TERMS) for _ in range(rng.randint(20, 60)))
+            text = f"Patent {patent_number} classified {cpc}. {claim} {filler}"
+            chunk_id = f"{patent_number}-{position:05d}"
+            chunks.append(Document(page_content=text, metadata={
+                "chunk_id": chunk_id, "patent_number": patent_number, "filename": f"{patent_number}.pdf"
+            }))
+            if len(chunks) == n_chunks:
+                break
+    return chunks
+
+
+def generate_queries(chunks: List[Document], n_queries: int, seed: int = 11) -> List[Dict[str, str]]:
+    """Build queries from sampled chunks, remembering which chunk each came from"""
+    rng = random.Random(seed)
+    queries = []
+    for chunk in rng.sample(chunks, min(n_queries, len(chunks))):
+        words = [w for w in chunk.page_content.split() if w.isalpha()]
+        terms = " ".join(rng.sample(words, min(4, len(words))))
+        queries.append({
+            "question": f"What does patent {chunk.metadata['patent_number']} claim about {terms}?",
+            "target": chunk.metadata["chunk_id"],
+        })
+    return queries
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    values = np.array(samples_ms)
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the whole process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def dir_size_mb(path: str) -> float:
+    total = sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+    return round(total / (1024 * 1024), 3)
+
+
+def run_benchmark(n_chunks: int, n_queries: int = 200, k: int = 3, batch_size: int = 500,
+                  dim: int = 256) -> Dict[str, Any]:
+    """Index a synthetic corpus of n_chunks and measure ingest, latency, memory and recall"""
+    from langchain_community.vectorstores import Chroma
+    import retriever.search as search
+
+    embeddings = HashEmbeddings(dim)
+    chunks = generate_corpus(n_chunks)
+    queries = generate_queries(chunks, n_queries)
+    db_dir = tempfile.mkdtemp(prefix="retrieval-bench-")
+    # The retriever's module state is pointed at the benchmark store, and put back afterwards
+    saved_state = (search.DB_DIR, search._keyword_index, search._keyword_index_version)
+    saved_resources = {lazy: (lazy.loaded, lazy._value) for lazy in (search.vectorstore, search.reranker)}
+
+    try:
+        # Ingest: embed and upsert in batches, then build the keyword index
+        vectorstore = Chroma(persist_directory=db_dir, embedding_function=embeddings,
+                             collection_metadata={"hnsw:space": "cosine"})
+        start = time.perf_counter()
+        for i in range(0, len(chunks), batch_size):
+            batch = chunks[i:i + batch_size]
+            vectorstore.add_documents(batch, ids=[c.metadata["chunk_id"] for c in batch])
+        vector_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        keyword_index = BM25Index()
+        for chunk in chunks:
+            keyword_index.add(chunk.metadata["chunk_id"], chunk.page_content)
+        keyword_index.save(os.path.join(db_dir, INDEX_FILENAME))
+        keyword_seconds = time.perf_counter() - start
+
+        # Point the real retriever at the benchmark store
+        search.DB_DIR = db_dir
+        search.vectorstore.set(vectorstore)
+        # Uncached, so every query pays the full re-ranking cost
+        search.reranker.set(Reranker(OverlapScorer(search.keyword_index), search._chunk_id,
+                                     cache=ScoreCache(max_entries=0)))
+
+        # Brute-force ground truth for the dense index
+        matrix = np.array(embeddings.embed_documents([c.page_content for c in chunks]), dtype=np.float32)
+        positions = {c.metadata["chunk_id"]: i for i, c in enumerate(chunks)}
+
+        dense_ms, hybrid_ms, reranked_ms = [], [], []
+        recall_hits = 0
+        dense_targets = hybrid_targets = reranked_targets = 0
+        hybrid_first = reranked_first = 0
+        for query in queries:
+            query_embedding = embeddings.embed_query(query["question"])
+
+            start = time.perf_counter()
+            dense = vectorstore.similarity_search_by_vector(query_embedding, k=k)
+            dense_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            hybrid = search.first_stage_search(query["question"], query_embedding, k)
+            hybrid_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            reranked = search.hybrid_search(query["question"], query_embedding, k=k)
+            reranked_ms.append((time.perf_counter() - start) * 1000)
+
+            # A result counts towards recall if it scores at least as well as
+            # the exact k-th best chunk (ties are common in synthetic text)
+            scores = matrix @ np.array(query_embedding, dtype=np.float32)
+            kth_best = -np.partition(-scores, k - 1)[k - 1]
+            dense_ids = [d.metadata["chunk_id"] for d in dense]
+            recall_hits += sum(scores[positions[i]] >= kth_best - 1e-5 for i in dense_ids)
+            dense_targets += query["target"] in dense_ids
+            hybrid_ids = [d.metadata.get("chunk_id") for d in hybrid]
+            reranked_ids = [d.metadata.get("chunk_id") for d in reranked]
+            hybrid_targets += query["target"] in hybrid_ids
+            reranked_targets += query["target"] in reranked_ids
+            hybrid_first += hybrid_ids[:1] == [query["target"]]
+            reranked_first += reranked_ids[:1] == [query["target"]]
+
+        return {
+            "chunks": n_chunks,
+            "queries": len(queries),
+            "k": k,
+            "embedding_dim": dim,
+            "ingest": {
+                "vector_chunks_per_second": round(n_chunks / vector_seconds, 1),
+                "keyword_chunks_per_second": round(n_chunks / keyword_seconds, 1),
+                "vector_seconds": round(vector_seconds, 3),
+                "keyword_seconds": round(keyword_seconds, 3),
+            },
+            "latency": {
+                "dense": percentiles(dense_ms),
+                "hybrid": percentiles(hybrid_ms),
+                "reranked": percentiles(reranked_ms),
+            },
+            "memory": {
+                "process_peak_rss_mb": round(peak_rss_mb(), 1),
+                "index_on_disk_mb": dir_size_mb(db_dir),
+            },
+            "quality": {
+                f"dense_recall@{k}": round(float(recall_hits) / (k * len(queries)), 4),
+                f"dense_target_hit@{k}": round(dense_targets / len(queries), 4),
+                f"hybrid_target_hit@{k}": round(hybrid_targets / len(queries), 4),
+                f"reranked_target_hit@{k}": round(reranked_targets / len(queries), 4),
+                "hybrid_target_hit@1": round(hybrid_first / len(queries), 4),
+                "reranked_target_hit@1": round(reranked_first / len(queries), 4),
+            },
+        }
+    finally:
+        search.DB_DIR, search._keyword_index, search._keyword_index_version = saved_state
+        for lazy, (loaded, value) in saved_resources.items():
+            if loaded:
+                lazy.set(value)
+            else:
+                lazy.reset()
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval latency and recall on synthetic patents")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Corpus sizes in chunks")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per corpus")
+    parser.add_argument("--k", type=int, default=3, help="Number of chunks retrieved per query")
+    parser.add_argument("--output", type=str, default=None,
+                        help="JSON output path (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        print(f"Benchmarking {size} chunks...")
+        result = run_benchmark(size, n_queries=args.queries, k=args.k)
+        print(json.dumps(result, indent=2))
+        results.append(result)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"created_at": datetime.now().isoformat(), "results": results}, f, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
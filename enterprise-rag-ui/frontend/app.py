@@ -1,9 +1,9 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
-import requests
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, Response, stream_with_context
 import os
+import re
 import uuid
-from datetime import datetime
-from werkzeug.utils import secure_filename
+
+from backend_client import BackendClient
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key')
@@ -11,37 +11,50 @@ app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key')
 # Backend API URL
 BACKEND_URL = 'http://localhost:8003'
 
-# Configure upload settings
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
-ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt'}
+# Shared pooled client for all calls to the backend
+backend = BackendClient(BACKEND_URL)
+
+# Configure upload settings: uploads are relayed to the backend, which stores
+# and validates them; one extra MB leaves room for the multipart framing
+MAX_UPLOAD_MB = int(os.environ.get('MAX_UPLOAD_MB', '1024'))
+app.config['MAX_CONTENT_LENGTH'] = (MAX_UPLOAD_MB + 1) * 1024 * 1024
+
+# Turns of chat history rendered with the page; earlier ones load on demand
+HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', '20'))
 
-# Ensure upload directory exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
+def conversation_id():
+    """The session's conversation ID; the history itself is kept by the backend"""
+    if 'conversation_id' not in session:
+        session['conversation_id'] = uuid.uuid4().hex
+    return session['conversation_id']
 
-# Helper function to check allowed file extensions
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def fetch_history(offset=None, limit=HISTORY_PAGE_SIZE):
+    """Fetch a page of this session's chat history from the backend"""
+    params = {'limit': limit}
+    if offset is not None:
+        params['offset'] = offset
+    response = backend.get(f"/conversations/{conversation_id()}", params=params)
+    response.raise_for_status()
+    return response.json()
 
 @app.route('/')
 def index():
-    # Initialize chat history in session if it doesn't exist
-    if 'chat_history' not in session:
-        session['chat_history'] = []
+    # Only the latest page of chat history is rendered
+    try:
+        history = fetch_history()
+    except Exception:
+        history = {'turns': [], 'offset': 0}
     
     # Get list of patent documents from backend
     try:
-        response = requests.get(f"{BACKEND_URL}/patent-documents")
-        if response.status_code == 200:
-            patent_documents = response.json().get('documents', [])
-        else:
-            patent_documents = []
+        patent_documents = backend.patent_documents()
     except Exception:
         patent_documents = []
     
     return render_template('index.html', 
-                           chat_history=session['chat_history'],
+                           chat_history=history['turns'],
+                           history_offset=history['offset'],
+                           history_page_size=HISTORY_PAGE_SIZE,
                            patent_documents=patent_documents)
 
 @app.route('/ask', methods=['POST'])
@@ -54,33 +67,20 @@ def ask():
     
     try:
         # Call the backend API
-        response = requests.post(
-            f"{BACKEND_URL}/ask",
-            json={"question": question}
+        # The backend adds the exchange to this session's chat history
+        response = backend.post(
+            "/ask",
+            json={"question": question, "conversation_id": conversation_id()}
         )
         
         if response.status_code == 200:
             answer_data = response.json()
             answer = answer_data.get('answer', 'No answer provided')
             
-            # Add to chat history
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            chat_entry = {
-                'id': str(uuid.uuid4()),
-                'question': question,
-                'answer': answer,
-                'timestamp': timestamp
-            }
-            
-            # Update session
-            chat_history = session.get('chat_history', [])
-            chat_history.append(chat_entry)
-            session['chat_history'] = chat_history
-            
             return jsonify({
                 'success': True,
                 'answer': answer,
-                'chat_entry': chat_entry
+                'chat_entry': answer_data.get('turn')
             })
         else:
             return jsonify({
@@ -95,49 +95,111 @@ def ask():
             'error': f"Error connecting to backend: {str(e)}"
         }), 500
 
+@app.route('/ask/stream', methods=['POST'])
+def ask_stream():
+    question = request.form.get('question')
+    
+    if not question:
+        return jsonify({'error': 'No question provided'}), 400
+    
+    try:
+        # Open a streaming request to the backend, which records the finished answer
+        response = backend.post(
+            "/ask/stream",
+            json={"question": question, "conversation_id": conversation_id()},
+            stream=True
+        )
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f"Error connecting to backend: {str(e)}"
+        }), 500
+    
+    if response.status_code != 200:
+        return jsonify({
+            'success': False,
+            'error': f"Backend error: {response.status_code}",
+            'message': response.text
+        }), response.status_code
+    
+    # Relay server-sent events as they arrive, without buffering
+    def relay():
+        try:
+            for chunk in response.iter_content(chunk_size=None):
+                yield chunk
+        finally:
+            response.close()
+    
+    return Response(
+        stream_with_context(relay()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/chat-history')
+def chat_history():
+    # Earlier pages of the chat history, loaded as the user scrolls back
+    offset = request.args.get('offset', type=int)
+    limit = request.args.get('limit', HISTORY_PAGE_SIZE, type=int)
+    try:
+        return jsonify(fetch_history(offset, limit))
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f"Error connecting to backend: {str(e)}"
+        }), 500
+
 @app.route('/clear-history', methods=['POST'])
 def clear_history():
-    session['chat_history'] = []
-    return jsonify({'success': True})
+    try:
+        response = backend.delete(f"/conversations/{conversation_id()}")
+        return jsonify({'success': response.status_code == 200})
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f"Error connecting to backend: {str(e)}"
+        }), 500
 
 @app.route('/upload-patent', methods=['POST'])
 def upload_patent():
-    # Check if a file was uploaded
-    if 'patent_file' not in request.files:
+    # Check that a multipart form was posted, without parsing it (which would
+    # spool the file here): the body is relayed to the backend as it arrives
+    if not request.mimetype == 'multipart/form-data':
         flash('No file part')
-        return redirect(request.url)
-    
-    file = request.files['patent_file']
-    
-    # Check if file was selected
-    if file.filename == '':
-        flash('No selected file')
-        return redirect(request.url)
+        return redirect(url_for('index'))
     
-    # Check if file is allowed
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        
-        # Send file to backend for ingestion
-        try:
-            with open(file_path, 'rb') as f:
-                files = {'file': (filename, f)}
-                response = requests.post(f"{BACKEND_URL}/upload-patent", files=files)
-            
-            if response.status_code == 200:
-                flash('Patent document uploaded successfully')
-            else:
-                flash(f'Error uploading patent: {response.text}')
-        except Exception as e:
-            flash(f'Error: {str(e)}')
+    try:
+        response = backend.post_stream("/upload-patent", request.stream,
+                                       request.content_type, request.content_length)
         
-        return redirect(url_for('index'))
+        if response.status_code in (200, 202):
+            backend.invalidate_patent_documents()
+            job_id = response.json().get('job_id')
+            flash(f'Patent document uploaded and queued for processing (job {job_id})')
+        elif response.status_code == 409:
+            flash(f'Already uploaded: {response.json().get("detail")}')
+        else:
+            try:
+                message = response.json().get('detail', response.text)
+            except ValueError:
+                message = response.text
+            flash(f'Error uploading patent: {message}')
+    except Exception as e:
+        flash(f'Error: {str(e)}')
     
-    flash('Invalid file type. Allowed types: pdf, docx, txt')
     return redirect(url_for('index'))
 
+@app.route('/ingest-jobs/<job_id>')
+def ingest_job_status(job_id):
+    try:
+        response = backend.get(f"/ingest-jobs/{job_id}")
+        return jsonify(response.json()), response.status_code
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f"Error connecting to backend: {str(e)}"
+        }), 500
+
 @app.route('/analyze-patent', methods=['POST'])
 def analyze_patent():
     patent_number = request.form.get('patent_number', '')
@@ -145,11 +207,12 @@ def analyze_patent():
     
     try:
         # Call the backend API
-        response = requests.post(
-            f"{BACKEND_URL}/analyze-patent",
+        response = backend.post(
+            "/analyze-patent",
             json={
                 "patent_number": patent_number,
-                "analysis_type": analysis_type
+                "analysis_type": analysis_type,
+                "conversation_id": conversation_id()
             }
         )
         
@@ -157,25 +220,10 @@ def analyze_patent():
             analysis_data = response.json()
             analysis = analysis_data.get('analysis', 'No analysis provided')
             
-            # Add to chat history
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            question = f"Analyze patent {patent_number} for {analysis_type}"
-            chat_entry = {
-                'id': str(uuid.uuid4()),
-                'question': question,
-                'answer': analysis,
-                'timestamp': timestamp
-            }
-            
-            # Update session
-            chat_history = session.get('chat_history', [])
-            chat_history.append(chat_entry)
-            session['chat_history'] = chat_history
-            
             return jsonify({
                 'success': True,
                 'analysis': analysis,
-                'chat_entry': chat_entry
+                'chat_entry': analysis_data.get('turn')
             })
         else:
             return jsonify({
@@ -190,5 +238,48 @@ def analyze_patent():
             'error': f"Error connecting to backend: {str(e)}"
         }), 500
 
+@app.route('/analyze-patents', methods=['POST'])
+def analyze_patents():
+    # One patent number per line (or separated by semicolons); commas are left
+    # alone since they appear inside numbers such as "11,391,262"
+    patent_numbers = [n.strip() for n in re.split(r'[\n;]+', request.form.get('patent_numbers', '')) if n.strip()]
+    analysis_types = request.form.getlist('analysis_types') or ['general']
+    
+    if not patent_numbers:
+        return jsonify({'error': 'No patent numbers provided'}), 400
+    
+    try:
+        response = backend.post(
+            "/analyze-patents",
+            json={"patent_numbers": patent_numbers, "analysis_types": analysis_types},
+            stream=True
+        )
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f"Error connecting to backend: {str(e)}"
+        }), 500
+    
+    if response.status_code != 200:
+        return jsonify({
+            'success': False,
+            'error': f"Backend error: {response.status_code}",
+            'message': response.text
+        }), response.status_code
+    
+    # Relay one JSON line per analysis as each one completes
+    def relay():
+        try:
+            for chunk in response.iter_content(chunk_size=None):
+                yield chunk
+        finally:
+            response.close()
+    
+    return Response(
+        stream_with_context(relay()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5002)
\ No newline at end of file
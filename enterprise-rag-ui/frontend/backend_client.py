@@ -0,0 +1,116 @@
+"""
+Backend API Client
+
+One pooled HTTP session shared by all Flask routes, so requests to the FastAPI
+backend reuse keep-alive connections instead of opening a new TCP connection
+each time. Every call has a connect and read timeout. Idempotent calls are
+retried with exponential backoff on connection errors and 502/503/504; POSTs
+are only retried when the connection could not be opened at all. The patent
+document listing shown on every page load is cached for a few seconds.
+"""
+
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONNECT_TIMEOUT = float(os.environ.get('BACKEND_CONNECT_TIMEOUT', '3.05'))
+READ_TIMEOUT = float(os.environ.get('BACKEND_READ_TIMEOUT', '120'))
+# Streams wait this long between chunks (e.g. a batch analysis between results)
+STREAM_READ_TIMEOUT = float(os.environ.get('BACKEND_STREAM_READ_TIMEOUT', '300'))
+RETRIES = int(os.environ.get('BACKEND_RETRIES', '3'))
+BACKOFF_FACTOR = float(os.environ.get('BACKEND_BACKOFF', '0.3'))
+POOL_SIZE = int(os.environ.get('BACKEND_POOL_SIZE', '20'))
+PATENT_DOCUMENTS_TTL = float(os.environ.get('PATENT_DOCUMENTS_TTL', '10'))
+
+
+class _SizedStream:
+    """A request body streamed from a file-like object whose length is known up front
+
+    requests sends bodies without a length with chunked encoding; giving it the
+    length lets it send Content-Length while still streaming the body.
+    """
+
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+    def __iter__(self):
+        return iter(lambda: self.stream.read(1 << 16), b'')
+
+
+class BackendClient:
+    """Pooled, timeout-bounded client for the Patent Assistant API"""
+
+    def __init__(self, base_url, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 retries=RETRIES, backoff_factor=BACKOFF_FACTOR, pool_size=POOL_SIZE,
+                 documents_ttl=PATENT_DOCUMENTS_TTL):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.stream_timeout = (connect_timeout, STREAM_READ_TIMEOUT)
+        self.documents_ttl = documents_ttl
+        self._documents = None
+        self._documents_expire = 0.0
+        self._documents_lock = threading.Lock()
+
+        # urllib3 only retries read errors and bad statuses for the allowed
+        # (idempotent) methods; connection errors are retried for every method
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, path, stream=False, **kwargs):
+        kwargs.setdefault('timeout', self.stream_timeout if stream else self.timeout)
+        return self.session.request(method, f"{self.base_url}{path}", stream=stream, **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def post_stream(self, path, stream, content_type, content_length=None, **kwargs):
+        """POST a body read from a stream as it is sent, without buffering it"""
+        body = _SizedStream(stream, content_length) if content_length is not None else stream
+        return self.post(path, data=body, headers={'Content-Type': content_type}, **kwargs)
+
+    def patent_documents(self):
+        """List the backend's patent documents, cached for documents_ttl seconds"""
+        with self._documents_lock:
+            if self._documents is not None and time.monotonic() < self._documents_expire:
+                return self._documents
+        response = self.get('/patent-documents')
+        response.raise_for_status()
+        documents = response.json().get('documents', [])
+        with self._documents_lock:
+            self._documents = documents
+            self._documents_expire = time.monotonic() + self.documents_ttl
+        return documents
+
+    def invalidate_patent_documents(self):
+        """Drop the cached listing, e.g. after an upload"""
+        with self._documents_lock:
+            self._documents = None
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Backend modules import each other relative to the backend directory
+# (e.g. ``from llm.ask import ...``), the same way uvicorn runs them.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+# The frontend's modules live next to app.py and import each other the same way
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'frontend')))
@@ -0,0 +1,53 @@
+from langchain.docstore.document import Document
+
+from llm.answer_cache import AnswerCache, context_key, normalize_question
+
+
+def _docs(*chunk_ids):
+    return [Document(page_content=f"text {i}", metadata={"chunk_id": i}) for i in chunk_ids]
+
+
+def test_exact_match_on_normalized_question():
+    cache = AnswerCache()
+    context = context_key(_docs("a-1", "a-2"))
+    cache.store("How do I file a provisional?", context, "File form SB/16.")
+
+    assert normalize_question("  how do I  FILE a provisional ") == "how do i file a provisional"
+    assert cache.lookup("how do i file a provisional", context) == "File form SB/16."
+    # Same chunks in a different order are the same context
+    assert cache.lookup("How do I file a provisional?", context_key(_docs("a-2", "a-1"))) is not None
+
+
+def test_changed_context_misses():
+    cache = AnswerCache()
+    cache.store("Analyze claims of US11391262", context_key(_docs("a-1")), "answer")
+    assert cache.lookup("Analyze claims of US11391262", context_key(_docs("b-1"))) is None
+
+
+def test_near_duplicate_question_matches_by_embedding():
+    cache = AnswerCache(similarity_threshold=0.95)
+    context = context_key(_docs("a-1"))
+    cache.store("How do I file a provisional?", context, "answer", embedding=[1.0, 0.0, 0.1])
+
+    assert cache.lookup("How can I file a provisional application?", context,
+                        embedding=[0.99, 0.0, 0.12]) == "answer"
+    assert cache.lookup("What is a PCT filing?", context, embedding=[0.0, 1.0, 0.0]) is None
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (0, 1, 1)
+
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("llm.answer_cache.time.time", lambda: now[0])
+    cache = AnswerCache(max_entries=2, ttl_seconds=60)
+    context = context_key(_docs("a-1"))
+
+    cache.store("q1", context, "a1")
+    cache.store("q2", context, "a2")
+    assert cache.lookup("q1", context) == "a1"  # q1 is now most recently used
+    cache.store("q3", context, "a3")
+    assert cache.lookup("q2", context) is None
+
+    now[0] += 61
+    assert cache.lookup("q1", context) is None
+    assert cache.stats()["entries"] == 1
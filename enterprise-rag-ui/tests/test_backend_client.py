@@ -0,0 +1,84 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from backend_client import BackendClient
+
+
+class FakeBackend(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    statuses = []
+    calls = []
+    ports = set()
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        FakeBackend.calls.append(("GET", self.path))
+        FakeBackend.ports.add(self.client_address[1])
+        status = FakeBackend.statuses.pop(0) if FakeBackend.statuses else 200
+        self._reply(status, {"documents": ["US11391262.pdf"]})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        FakeBackend.calls.append(("POST", self.path))
+        status = FakeBackend.statuses.pop(0) if FakeBackend.statuses else 200
+        self._reply(status, {"answer": "ok"})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def backend():
+    FakeBackend.statuses, FakeBackend.calls, FakeBackend.ports = [], [], set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBackend)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_reuses_one_connection(backend):
+    client = BackendClient(backend)
+    for _ in range(5):
+        assert client.get("/ingest-jobs/abc").status_code == 200
+    assert len(FakeBackend.ports) == 1
+
+
+def test_retries_idempotent_calls_but_not_posts(backend):
+    client = BackendClient(backend, backoff_factor=0)
+    FakeBackend.statuses = [503, 503]
+    assert client.get("/ingest-jobs/abc").status_code == 200
+    assert len(FakeBackend.calls) == 3
+
+    FakeBackend.calls = []
+    FakeBackend.statuses = [503]
+    assert client.post("/ask", json={"question": "q"}).status_code == 503
+    assert len(FakeBackend.calls) == 1
+
+
+def test_unreachable_backend_fails_fast():
+    client = BackendClient("http://127.0.0.1:9", retries=0, connect_timeout=0.5)
+    with pytest.raises(requests.ConnectionError):
+        client.get("/patent-documents")
+
+
+def test_patent_documents_cached_until_invalidated(backend):
+    client = BackendClient(backend, documents_ttl=60)
+    assert client.patent_documents() == ["US11391262.pdf"]
+    assert client.patent_documents() == ["US11391262.pdf"]
+    assert len(FakeBackend.calls) == 1
+    client.invalidate_patent_documents()
+    client.patent_documents()
+    assert len(FakeBackend.calls) == 2
@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from ingestion.metadata_store import PatentMetadataStore
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = PatentMetadataStore(str(tmp_path / "patents.sqlite3"))
+    for number in ["US1000001", "US1000002", "US1000003"]:
+        store.upsert(f"{number}.pdf", number, f"Patent {number}", "An abstract", ["A claim."], [f"{number}-0"])
+    main.metadata_store.set(store)
+    monkeypatch.setattr(main, "get_chunks", lambda chunk_ids: [])
+    monkeypatch.setattr(main, "batch_rate", None)
+
+    async def fake_answer(question, docs, sources=None):
+        if "US1000002" in question:
+            raise RuntimeError("LLM unavailable")
+        # The first patent finishes last, so results arrive out of request order
+        await asyncio.sleep(0.05 if "US1000001" in question else 0)
+        return f"analysis of {docs[0].metadata['patent_number']}"
+
+    monkeypatch.setattr(main, "aanswer_from_documents", fake_answer)
+    yield TestClient(main.app)
+    main.metadata_store.reset()
+    store.close()
+
+
+def test_importing_main_does_not_open_the_metadata_store():
+    assert not main.metadata_store.loaded
+
+
+def test_batch_streams_one_line_per_analysis_in_completion_order(client):
+    response = client.post("/analyze-patents", json={
+        "patent_numbers": ["US1000001", "us 1,000,002", "US1000003", "US1000001"],
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    # One JSON object per newline-terminated line
+    assert response.text.endswith("\n")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    results, summary = lines[:-1], lines[-1]
+    # The duplicate is analyzed once; the slow patent arrives after the others
+    assert [r["patent_number"] for r in results][-1] == "US1000001"
+    assert sorted(r["patent_number"] for r in results) == ["US1000001", "US1000002", "US1000003"]
+
+    by_number = {r["patent_number"]: r for r in results}
+    assert by_number["US1000003"]["status"] == "ok"
+    assert by_number["US1000003"]["analysis"] == "analysis of US1000003"
+    # One failing patent does not fail the batch
+    assert by_number["US1000002"]["status"] == "error"
+    assert by_number["US1000002"]["error"] == "LLM unavailable"
+    assert summary == {"done": True, "total": 3, "failed": 1}
+
+
+def test_batch_requests_are_validated(client):
+    response = client.post("/analyze-patents", json={"patent_numbers": ["US1000001"], "analysis_types": []})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No analysis types provided"
+
+    response = client.post("/analyze-patents", json={"patent_numbers": [" ", ""]})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No patent numbers provided"
@@ -0,0 +1,75 @@
+from retriever.bm25 import BM25Index, BM25Journal, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_keeps_patent_identifiers():
+    tokens = tokenize("Patent US 11,391,262 (US11391262) classified H01L31/04, see claim 3.")
+    assert "us11391262" in tokens
+    assert "11391262" in tokens
+    assert "h01l31/04" in tokens and "h01l31" in tokens
+    assert "3" in tokens
+    assert "see" in tokens and "the" not in tokens
+
+
+def test_exact_tokens_rank_first_and_index_round_trips(tmp_path):
+    index = BM25Index()
+    index.add("a", "A photovoltaic cell with a lithium battery for storing solar energy")
+    index.add("b", "Patent US11391262 claims a solar energy storage system")
+    index.add("c", "A wind turbine blade made of carbon fibre")
+
+    assert index.search("US11391262 claims")[0][0] == "b"
+    assert {cid for cid, _ in index.search("solar energy")} == {"a", "b"}
+    assert index.search("nothing matches") == []
+
+    path = str(tmp_path / "bm25.json")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.search("wind turbine") == index.search("wind turbine")
+
+    loaded.remove_many(["b", "missing"])
+    assert len(loaded) == 2
+    assert loaded.search("US11391262") == []
+    assert "us11391262" not in loaded.postings
+
+
+def test_journal_appends_changes_without_loading_the_index(tmp_path):
+    path = str(tmp_path / "bm25.json")
+    index = BM25Index()
+    index.add("a", "A photovoltaic cell with a lithium battery")
+    for i in range(20):
+        index.add(f"filler-{i}", f"A gearbox housing with bearing number {i}")
+    index.save(path)
+
+    journal = BM25Journal(path)
+    journal.add("b", "Patent US11391262 claims a solar energy storage system")
+    journal.remove_many(["a"])
+    assert BM25Index.load(path).search("US11391262") == []  # nothing flushed yet
+
+    journal.flush()
+    loaded = BM25Index.load(path)
+    assert len(loaded) == 21
+    assert [cid for cid, _ in loaded.search("US11391262 lithium")] == ["b"]
+
+    # An entry half-written by a crash is ignored, and cut off by the next run
+    with open(path + ".log", "a", encoding="utf-8") as f:
+        f.write('{"add": "c", "tf"')
+    assert len(BM25Index.load(path)) == 21
+    journal = BM25Journal(path)
+    journal.add("c", "A wind turbine blade")
+
+    # Compaction only happens once the journal outgrows the snapshot
+    assert not journal.compact()
+    assert len(BM25Index.load(path)) == 22
+    for i in range(40):
+        journal.add(f"d{i}", f"A wind turbine blade of carbon fibre, variant {i}")
+    assert journal.compact()
+    assert not (tmp_path / "bm25.json.log").exists()
+    assert len(BM25Index.load(path)) == 62
+
+
+def test_reciprocal_rank_fusion_weights():
+    fused = reciprocal_rank_fusion([["x", "y"], ["y", "z"]], k=60)
+    assert [item for item, _ in fused] == ["y", "x", "z"]
+
+    # With the second ranking switched off, the first ranking's order wins
+    fused = reciprocal_rank_fusion([["x", "y"], ["y", "z"]], weights=[1.0, 0.0], k=60)
+    assert [item for item, _ in fused][:2] == ["x", "y"]
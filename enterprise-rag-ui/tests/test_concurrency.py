@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+from concurrency import UpstreamLimiter
+
+
+def test_limiter_bounds_in_flight_calls():
+    limiter = UpstreamLimiter("test", 2)
+    peak = []
+
+    async def call():
+        async with limiter:
+            peak.append(limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*[call() for _ in range(10)])
+
+    asyncio.run(main())
+    assert max(peak) == 2
+    assert limiter.stats() == {"max_concurrency": 2, "requests_per_minute": 0, "in_flight": 0, "waiting": 0}
+
+
+def test_blocking_calls_run_off_the_event_loop():
+    limiter = UpstreamLimiter("test", 4)
+
+    async def main():
+        start = time.perf_counter()
+        results = await asyncio.gather(*[limiter.run(time.sleep, 0.05) for _ in range(4)])
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(main())
+    assert results == [None] * 4
+    assert elapsed < 0.15
+
+
+def test_rate_limit_spaces_calls_after_the_burst():
+    # 600/min = one call every 0.1s once the burst allowance is spent
+    limiter = UpstreamLimiter("rated", 10, requests_per_minute=600)
+    limiter._rate._tokens = 1
+
+    async def call():
+        async with limiter:
+            return time.perf_counter()
+
+    async def main():
+        return await asyncio.gather(*[call() for _ in range(3)])
+
+    start = time.perf_counter()
+    times = sorted(asyncio.run(main()))
+    assert times[0] - start < 0.05
+    assert times[2] - start >= 0.18
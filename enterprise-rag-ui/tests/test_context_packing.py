@@ -0,0 +1,68 @@
+from langchain.docstore.document import Document
+
+from llm.context import deduplicate, estimate_tokens, merge_adjacent, pack_context
+
+
+def chunk(text, index=None, filename="US11391262.pdf"):
+    metadata = {"filename": filename}
+    if index is not None:
+        metadata["chunk_id"] = f"abc123-{index:05d}"
+    return Document(page_content=text, metadata=metadata)
+
+
+def test_drops_exact_and_near_duplicates():
+    text = ("The graphene electrode is deposited on the silicon substrate by chemical vapour deposition. "
+            "An anti-reflective coating is formed over the electrode and the cell is annealed so that "
+            "carrier collection improves while the sheet resistance of the front contact stays below "
+            "the threshold required for utility-scale modules operating at low temperature.")
+    docs = [
+        chunk(text, 1),
+        chunk(text.upper(), 7, filename="other.pdf"),
+        chunk(text.replace("at low", "at a low"), 9, filename="third.pdf"),
+        chunk("A lithium anode coated with a ceramic separator.", 4, filename="fourth.pdf"),
+    ]
+    unique, duplicates = deduplicate(docs)
+    assert duplicates == 2
+    assert [d.metadata["chunk_id"] for d in unique] == ["abc123-00001", "abc123-00004"]
+
+
+def test_drops_chunks_contained_in_higher_ranked_chunk():
+    unique, duplicates = deduplicate([
+        chunk("Claim 1. A solar cell comprising a substrate. Claim 2. The solar cell of claim 1."),
+        chunk("Claim 2. The solar cell of claim 1.", filename="b.pdf"),
+    ])
+    assert duplicates == 1 and len(unique) == 1
+
+
+def test_merges_adjacent_chunks_in_document_order():
+    merged, merges = merge_adjacent([chunk("second part", 3), chunk("unrelated", 0, "x.pdf"), chunk("first part", 2)])
+    assert merges == 1
+    assert merged[0].page_content == "first part\n\nsecond part"
+    assert merged[0].metadata["chunk_id"] == "abc123-00003+abc123-00002"
+    assert merged[1].page_content == "unrelated"
+
+
+def test_merges_overlapping_chunks_without_repeating_overlap():
+    first = "The inverter converts direct current from the panel into alternating current"
+    second = "into alternating current for the grid connection."
+    merged, merges = merge_adjacent([chunk(first), chunk(second)])
+    assert merges == 1
+    assert merged[0].page_content == first + " for the grid connection."
+
+
+def test_packs_best_chunks_into_budget():
+    docs = [chunk(f"Chunk {i} " + "word " * 200, i * 10, filename=f"{i}.pdf") for i in range(10)]
+    packed = pack_context(docs, budget=800)
+    assert packed.tokens <= 800
+    assert sum(estimate_tokens(d.page_content) for d in packed.documents) == packed.tokens
+    # Highest-ranked chunks are kept first, the tail is dropped
+    assert packed.documents[0].page_content.startswith("Chunk 0 ")
+    assert packed.dropped > 0
+    assert packed.to_dict()["retrieved"] == 10
+
+
+def test_truncates_oversized_top_chunk():
+    packed = pack_context([chunk("Sentence one is here. " * 500)], budget=200)
+    assert len(packed.documents) == 1
+    assert packed.documents[0].metadata["truncated"] is True
+    assert packed.tokens <= 200
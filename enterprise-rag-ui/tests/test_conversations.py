@@ -0,0 +1,93 @@
+from conversations import ConversationStore, valid_conversation_id
+
+
+def ask(store, conversation_id, n, start=0):
+    for i in range(start, start + n):
+        store.append(conversation_id, f"question {i}", f"answer {i}", [f"chunk-{i}"])
+
+
+def test_history_pages_oldest_first_with_latest_page_by_default():
+    store = ConversationStore()
+    ask(store, "conversation-a", 7)
+
+    latest = store.history("conversation-a", limit=3)
+    assert latest["total"] == 7 and latest["offset"] == 4
+    assert [t["question"] for t in latest["turns"]] == ["question 4", "question 5", "question 6"]
+
+    first = store.history("conversation-a", offset=0, limit=3)
+    assert [t["question"] for t in first["turns"]] == ["question 0", "question 1", "question 2"]
+    assert first["turns"][0]["chunk_ids"] == ["chunk-0"]
+    assert store.history("unknown-conversation")["turns"] == []
+
+
+def test_least_recently_used_conversations_are_evicted():
+    store = ConversationStore(max_conversations=2)
+    ask(store, "conversation-a", 1)
+    ask(store, "conversation-b", 1)
+    store.last_turn("conversation-a")  # a is now more recent than b
+    ask(store, "conversation-c", 1)
+
+    assert store.last_turn("conversation-a").question == "question 0"
+    assert store.history("conversation-b")["total"] == 0
+    assert store.stats()["conversations_in_memory"] == 2
+
+
+def test_reading_unknown_conversations_does_not_evict_real_ones():
+    store = ConversationStore(max_conversations=2)
+    ask(store, "conversation-a", 1)
+    ask(store, "conversation-b", 1)
+    for i in range(5):
+        assert store.last_turn(f"unknown-{i:04d}") is None
+        assert store.recent_turns(f"unknown-{i:04d}", 3) == []
+        assert store.history(f"unknown-{i:04d}")["total"] == 0
+
+    assert store.last_turn("conversation-a").question == "question 0"
+    assert store.last_turn("conversation-b").question == "question 0"
+    assert store.stats()["conversations_in_memory"] == 2
+
+
+def test_history_reports_the_offset_it_returns():
+    store = ConversationStore(max_turns=3)
+    ask(store, "conversation-a", 5)
+
+    # Without SQLite only the last three turns are kept
+    page = store.history("conversation-a", offset=0, limit=2)
+    assert page["total"] == 5 and page["offset"] == 2
+    assert [t["question"] for t in page["turns"]] == ["question 2", "question 3"]
+
+
+def test_sqlite_keeps_evicted_and_older_turns(tmp_path):
+    db = str(tmp_path / "conversations.db")
+    store = ConversationStore(max_conversations=1, max_turns=3, db_path=db)
+    ask(store, "conversation-a", 5)
+    ask(store, "conversation-b", 1)  # evicts a
+
+    # Read back from SQLite without being brought into memory
+    assert store.last_turn("conversation-a").chunk_ids == ["chunk-4"]
+    assert store.stats()["turns_in_memory"] == 1
+    page = store.history("conversation-a", offset=0, limit=4)
+    assert page["total"] == 5
+    assert [t["question"] for t in page["turns"]] == [f"question {i}" for i in range(4)]
+
+    # A new turn reloads it with its last three turns; numbering continues and survives a restart
+    ask(store, "conversation-a", 1, start=5)
+    assert store.stats()["turns_in_memory"] == 3
+    store.close()
+    reopened = ConversationStore(db_path=db)
+    assert [t["question"] for t in reopened.history("conversation-a", offset=4)["turns"]] == \
+        ["question 4", "question 5"]
+
+    reopened.append("conversation-a", "why?", "because", query="why? (following up on: question 0)")
+    assert reopened.last_turn("conversation-a").query == "why? (following up on: question 0)"
+    assert ConversationStore(db_path=db).last_turn("conversation-a").query.startswith("why? (following")
+
+    reopened.delete("conversation-a")
+    assert reopened.history("conversation-a")["total"] == 0
+    assert ConversationStore(db_path=db).history("conversation-a")["total"] == 0
+
+
+def test_conversation_ids_are_validated():
+    assert valid_conversation_id("3f2a9c0e4b7d4e1f8a6b5c4d3e2f1a0b")
+    assert not valid_conversation_id("short")
+    assert not valid_conversation_id("../../etc/passwd")
+    assert not valid_conversation_id(None)
@@ -0,0 +1,46 @@
+from langchain_core.embeddings import Embeddings
+
+from embeddings.cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(t)), float(t.count("claim"))] for t in texts]
+
+    def embed_query(self, text):
+        return [0.0, 0.0]
+
+
+def test_cached_texts_are_never_re_embedded(tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite3")
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, "nomic-embed-text", EmbeddingCache(cache_path),
+                                  batch_size=2, concurrency=3)
+
+    boilerplate = "What is claimed is: 1. A method comprising"
+    texts = [boilerplate, "a solar cell", boilerplate, "a battery", "an inverter"]
+    first = embeddings.embed_documents(texts)
+    assert first[0] == first[2] == [float(len(boilerplate)), 1.0]
+    assert sorted(model.embedded) == sorted(set(texts))
+
+    # A new process with the same cache file embeds only the new text
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, "nomic-embed-text", EmbeddingCache(cache_path))
+    second = embeddings.embed_documents(texts + ["a wind turbine"])
+    assert second[:5] == first
+    assert model.embedded == ["a wind turbine"]
+    assert (embeddings.hits, embeddings.misses) == (5, 1)
+
+
+def test_cache_is_keyed_by_model_name(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    CachedEmbeddings(CountingEmbeddings(), "model-a", cache).embed_documents(["text"])
+
+    model = CountingEmbeddings()
+    CachedEmbeddings(model, "model-b", cache).embed_documents(["text"])
+    assert model.embedded == ["text"]
+    assert len(cache) == 2
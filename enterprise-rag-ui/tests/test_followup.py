@@ -0,0 +1,120 @@
+import asyncio
+
+from langchain.docstore.document import Document
+
+from conversations import Turn
+from llm.followup import condense_question
+
+TOPIC = "What does US11391262 claim about the battery housing?"
+
+
+def previous(query=TOPIC, chunk_ids=("chunk-1", "chunk-2")):
+    return Turn(query, "It claims a sealed housing.", chunk_ids)
+
+
+def test_follow_ups_are_condensed_onto_the_thread_topic():
+    follow_up = condense_question("what about claim 3?", previous())
+    assert follow_up.is_follow_up
+    assert follow_up.query == f"what about claim 3? (following up on: {TOPIC})"
+    assert follow_up.focus == "claim 3?"
+    assert follow_up.reuse_chunk_ids == ["chunk-1", "chunk-2"]
+
+    # A follow-up to a follow-up keeps the original topic instead of nesting
+    again = condense_question("Why?", Turn("what about claim 3?", "...", query=follow_up.query))
+    assert again.query == f"Why? (following up on: {TOPIC})"
+
+    assert condense_question("Is it novel over the prior art?", previous()).is_follow_up
+
+
+def test_standalone_questions_are_left_alone():
+    assert not condense_question("what about claim 3?").is_follow_up  # no previous turn
+    for question in [
+        "What is prior art?",
+        "What does US10123456 claim?",  # a different patent
+        "How long does it take the USPTO to examine a utility application that claims priority?",
+        # Short, but neither naming a claim nor asking about the previous answer
+        "Thanks!",
+        "ok thanks",
+        "Patent eligibility?",
+    ]:
+        follow_up = condense_question(question, previous())
+        assert follow_up.query == question and not follow_up.is_follow_up
+
+
+def test_previous_chunks_are_reused_only_when_they_cover_the_follow_up():
+    docs = [
+        Document(page_content="A battery housing with a sealed lid.", metadata={}),
+        Document(page_content="Claim 3. The housing of claim 1, wherein the lid is welded.",
+                 metadata={"claim_number": 3}),
+    ]
+    assert condense_question("what about claim 3?", previous()).covered_by(docs)
+    assert not condense_question("and claim 7?", previous()).covered_by(docs)
+    assert condense_question("why is the lid welded?", previous()).covered_by(docs)
+    assert not condense_question("what about thermal runaway?", previous()).covered_by(docs)
+    assert condense_question("Why?", previous()).covered_by(docs)
+
+
+def test_covered_follow_ups_skip_retrieval(monkeypatch):
+    import llm.ask as ask
+
+    docs = [Document(page_content="Claim 3. The lid is welded.", metadata={"claim_number": 3})]
+    monkeypatch.setattr(ask, "get_chunks", lambda ids: docs if ids == ["chunk-1", "chunk-2"] else [])
+    monkeypatch.setattr(ask, "keyword_index", lambda: None)
+    retrieved = []
+
+    async def fake_embed(question):
+        retrieved.append(question)
+        return [1.0]
+
+    async def fake_retrieve(question, query_embedding=None):
+        return []
+
+    monkeypatch.setattr(ask, "aembed_query", fake_embed)
+    monkeypatch.setattr(ask, "aretrieve_context", fake_retrieve)
+
+    follow_up = condense_question("what about claim 3?", previous())
+    assert asyncio.run(ask.aresolve_context(follow_up.query, follow_up)) == (docs, None)
+    assert retrieved == []
+
+    # Not covered: the condensed question is retrieved afresh
+    follow_up = condense_question("and claim 9?", previous())
+    asyncio.run(ask.aresolve_context(follow_up.query, follow_up))
+    assert retrieved == [follow_up.query]
+
+
+OFF_TOPIC_FOLLOW_UPS = [
+    "So how do I bake sourdough bread?",
+    "And what is the capital of France?",
+    "Also, write me a poem about cats",
+]
+
+
+def test_guardrail_checks_follow_ups_as_asked():
+    from llm.relevance import is_patent_related
+
+    for question in OFF_TOPIC_FOLLOW_UPS:
+        follow_up = condense_question(question, previous())
+        assert follow_up.is_follow_up and not follow_up.fragment
+        assert not is_patent_related(follow_up.relevance_text)
+
+    # Fragments are only meaningful with their topic, which makes them relevant
+    for question in ["Why?", "and claim 7?"]:
+        follow_up = condense_question(question, previous())
+        assert follow_up.fragment and is_patent_related(follow_up.relevance_text)
+
+
+def test_off_topic_follow_ups_are_refused_without_retrieval(monkeypatch):
+    import llm.ask as ask
+
+    async def no_retrieval(question, follow_up=None):
+        raise AssertionError("off-topic follow-up was retrieved")
+
+    monkeypatch.setattr(ask, "aresolve_context", no_retrieval)
+
+    async def stream(follow_up):
+        return [token async for token in ask.astream_answer(follow_up.query, follow_up=follow_up)]
+
+    for question in OFF_TOPIC_FOLLOW_UPS:
+        follow_up = condense_question(question, previous())
+        assert asyncio.run(ask.aanswer_question(follow_up.query, follow_up=follow_up)) == ask.OFF_TOPIC_ANSWER
+        assert asyncio.run(stream(follow_up)) == [ask.OFF_TOPIC_ANSWER]
@@ -0,0 +1,63 @@
+import threading
+
+from ingestion.jobs import IngestionJobQueue
+
+
+def test_uploads_while_queued_are_coalesced_into_one_run(tmp_path):
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def fake_ingest(data_dir, db_dir, progress=None):
+        runs.append(list(progress.filenames))
+        started.set()
+        release.wait(5)
+        progress.on_file_parsed("US1111111.pdf")
+        progress.on_chunks_embedded("US1111111.pdf", 12)
+
+    queue = IngestionJobQueue(str(tmp_path), str(tmp_path), ingest_fn=fake_ingest)
+    first = queue.submit("US1111111.pdf")
+    assert started.wait(5)
+
+    # The first job is running, so these share a single follow-up job
+    second = queue.submit("US2222222.pdf")
+    third = queue.submit("US3333333.pdf")
+    assert second is third and second is not first
+    assert queue.submit("US2222222.pdf").filenames == ["US2222222.pdf", "US3333333.pdf"]
+
+    release.set()
+    queue.shutdown(wait=True)
+
+    assert runs == [["US1111111.pdf"], ["US2222222.pdf", "US3333333.pdf"]]
+    status = queue.get(first.id).to_dict()
+    assert status["status"] == "completed"
+    assert status["files_parsed"] == 1
+    assert status["chunks_embedded"] == 12
+
+
+def test_run_with_failed_files_completes_with_errors(tmp_path):
+    def partly_failing_ingest(data_dir, db_dir, progress=None):
+        progress.on_chunks_embedded("US1111111.pdf", 3)
+        progress.on_file_failed("US2222222.pdf", "No text could be extracted")
+
+    queue = IngestionJobQueue(str(tmp_path), str(tmp_path), ingest_fn=partly_failing_ingest)
+    job = queue.submit("US1111111.pdf")
+    queue.shutdown(wait=True)
+
+    status = job.to_dict()
+    assert status["status"] == "completed_with_errors"
+    assert status["errors"] == [{"filename": "US2222222.pdf", "error": "No text could be extracted"}]
+
+
+def test_failed_run_reports_error(tmp_path):
+    def failing_ingest(data_dir, db_dir, progress=None):
+        raise RuntimeError("ollama unavailable")
+
+    queue = IngestionJobQueue(str(tmp_path), str(tmp_path), ingest_fn=failing_ingest)
+    job = queue.submit("US1111111.pdf")
+    queue.shutdown(wait=True)
+
+    status = job.to_dict()
+    assert status["status"] == "failed"
+    assert status["errors"][0]["error"] == "ollama unavailable"
+    assert queue.get("missing") is None
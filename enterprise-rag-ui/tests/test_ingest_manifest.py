@@ -0,0 +1,68 @@
+import json
+
+from ingestion.manifest import IngestionManifest, file_sha256, make_chunk_id
+
+
+def test_diff_reports_new_changed_and_removed_files(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    a = data_dir / "US1111111.pdf"
+    b = data_dir / "US2222222.pdf"
+    a.write_bytes(b"first patent")
+    b.write_bytes(b"second patent")
+
+    manifest = IngestionManifest(str(tmp_path), "nomic-embed-text:1000:100")
+    hashes = {p.name: manifest.fingerprint(p) for p in (a, b)}
+    assert manifest.diff(hashes) == (["US1111111.pdf", "US2222222.pdf"], [])
+
+    manifest.record(a, hashes[a.name], ["a-0", "a-1"])
+    manifest.record(b, hashes[b.name], ["b-0"])
+    manifest.save()
+
+    # Reloaded from disk, nothing needs re-embedding
+    manifest = IngestionManifest(str(tmp_path), "nomic-embed-text:1000:100")
+    assert manifest.diff(hashes) == ([], [])
+
+    # A changed file and a deleted file
+    a.write_bytes(b"first patent, amended")
+    hashes = {a.name: manifest.fingerprint(a)}
+    assert manifest.diff(hashes) == (["US1111111.pdf"], ["US2222222.pdf"])
+    assert manifest.chunk_ids("US2222222.pdf") == ["b-0"]
+
+
+def test_settings_change_invalidates_every_file(tmp_path):
+    pdf = tmp_path / "US1111111.pdf"
+    pdf.write_bytes(b"patent")
+    sha = file_sha256(str(pdf))
+
+    manifest = IngestionManifest(str(tmp_path), "nomic-embed-text:1000:100")
+    manifest.record(pdf, sha, ["x-0"])
+    manifest.save()
+
+    manifest = IngestionManifest(str(tmp_path), "nomic-embed-text:500:50")
+    assert manifest.diff({pdf.name: sha}) == (["US1111111.pdf"], [])
+
+
+def test_chunk_ids_are_stable_and_version_specific():
+    first = make_chunk_id("US1.pdf", "aa", "m:1000:100", 3)
+    assert first == make_chunk_id("US1.pdf", "aa", "m:1000:100", 3)
+    assert first != make_chunk_id("US1.pdf", "bb", "m:1000:100", 3)
+    assert first != make_chunk_id("US1.pdf", "aa", "m:1000:100", 4)
+
+
+def test_legacy_json_manifest_is_imported_once(tmp_path):
+    (tmp_path / "ingest_manifest.json").write_text(json.dumps({"files": {
+        "US1111111.pdf": {"sha256": "aa", "settings": "s", "size": 1, "mtime_ns": 2, "chunk_ids": ["x-0"]},
+        "ipg240102.xml#US11391262": {"sha256": "bb", "settings": "s", "source": "ipg240102.xml",
+                                     "chunk_ids": ["y-0"]},
+    }}))
+    manifest = IngestionManifest(str(tmp_path), "s")
+    assert len(manifest) == 2 and manifest.count("ipg240102.xml") == 1
+    assert manifest.is_current("US1111111.pdf", "aa")
+    assert list(manifest.file_entries()) == [("US1111111.pdf", 1, 2, "aa")]
+    assert not (tmp_path / "ingest_manifest.json").exists()
+
+    # Unsaved changes are discarded, like an interrupted run's
+    manifest.forget("US1111111.pdf")
+    manifest.close()
+    assert IngestionManifest(str(tmp_path), "s").chunk_ids("US1111111.pdf") == ["x-0"]
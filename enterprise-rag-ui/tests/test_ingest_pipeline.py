@@ -0,0 +1,258 @@
+import threading
+import time
+
+import pytest
+
+from ingestion.manifest import IngestionManifest
+from ingestion.metadata_store import PatentMetadataStore
+from ingestion.patent_ingestion import IngestionProgress, PatentVectorizer, stream_documents
+from ingestion.pipeline import Stage, run_pipeline
+from ingestion.uspto import iter_grant_documents, iter_grant_xml, parse_grant
+from retriever.bm25 import BM25Index, BM25Journal
+
+GRANT = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE us-patent-grant SYSTEM "us-patent-grant-v47-2022-02-17.dtd" [ ]>
+<us-patent-grant lang="EN" file="US{number}-20240102.XML">
+<us-bibliographic-data-grant>
+<publication-reference>
+<document-id>
+<country>US</country>
+<doc-number>{number}</doc-number>
+<kind>B2</kind>
+</document-id>
+</publication-reference>
+<invention-title id="d2e43">{title}</invention-title>
+</us-bibliographic-data-grant>
+<abstract id="abstract">
+<p id="p-0001" num="0000">A {title} with an improved housing&mdash;lighter and stronger.</p>
+</abstract>
+<description id="description">
+<heading id="h-0001" level="1">BACKGROUND</heading>
+<p id="p-0002" num="0001">Existing designs are heavy.</p>
+<p id="p-0003" num="0002">The housing is moulded in one piece.</p>
+</description>
+<us-claim-statement>What is claimed is:</us-claim-statement>
+<claims id="claims">
+<claim id="CLM-00001" num="00001">
+<claim-text>1. A {title} comprising a housing.</claim-text>
+</claim>
+<claim id="CLM-00002" num="00002">
+<claim-text>2. The {title} of <claim-ref idref="CLM-00001">claim 1</claim-ref>, wherein the housing is moulded.</claim-text>
+</claim>
+</claims>
+</us-patent-grant>
+"""
+
+
+def write_dump(path, patents):
+    path.write_text("".join(GRANT.format(number=number, title=title) for number, title in patents),
+                    encoding="utf-8")
+    return str(path)
+
+
+def test_pipeline_yields_every_item_with_bounded_lookahead():
+    produced = []
+
+    def source():
+        for i in range(200):
+            produced.append(i)
+            yield i
+
+    stages = [Stage("double", lambda x: x * 2), Stage("inc", lambda x: x + 1, workers=3)]
+    results = []
+    for result, failure in run_pipeline(source(), stages, queue_size=4):
+        assert failure is None
+        results.append(result)
+        time.sleep(0.001)  # a slow consumer
+        # Three queues of 4, plus one item held by each worker and the feeder
+        assert len(produced) - len(results) <= 3 * 4 + 4 + 1
+    assert sorted(results) == [i * 2 + 1 for i in range(200)]
+
+
+def test_pipeline_passes_failures_on_and_keeps_going():
+    def check(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    outcomes = list(run_pipeline(range(6), [Stage("check", check), Stage("same", lambda x: x)]))
+    failures = [failure for _, failure in outcomes if failure is not None]
+    assert [result for result, _ in outcomes if result is not None] == [0, 1, 2, 4, 5]
+    assert len(failures) == 1
+    assert failures[0].item == 3 and failures[0].stage == "check"
+    assert str(failures[0].error) == "bad item"
+
+
+def test_closing_the_pipeline_stops_the_source():
+    closed = threading.Event()
+
+    def source():
+        try:
+            for i in range(10_000):
+                yield i
+        finally:
+            closed.set()
+
+    results = run_pipeline(source(), [Stage("same", lambda x: x)], queue_size=2)
+    assert next(results) == (0, None)
+    results.close()
+    assert closed.is_set()
+
+
+def test_source_errors_are_raised_after_its_items():
+    def source():
+        yield 1
+        raise OSError("disk gone")
+
+    results = run_pipeline(source(), [Stage("same", lambda x: x)])
+    assert next(results) == (1, None)
+    with pytest.raises(OSError):
+        next(results)
+
+
+def test_parse_uspto_grant(tmp_path):
+    dump = write_dump(tmp_path / "ipg240102.xml", [("011391262", "widget"), ("D0950000", "lamp")])
+    with open(dump, "rb") as f:
+        patents = [parse_grant(xml) for xml in iter_grant_xml(f)]
+
+    assert [number for number, _ in patents] == ["US11391262", "USD950000"]
+    number, text = patents[0]
+    assert text.startswith("Title: widget\nAbstract: A widget with an improved housing—lighter")
+    assert "BACKGROUND\n\nExisting designs are heavy." in text
+    assert text.endswith("Claims:\n1. A widget comprising a housing.\n"
+                         "2. The widget of claim 1, wherein the housing is moulded.")
+
+
+class FakeVectorizer(PatentVectorizer):
+    def embed(self, chunks):
+        return [[float(len(chunk.page_content)), 1.0] for chunk in chunks]
+
+
+class InterruptingProgress(IngestionProgress):
+    def __init__(self, after):
+        self.after = after
+        self.embedded = []
+
+    def on_chunks_embedded(self, filename, count):
+        self.embedded.append(filename)
+        if len(self.embedded) == self.after:
+            raise KeyboardInterrupt()
+
+
+def test_dump_import_checkpoints_and_resumes(tmp_path):
+    from langchain_community.vectorstores import Chroma
+
+    dump = write_dump(tmp_path / "ipg240102.xml", [(f"{11000000 + i}", f"widget {i}") for i in range(5)])
+    db_dir = tmp_path / "db"
+    vectorizer = FakeVectorizer()
+    vectorstore = Chroma(persist_directory=str(db_dir), embedding_function=None)
+
+    def run(progress):
+        manifest = IngestionManifest(str(db_dir), vectorizer.settings_key)
+        keyword_index = BM25Journal(str(db_dir / "bm25.json"))
+        store = PatentMetadataStore(str(db_dir / "metadata.db"))
+        try:
+            return stream_documents(
+                iter_grant_documents(dump, skip=manifest.is_current), vectorizer, vectorstore,
+                keyword_index, manifest, store, progress,
+                sha256_of=lambda doc: doc.metadata["sha256"],
+                record=lambda doc, sha, ids: manifest.record_document(doc.metadata["filename"], sha, ids, "ipg240102.xml"),
+                checkpoint_every=2
+            )
+        finally:
+            store.close()
+
+    with pytest.raises(KeyboardInterrupt):
+        run(InterruptingProgress(after=3))
+    # The third patent was upserted before the interrupt, and kept
+    manifest = IngestionManifest(str(db_dir), vectorizer.settings_key)
+    assert len(manifest) == 3
+    count = vectorstore._collection.count()
+    # The keyword index journal holds exactly the committed patents
+    assert len(BM25Index.load(str(db_dir / "bm25.json"))) == count
+
+    progress = InterruptingProgress(after=-1)
+    run(progress)
+    assert progress.embedded == ["ipg240102.xml#US11000003", "ipg240102.xml#US11000004"]
+    manifest = IngestionManifest(str(db_dir), vectorizer.settings_key)
+    assert len(manifest) == 5
+    assert len(BM25Index.load(str(db_dir / "bm25.json"))) == count * 5 // 3
+    assert vectorstore._collection.count() == count * 5 // 3
+    # Dump entries have no file of their own, so they are never reported as removed
+    assert manifest.diff({}) == ([], [])
+
+
+def test_metadata_is_backfilled_for_patents_already_ingested(tmp_path, monkeypatch):
+    import ingestion.patent_ingestion as patent_ingestion
+
+    monkeypatch.setattr(patent_ingestion, "PatentVectorizer", FakeVectorizer)
+    data_dir, db_dir = tmp_path / "data", tmp_path / "db"
+    data_dir.mkdir()
+    (data_dir / "US11000001.txt").write_text(
+        "Title: Widget\n\nAbstract: A widget with a housing.\n\n"
+        "Description: The housing is moulded in one piece.\n\n"
+        "Claims: 1. A widget comprising a housing.\n2. The widget of claim 1, wherein it is moulded.",
+        encoding="utf-8"
+    )
+    patent_ingestion.ingest_patents(str(data_dir), str(db_dir))
+
+    # A store from before the metadata store existed: everything is up to date except its rows
+    for path in db_dir.glob(f"{patent_ingestion.METADATA_DB_FILENAME}*"):
+        path.unlink()
+    patent_ingestion.ingest_patents(str(data_dir), str(db_dir))
+
+    store = PatentMetadataStore(str(db_dir / patent_ingestion.METADATA_DB_FILENAME))
+    record = store.get("US11000001")
+    manifest = IngestionManifest(str(db_dir), FakeVectorizer().settings_key)
+    assert record["title"] == "Widget"
+    assert record["chunk_ids"] == manifest.chunk_ids("US11000001.txt")
+    assert "claim" in record["chunk_sections"] and None not in record["chunk_sections"]
+    store.close()
+    manifest.close()
+
+
+def test_rebuild_with_an_empty_data_dir_clears_the_manifest(tmp_path, monkeypatch):
+    import ingestion.patent_ingestion as patent_ingestion
+
+    monkeypatch.setattr(patent_ingestion, "PatentVectorizer", FakeVectorizer)
+    data_dir, db_dir = tmp_path / "data", tmp_path / "db"
+    data_dir.mkdir()
+    patent = data_dir / "US11000001.txt"
+    patent.write_text("Title: Widget\n\nAbstract: A widget with a housing.", encoding="utf-8")
+    patent_ingestion.ingest_patents(str(data_dir), str(db_dir))
+
+    # Nothing to re-ingest, so the run returns early; the cleared manifest must still be saved
+    contents = patent.read_text(encoding="utf-8")
+    patent.unlink()
+    patent_ingestion.ingest_patents(str(data_dir), str(db_dir), rebuild=True)
+
+    manifest = IngestionManifest(str(db_dir), FakeVectorizer().settings_key)
+    store = PatentMetadataStore(str(db_dir / patent_ingestion.METADATA_DB_FILENAME))
+    assert len(manifest) == 0 and len(store) == 0
+    manifest.close()
+    store.close()
+
+    # Restoring the file ingests it again rather than treating it as up to date
+    patent.write_text(contents, encoding="utf-8")
+    patent_ingestion.ingest_patents(str(data_dir), str(db_dir))
+    manifest = IngestionManifest(str(db_dir), FakeVectorizer().settings_key)
+    assert manifest.chunk_ids("US11000001.txt")
+    manifest.close()
+
+
+def test_interrupted_dump_import_closes_its_stores(tmp_path, monkeypatch):
+    import ingestion.uspto as uspto
+
+    closed = []
+    for cls in (uspto.IngestionManifest, uspto.PatentMetadataStore):
+        monkeypatch.setattr(cls, "close", lambda self, close=cls.close: closed.append(type(self)) or close(self))
+    monkeypatch.setattr(uspto, "PatentVectorizer", FakeVectorizer)
+    dump = write_dump(tmp_path / "ipg240102.xml", [(f"{11000000 + i}", f"widget {i}") for i in range(3)])
+
+    with pytest.raises(KeyboardInterrupt):
+        uspto.import_dump(dump, str(tmp_path / "db"), progress=InterruptingProgress(after=2))
+
+    assert sorted(cls.__name__ for cls in closed) == ["IngestionManifest", "PatentMetadataStore"]
+    manifest = IngestionManifest(str(tmp_path / "db"), FakeVectorizer().settings_key)
+    assert manifest.count(source="ipg240102.xml") == 2
+    manifest.close()
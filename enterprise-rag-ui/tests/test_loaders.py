@@ -0,0 +1,71 @@
+import os
+import sys
+import zipfile
+
+import pytest
+
+import ingestion.loaders as loaders
+from ingestion.loaders import get_loader, load_docx, load_text, load_txt, supported_extensions
+from ingestion.patent_ingestion import PatentDocumentProcessor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from loader_benchmark import run_benchmark, write_docx, write_pdf  # noqa: E402
+
+PARAGRAPHS = ["Title: Graphene electrode", "Abstract: A solar cell with a graphene electrode.",
+              "Claims:", "1. A solar cell comprising a graphene electrode."]
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def test_every_upload_format_has_a_loader():
+    assert supported_extensions() == [".docx", ".pdf", ".txt"]
+    with pytest.raises(ValueError):
+        get_loader("US1234567.odt")
+
+
+def test_txt_reads_the_same_with_and_without_mmap(tmp_path, monkeypatch):
+    path = tmp_path / "US1000000.txt"
+    path.write_bytes("Title: Café grinder\r\nAbstract: \xff".encode("utf-8") + b"\xff")
+    small = load_txt(str(path))
+    monkeypatch.setattr(loaders, "MMAP_MIN_BYTES", 0)
+    assert load_txt(str(path)) == small == "Title: Café grinder\nAbstract: \xff�"
+
+    (tmp_path / "empty.txt").write_bytes(b"")
+    assert load_txt(str(tmp_path / "empty.txt")) == ""
+
+
+def test_docx_paragraphs_runs_tabs_and_nested_paragraphs(tmp_path):
+    document = (f'<w:document {W}><w:body>'
+                '<w:p><w:r><w:t>Title: </w:t></w:r><w:r><w:t>Widget</w:t></w:r></w:p>'
+                '<w:p/>'
+                '<w:p><w:r><w:t>a</w:t><w:tab/><w:t>b</w:t><w:br/><w:t>c</w:t></w:r>'
+                '<w:r><w:pict><w:txbxContent><w:p><w:r><w:t>boxed</w:t></w:r></w:p></w:txbxContent></w:pict></w:r>'
+                '<w:r><w:t> after</w:t></w:r></w:p>'
+                '</w:body></w:document>')
+    path = tmp_path / "US1000000.docx"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", document)
+
+    assert load_docx(str(path)) == "Title: Widget\n\nboxed\n\na\tb\nc after"
+
+
+def test_processor_ingests_every_supported_format(tmp_path):
+    (tmp_path / "US1000000.txt").write_text("\n\n".join(PARAGRAPHS), encoding="utf-8")
+    write_docx(tmp_path / "US1000001.docx", PARAGRAPHS)
+    write_pdf(tmp_path / "US1000002.pdf", PARAGRAPHS)
+    (tmp_path / "notes.md").write_text("not a patent")
+
+    documents = PatentDocumentProcessor(str(tmp_path)).process_directory()
+    assert [d.metadata["file_type"] for d in documents] == ["txt", "docx", "pdf"]
+    for doc in documents:
+        assert doc.metadata["title"] == "Graphene electrode"
+        assert doc.metadata["claims_count"] == 1
+    assert load_text(str(tmp_path / "US1000001.docx")) == load_text(str(tmp_path / "US1000000.txt"))
+
+
+def test_small_benchmark_reports_every_format():
+    result = run_benchmark(3, repeats=1, paragraphs=2)
+    assert set(result["formats"]) == {"txt", "docx", "pdf"}
+    for stats in result["formats"].values():
+        assert stats["loaders"]["registry"]["files_per_s"] > 0
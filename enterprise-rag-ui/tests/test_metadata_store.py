@@ -0,0 +1,59 @@
+from ingestion.metadata_store import PatentMetadataStore, normalize_patent_number
+
+
+def test_normalize_patent_number():
+    assert normalize_patent_number("us 11,391,262") == "US11391262"
+    assert normalize_patent_number("11391262") == "US11391262"
+    assert normalize_patent_number("") == ""
+
+
+def test_lookup_by_patent_number(tmp_path):
+    store = PatentMetadataStore(str(tmp_path / "patents.sqlite3"))
+    store.upsert("US11391262.pdf", "US11391262", "Solar storage", "An abstract",
+                 ["A system comprising a cell.", "The system of claim 1."], ["c-2", "c-0", "c-1"])
+    store.upsert("notes.pdf", None, "Unknown Title", "", [], ["n-0"])
+
+    record = store.get("US 11,391,262")
+    assert record["filename"] == "US11391262.pdf"
+    assert record["claims"][1] == "The system of claim 1."
+    assert record["chunk_ids"] == ["c-2", "c-0", "c-1"]
+    assert store.get("US0000000") is None
+
+    # Re-ingesting a changed file replaces its chunks
+    store.upsert("US11391262.pdf", "US11391262", "Solar storage", "New abstract", [], ["d-0"])
+    assert store.get("US11391262")["chunk_ids"] == ["d-0"]
+
+    store.remove("US11391262.pdf")
+    assert store.get("US11391262") is None
+
+
+def test_analysis_context_skips_chunks_of_the_abstract_and_claims(tmp_path):
+    import asyncio
+
+    from langchain.docstore.document import Document
+
+    from main import build_patent_context
+
+    store = PatentMetadataStore(str(tmp_path / "patents.sqlite3"))
+    store.upsert("US11391262.pdf", "US11391262", "Solar storage", "An abstract",
+                 ["A system comprising a cell."], ["a-0", "c-0", "d-0", "d-1"],
+                 ["abstract", "claim", "description", "description"])
+    record = store.get("US11391262")
+    assert record["chunk_sections"] == ["abstract", "claim", "description", "description"]
+
+    requested = []
+
+    async def load_chunks(chunk_ids):
+        requested.extend(chunk_ids)
+        return [Document(page_content=chunk_id, metadata={"section": "description"}) for chunk_id in chunk_ids]
+
+    docs = asyncio.run(build_patent_context(record, "technical", load_chunks))
+    assert requested == ["d-0", "d-1"]
+    assert [doc.page_content for doc in docs[2:]] == ["d-0", "d-1"]
+
+    # Without extracted claims, the claim chunks are the only source of them
+    store.upsert("US11391262.pdf", "US11391262", "Solar storage", "An abstract", [],
+                 ["a-0", "c-0", "d-0"], ["abstract", "claim", "description"])
+    requested.clear()
+    asyncio.run(build_patent_context(store.get("US11391262"), "claims", load_chunks))
+    assert requested == ["c-0", "d-0"]
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from concurrency import UpstreamLimiter
+from metrics import Counter, Histogram, STAGE_ERRORS, STAGE_SECONDS, gauge, render, start_trace, timed
+
+
+def test_counter_and_histogram_render_in_prometheus_format():
+    requests = Counter("test_requests_total", "Requests", ["route"])
+    requests.inc(route="/ask")
+    requests.inc(2, route="/ask")
+    assert requests.value(route="/ask") == 3
+
+    latency = Histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value)
+
+    lines = requests.render() + latency.render()
+    assert "# TYPE test_requests_total counter" in lines
+    assert 'test_requests_total{route="/ask"} 3' in lines
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{le="1"} 2' in lines
+    assert 'test_latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "test_latency_seconds_count 3" in lines
+    assert latency.count() == 3
+
+
+def test_labels_must_match_declaration():
+    with pytest.raises(ValueError):
+        Counter("test_labeled_total", "Labeled", ["stage"]).inc(route="/ask")
+
+
+def test_timed_records_duration_trace_span_and_errors():
+    before = STAGE_SECONDS.count(stage="test_stage")
+    errors = STAGE_ERRORS.value(stage="test_stage")
+    trace = start_trace("test")
+
+    with timed("test_stage"):
+        pass
+    with pytest.raises(RuntimeError):
+        with timed("test_stage"):
+            raise RuntimeError("boom")
+
+    assert STAGE_SECONDS.count(stage="test_stage") == before + 2
+    assert STAGE_ERRORS.value(stage="test_stage") == errors + 1
+    assert [stage for stage, _ in trace.spans] == ["test_stage", "test_stage"]
+    assert trace.server_timing().startswith("test_stage;dur=")
+
+
+def test_trace_follows_calls_onto_limiter_threads():
+    limiter = UpstreamLimiter("test", 2)
+
+    def blocking_stage():
+        with timed("test_threaded"):
+            return 42
+
+    async def request():
+        trace = start_trace("request")
+        assert await limiter.run(blocking_stage) == 42
+        return trace
+
+    trace = asyncio.run(request())
+    assert [stage for stage, _ in trace.spans] == ["test_threaded"]
+
+
+def test_gauges_are_collected_at_render_time():
+    values = {("a",): 1}
+    gauge("test_queue_depth", "Queue depth", ["queue"], lambda: values)
+    values[("a",)] = 7
+    assert 'test_queue_depth{queue="a"} 7' in render()
@@ -0,0 +1,148 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from retriever.mmap_index import MmapVectorIndex, build_index, export_from_chroma
+
+
+def make_corpus(n=2000, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    vectors = centers[rng.integers(20, size=n)] + 0.5 * rng.normal(size=(n, dim))
+    ids = [f"chunk-{i}" for i in range(n)]
+    texts = [f"text of chunk {i}" for i in range(n)]
+    metadatas = [{"chunk_id": chunk_id, "row": i} for i, chunk_id in enumerate(ids)]
+    return ids, vectors.astype(np.float32), texts, metadatas
+
+
+def batches(ids, vectors, texts, metadatas, size=300):
+    for start in range(0, len(ids), size):
+        end = start + size
+        yield ids[start:end], vectors[start:end].tolist(), texts[start:end], metadatas[start:end]
+
+
+def exact_top(vectors, query, k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:k])
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_quantized_search_matches_exact_search(tmp_path, dtype):
+    ids, vectors, texts, metadatas = make_corpus()
+    index = build_index(str(tmp_path / "index"), batches(ids, vectors, texts, metadatas), len(ids), dtype=dtype)
+
+    rng = np.random.default_rng(1)
+    hits = 0
+    for row in rng.choice(len(ids), 50, replace=False):
+        query = vectors[row] + 0.1 * rng.normal(size=vectors.shape[1])
+        found = [r for r, _ in index.search(query, 10)]
+        hits += len(set(found) & set(exact_top(vectors, query, 10)))
+    assert hits / 500 >= 0.99
+
+    # Quantized vectors take a quarter (int8) or half (float16) of float32
+    assert index.vectors.nbytes == vectors.nbytes // (4 if dtype == "int8" else 2)
+
+
+def test_documents_are_served_like_the_chroma_store(tmp_path):
+    ids, vectors, texts, metadatas = make_corpus(200)
+    index = build_index(str(tmp_path / "index"), batches(ids, vectors, texts, metadatas), len(ids),
+                        keep_float32=False)
+
+    docs = index.similarity_search_by_vector(vectors[42].tolist(), k=3)
+    assert docs[0].page_content == "text of chunk 42"
+    assert docs[0].metadata == {"chunk_id": "chunk-42", "row": 42}
+
+    found = index.get(ids=["chunk-7", "missing", "chunk-3"], include=["documents", "metadatas"])
+    assert found["ids"] == ["chunk-7", "chunk-3"]
+    assert found["documents"] == ["text of chunk 7", "text of chunk 3"]
+
+
+def test_inverted_lists_keep_recall_high(tmp_path):
+    ids, vectors, texts, metadatas = make_corpus(3000)
+    index = build_index(str(tmp_path / "index"), batches(ids, vectors, texts, metadatas), len(ids),
+                        ivf_min_vectors=1000)
+    assert index.centroids is not None
+    assert sorted(np.asarray(index.rows)) == list(range(len(ids)))
+
+    rng = np.random.default_rng(2)
+    hits = 0
+    for row in rng.choice(len(ids), 50, replace=False):
+        found = [r for r, _ in index.search(vectors[row], 5)]
+        hits += len(set(found) & set(exact_top(vectors, vectors[row], 5)))
+    assert hits / 250 >= 0.9
+
+
+def test_rebuild_swaps_the_index_and_marks_open_views_stale(tmp_path):
+    ids, vectors, texts, metadatas = make_corpus(100)
+    path = str(tmp_path / "index")
+    old = build_index(path, batches(ids, vectors, texts, metadatas), len(ids))
+    assert not old.is_stale()
+
+    build_index(path, batches(ids[:50], vectors[:50], texts[:50], metadatas[:50]), 50)
+    assert old.is_stale()
+    # The old view still answers from the files it mapped
+    assert len(old.similarity_search_by_vector(vectors[0].tolist(), k=1)) == 1
+    assert len(MmapVectorIndex(path)) == 50
+    assert [p.name for p in tmp_path.iterdir()] == ["index"]
+
+
+def test_export_from_chroma(tmp_path):
+    from langchain_community.vectorstores import Chroma
+    from retrieval_benchmark import HashEmbeddings, generate_corpus
+
+    embeddings = HashEmbeddings(64)
+    chunks = generate_corpus(120)
+    store = Chroma(persist_directory=str(tmp_path / "chroma"), embedding_function=embeddings)
+    store.add_documents(chunks, ids=[c.metadata["chunk_id"] for c in chunks])
+
+    index = export_from_chroma(store, str(tmp_path / "index"), dtype="int8")
+    assert len(index) == 120
+    query = embeddings.embed_query(chunks[5].page_content)
+    assert index.similarity_search_by_vector(query, k=1)[0].metadata["chunk_id"] == chunks[5].metadata["chunk_id"]
+
+    # The retriever searches it in place of the Chroma store
+    import retriever.search as search
+    db_dir = search.DB_DIR
+    try:
+        search.DB_DIR = str(tmp_path / "index")  # no keyword index here: dense search only
+        search.vectorstore.set(index)
+        docs = search.hybrid_search("ignored", query, k=2)
+        assert docs[0].metadata["chunk_id"] == chunks[5].metadata["chunk_id"]
+        assert search.get_chunks([chunks[9].metadata["chunk_id"]])[0].page_content == chunks[9].page_content
+    finally:
+        search.DB_DIR = db_dir
+        search.vectorstore.reset()
+
+
+def test_emptied_store_replaces_a_stale_index(tmp_path):
+    ids, vectors, texts, metadatas = make_corpus(100)
+    path = str(tmp_path / "index")
+    old = build_index(path, batches(ids, vectors, texts, metadatas), len(ids))
+
+    # Every chunk was deleted: the rebuilt index is empty, not left as it was
+    empty = build_index(path, iter([]), 0)
+    assert old.is_stale()
+    assert len(empty) == 0
+    assert empty.similarity_search_by_vector(vectors[0].tolist(), k=3) == []
+    assert empty.get(ids=[ids[0]])["ids"] == []
+
+
+def test_mmap_backend_exports_the_index_on_first_load(tmp_path, monkeypatch):
+    from langchain_community.vectorstores import Chroma
+    from retrieval_benchmark import HashEmbeddings, generate_corpus
+
+    import retriever.search as search
+
+    chunks = generate_corpus(30)
+    store = Chroma(persist_directory=str(tmp_path), embedding_function=HashEmbeddings(64))
+    store.add_documents(chunks, ids=[c.metadata["chunk_id"] for c in chunks])
+
+    monkeypatch.setattr(search, "VECTOR_BACKEND", "mmap")
+    monkeypatch.setattr(search, "DB_DIR", str(tmp_path))
+    index = search._load_vectorstore()
+    assert isinstance(index, MmapVectorIndex) and len(index) == 30
+    assert os.path.isfile(os.path.join(str(tmp_path), "mmap_index", "meta.json"))
@@ -0,0 +1,39 @@
+import fitz
+
+from ingestion.patent_ingestion import PatentDocumentProcessor
+
+
+def _write_pdf(path, pages):
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+
+
+def test_process_pool_yields_same_documents_as_serial(tmp_path):
+    for i in range(6):
+        _write_pdf(tmp_path / f"US{1000000 + i}.pdf", [f"Title: Patent {i}", f"page two of {i}"])
+    (tmp_path / "US9999999.pdf").write_bytes(b"not a pdf")
+
+    serial = PatentDocumentProcessor(str(tmp_path)).iter_documents()
+    parallel = PatentDocumentProcessor(str(tmp_path), workers=3).iter_documents()
+
+    by_name = lambda docs: {d.metadata["filename"]: d for d in docs}
+    serial, parallel = by_name(serial), by_name(parallel)
+
+    assert serial.keys() == parallel.keys()
+    for name, doc in serial.items():
+        assert parallel[name].page_content == doc.page_content
+    assert "page two of 3" in parallel["US1000003.pdf"].page_content
+    assert parallel["US1000003.pdf"].metadata["title"] == "Patent 3"
+    assert parallel["US9999999.pdf"].page_content == ""
+    assert "error" in parallel["US9999999.pdf"].metadata
+
+
+def test_process_directory_skips_unreadable_files(tmp_path):
+    _write_pdf(tmp_path / "US1000000.pdf", ["Title: Only patent"])
+    (tmp_path / "US9999999.pdf").write_bytes(b"not a pdf")
+
+    documents = PatentDocumentProcessor(str(tmp_path), workers=2).process_directory()
+    assert [d.metadata["filename"] for d in documents] == ["US1000000.pdf"]
@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from retriever.query_embeddings import MicroBatcher, QueryEmbedder, QueryEmbeddingCache
+
+
+def vector_for(text):
+    return [float(len(text)), float(sum(map(ord, text)) % 97)]
+
+
+def test_cache_normalizes_keys_per_model_and_evicts_least_recently_used():
+    cache = QueryEmbeddingCache(max_entries=2)
+    cache.put("nomic", "What is  Prior Art?", [1.0])
+    assert cache.get("nomic", "what is prior art?") == [1.0]
+    assert cache.get("other-model", "what is prior art?") is None
+
+    cache.put("nomic", "second", [2.0])
+    cache.get("nomic", "what is prior art?")  # now most recently used
+    cache.put("nomic", "third", [3.0])
+    assert cache.get("nomic", "second") is None
+    assert cache.get("nomic", "What is prior art?") == [1.0]
+    assert cache.stats()["entries"] == 2
+
+
+def test_sync_embedding_is_served_from_cache():
+    calls = []
+    embedder = QueryEmbedder(lambda text: calls.append(text) or vector_for(text), None)
+    assert embedder.embed("nomic", "Claims of US123") == embedder.embed("nomic", "claims of us123")
+    assert calls == ["Claims of US123"]
+
+
+def test_concurrent_identical_queries_share_one_call():
+    calls = []
+
+    async def embed_one(text):
+        calls.append(text)
+        await asyncio.sleep(0.01)
+        return vector_for(text)
+
+    async def run():
+        embedder = QueryEmbedder(None, embed_one)
+        results = await asyncio.gather(*(embedder.aembed("nomic", "prior art") for _ in range(5)))
+        again = await embedder.aembed("nomic", "Prior art")
+        return results, again
+
+    results, again = asyncio.run(run())
+    assert calls == ["prior art"]
+    assert all(result == vector_for("prior art") for result in results)
+    assert again == vector_for("prior art")
+
+
+def test_distinct_queries_within_the_window_are_batched():
+    batches = []
+
+    async def embed_batch(texts):
+        batches.append(list(texts))
+        return [vector_for(text) for text in texts]
+
+    async def run():
+        embedder = QueryEmbedder(None, None, embed_batch, window_seconds=0.02, max_batch_size=3)
+        questions = [f"analyze patent US{n}" for n in range(5)]
+        return questions, await asyncio.gather(*(embedder.aembed("nomic", q) for q in questions))
+
+    questions, results = asyncio.run(run())
+    # A full batch goes out at once; the rest waits out the window
+    assert [len(batch) for batch in batches] == [3, 2]
+    assert results == [vector_for(q) for q in questions]
+
+
+def test_batch_failure_reaches_every_waiter():
+    async def embed_batch(texts):
+        raise ValueError("embedding service down")
+
+    async def run():
+        batcher = MicroBatcher(embed_batch, window_seconds=0.005)
+        return await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_failed_call_is_not_cached():
+    attempts = []
+
+    async def embed_one(text):
+        attempts.append(text)
+        if len(attempts) == 1:
+            raise ValueError("timeout")
+        return vector_for(text)
+
+    async def run():
+        embedder = QueryEmbedder(None, embed_one)
+        with pytest.raises(ValueError):
+            await embedder.aembed("nomic", "novelty")
+        return await embedder.aembed("nomic", "novelty")
+
+    assert asyncio.run(run()) == vector_for("novelty")
+    assert len(attempts) == 2
+
+
+def test_in_flight_batches_are_kept_alive_and_cancelled_on_close():
+    import gc
+
+    release = None
+
+    async def slow_batch(texts):
+        await release.wait()
+        return [vector_for(text) for text in texts]
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        batcher = MicroBatcher(slow_batch, window_seconds=0.001)
+        waiter = asyncio.ensure_future(batcher.embed("claim 1"))
+        await asyncio.sleep(0.01)
+        # The send task is only referenced by the batcher, and survives a collection
+        gc.collect()
+        assert len(batcher._tasks) == 1
+
+        release.set()
+        assert await waiter == vector_for("claim 1")
+        await asyncio.sleep(0)
+        assert not batcher._tasks
+
+        release.clear()
+        waiter = asyncio.ensure_future(batcher.embed("claim 2"))
+        await asyncio.sleep(0.01)
+        await batcher.aclose()
+        assert not batcher._tasks
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+import pytest
+
+from llm.relevance import is_patent_related, relevance_score
+
+
+@pytest.mark.parametrize("question", [
+    "Is my app idea patentable?",
+    "What counts as prior art?",
+    "Summarize patent US11391262",
+    "Summarize us 11,391,262 please",
+    "What does claim 3 of this document cover?",
+    "How do I protect my IP before a pitch?",
+    "Explain 35 U.S.C. 103",
+    "What is the status of application 16/123,456?",
+    "Can the examiner's rejection be appealed?",
+])
+def test_patent_questions(question):
+    assert is_patent_related(question)
+
+
+@pytest.mark.parametrize("question", [
+    # Each of these scored below the threshold before
+    "How do I file a provisional?",
+    "Can you explain the claims?",
+    "explain claim construction",
+    "How do I respond to a final rejection?",
+    "What is the grace period for filing?",
+    "what does the examiner mean by anticipation?",
+    "FRAND licensing",
+])
+def test_patent_practice_questions(question):
+    assert is_patent_related(question)
+
+
+@pytest.mark.parametrize("question", [
+    # Each of these matched a substring keyword ("ip", "term", "issue", "claim", "grant") before
+    "How do I zip a folder?",
+    "What is the long-term forecast?",
+    "What's the issue with my laptop?",
+    "Can I claim my home office on my taxes?",
+    "How do I apply for a research grant?",
+    "My IP address keeps changing",
+    "Where can I buy inventory software?",
+    "How do I file an insurance claim after a car accident?",
+    "How do I cope with rejection after a job interview?",
+])
+def test_everyday_questions(question):
+    assert not is_patent_related(question)
+
+
+def test_score_agrees_with_classifier_and_counts_terms_once():
+    score, terms = relevance_score("claim, claim, claim and term")
+    assert terms == ["claim", "term"]
+    assert score == 1.0
+    assert is_patent_related("claim, claim, claim and term")
+    assert not is_patent_related("claim, claim, claim")
@@ -0,0 +1,93 @@
+import time
+
+from langchain.docstore.document import Document
+
+from retriever.bm25 import BM25Index
+from retriever.rerank import OverlapScorer, Reranker, ScoreCache
+
+CHUNKS = [
+    Document(page_content="A battery pack with a cooling plate.", metadata={"chunk_id": "a"}),
+    Document(page_content="Claim 2. The anode comprises a graphene coated silicon nanowire.",
+             metadata={"chunk_id": "b", "claim_number": 2, "filename": "US11391262.pdf"}),
+    Document(page_content="The silicon wafer is cut into cells.", metadata={"chunk_id": "c"}),
+    Document(page_content="Claim 3. The anode of claim 2, wherein the graphene is doped.",
+             metadata={"chunk_id": "d", "claim_number": 3, "filename": "US11391262.pdf"}),
+]
+
+
+def ids(docs):
+    return [doc.metadata["chunk_id"] for doc in docs]
+
+
+class CountingScorer:
+    name = "counting"
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+
+    def score(self, question, docs):
+        self.batches.append(len(docs))
+        if self.fail:
+            raise RuntimeError("model crashed")
+        time.sleep(self.delay)
+        # Prefer later candidates, so any re-ranking is visible
+        return [float(ord(doc.metadata["chunk_id"])) for doc in docs]
+
+
+def test_overlap_scorer_prefers_rare_terms_phrases_and_named_claims():
+    index = BM25Index()
+    for doc in CHUNKS:
+        index.add(doc.metadata["chunk_id"], doc.page_content)
+    reranker = Reranker(OverlapScorer(lambda: index), lambda doc: doc.metadata["chunk_id"])
+
+    assert ids(reranker.rerank("What does the graphene nanowire anode do?", CHUNKS, 2)) == ["b", "d"]
+    # A named claim number outweighs term overlap
+    assert ids(reranker.rerank("What does claim 3 of US11391262 add about graphene?", CHUNKS, 1)) == ["d"]
+
+
+def test_scores_are_batched_and_cached():
+    scorer = CountingScorer()
+    reranker = Reranker(scorer, lambda doc: doc.metadata["chunk_id"], batch_size=3)
+
+    # One candidate is scored first to measure the scorer
+    assert ids(reranker.rerank("anode", CHUNKS, 2)) == ["d", "c"]
+    assert scorer.batches == [1, 3]
+    # Same question (modulo case and spacing): nothing is re-scored
+    assert ids(reranker.rerank("  Anode ", CHUNKS, 2)) == ["d", "c"]
+    assert scorer.batches == [1, 3]
+
+
+def test_overrunning_the_budget_keeps_first_stage_order():
+    scorer = CountingScorer(delay=0.02)
+    reranker = Reranker(scorer, lambda doc: doc.metadata["chunk_id"], budget_seconds=0.01, batch_size=1,
+                        cache=ScoreCache())
+
+    assert ids(reranker.rerank("anode", CHUNKS, 2)) == ["a", "b"]
+    assert scorer.batches == [1]
+
+
+def test_batches_are_sized_to_the_remaining_budget():
+    class PerCandidateScorer(CountingScorer):
+        def score(self, question, docs):
+            time.sleep(self.delay * len(docs))
+            return super().score(question, docs)
+
+    candidates = [Document(page_content=str(i), metadata={"chunk_id": chr(ord("a") + i)}) for i in range(20)]
+    scorer = PerCandidateScorer()
+    reranker = Reranker(scorer, lambda doc: doc.metadata["chunk_id"], budget_seconds=0.1, batch_size=16,
+                        cache=ScoreCache())
+    reranker.seconds_per_candidate = 0.02
+
+    # At 20 ms a candidate, no batch fits more than the 100 ms budget allows
+    scorer.delay = 0.02
+    started = time.perf_counter()
+    assert ids(reranker.rerank("anode", candidates, 2)) == ["a", "b"]
+    assert max(scorer.batches) <= 5
+    assert time.perf_counter() - started < 0.1 + 0.05
+
+
+def test_scorer_errors_keep_first_stage_order():
+    reranker = Reranker(CountingScorer(fail=True), lambda doc: doc.metadata["chunk_id"])
+    assert ids(reranker.rerank("anode", CHUNKS, 3)) == ["a", "b", "c"]
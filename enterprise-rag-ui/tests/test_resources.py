@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from resources import RESOURCES, LazyResource, lazy_resource, resource_status, warm_up
+
+
+def test_built_once_on_first_use_across_threads():
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def factory():
+        calls.append(1)
+        return object()
+
+    resource = LazyResource("test", factory)
+    assert not resource.loaded and not calls
+    results = []
+
+    def use():
+        barrier.wait()
+        results.append(resource.get())
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len({id(result) for result in results}) == 1
+    assert resource.status()["loaded"] is True
+
+
+def test_failed_load_is_reported_and_retried():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("store is down")
+        return "store"
+
+    resource = LazyResource("flaky", factory)
+    with pytest.raises(ConnectionError):
+        resource.get()
+    assert resource.status() == {"loaded": False, "load_seconds": None, "error": "store is down"}
+    assert resource.get() == "store"
+    assert resource.status()["error"] is None
+
+
+def test_warm_up_loads_registered_resources_without_raising():
+    lazy_resource("test-ok", lambda: 1)
+    lazy_resource("test-broken", lambda: 1 / 0)
+    try:
+        status = warm_up(["test-ok", "test-broken"])
+        assert status["test-ok"]["loaded"] is True
+        assert status["test-broken"]["loaded"] is False
+        assert "division by zero" in resource_status()["test-broken"]["error"]
+    finally:
+        RESOURCES.pop("test-ok")
+        RESOURCES.pop("test-broken")
+
+
+def test_set_overrides_and_reset_rebuilds():
+    resource = LazyResource("store", lambda: "built")
+    resource.set("injected")
+    assert resource.get() == "injected"
+    resource.reset()
+    assert resource.get() == "built"
@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from retrieval_benchmark import HashEmbeddings, generate_corpus, run_benchmark
+
+
+def test_synthetic_corpus_and_embeddings_are_deterministic():
+    first, second = generate_corpus(50), generate_corpus(50)
+    assert [c.page_content for c in first] == [c.page_content for c in second]
+    assert len({c.metadata["chunk_id"] for c in first}) == 50
+
+    embeddings = HashEmbeddings(64)
+    assert embeddings.embed_query("lithium anode") == embeddings.embed_query("lithium anode")
+
+
+def test_small_benchmark_reports_all_metrics():
+    import retriever.search as search
+
+    before = (search.DB_DIR, search.vectorstore.loaded, search.reranker.loaded)
+    result = run_benchmark(300, n_queries=20, k=3)
+    # The retriever is left as it was, pointing at the real store
+    assert (search.DB_DIR, search.vectorstore.loaded, search.reranker.loaded) == before
+
+    assert result["chunks"] == 300
+    assert result["ingest"]["vector_chunks_per_second"] > 0
+    for mode in ("dense", "hybrid", "reranked"):
+        latency = result["latency"][mode]
+        assert latency["p50_ms"] <= latency["p95_ms"] <= latency["p99_ms"]
+    assert result["memory"]["index_on_disk_mb"] > 0
+    assert result["memory"]["process_peak_rss_mb"] > 0
+    assert 0 < result["quality"]["dense_recall@3"] <= 1
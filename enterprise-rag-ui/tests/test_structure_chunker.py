@@ -0,0 +1,60 @@
+from langchain.docstore.document import Document
+
+from ingestion.patent_ingestion import PatentStructureChunker, PatentVectorizer, estimate_tokens
+
+PATENT_TEXT = """Title: Solar cell with graphene electrode
+
+Abstract: A photovoltaic cell having a graphene electrode that improves carrier collection.
+
+Background: Silicon solar cells lose efficiency at the front contact.
+
+Summary: The electrode is formed by chemical vapour deposition.
+
+Claims: 1. A solar cell comprising a silicon substrate and a graphene electrode.
+2. The solar cell of claim 1, wherein the graphene electrode is doped.
+3. The solar cell of claim 2, further comprising an anti-reflective coating."""
+
+
+def split(text, chunk_tokens=256):
+    doc = Document(page_content=text, metadata={"filename": "US11391262.pdf"})
+    return PatentStructureChunker(chunk_tokens=chunk_tokens).split_documents([doc])
+
+
+def test_emits_abstract_claim_and_description_chunks():
+    chunks = split(PATENT_TEXT)
+    sections = [c.metadata["section"] for c in chunks]
+    assert sections.count("abstract") == 1
+    assert sections.count("claim") == 3
+    assert "description" in sections
+
+    claims = [c for c in chunks if c.metadata["section"] == "claim"]
+    assert [c.metadata["claim_number"] for c in claims] == [1, 2, 3]
+    assert claims[1].page_content.startswith("Claim 2. The solar cell of claim 1")
+    assert all(c.metadata["filename"] == "US11391262.pdf" for c in chunks)
+
+
+def test_description_excludes_abstract_and_claims():
+    description = " ".join(c.page_content for c in split(PATENT_TEXT) if c.metadata["section"] == "description")
+    assert "Silicon solar cells lose efficiency" in description
+    assert "carrier collection" not in description
+    assert "anti-reflective" not in description
+
+
+def test_description_paragraphs_packed_to_budget():
+    paragraphs = [f"Paragraph {i} " + "word " * 40 for i in range(20)]
+    chunks = split("\n\n".join(paragraphs), chunk_tokens=120)
+    assert len(chunks) > 1
+    assert all(c.metadata["section"] == "description" for c in chunks)
+    assert all(estimate_tokens(c.page_content) <= 120 for c in chunks)
+    # Nothing is lost or duplicated
+    assert sum(c.page_content.count("Paragraph") for c in chunks) == 20
+
+
+def test_oversized_paragraph_is_split():
+    chunks = split("word " * 2000, chunk_tokens=100)
+    assert len(chunks) > 1
+    assert sum(len(c.page_content.split()) for c in chunks) == 2000
+
+
+def test_settings_key_tracks_chunking():
+    assert PatentVectorizer(chunk_tokens=256).settings_key != PatentVectorizer(chunk_tokens=128).settings_key
@@ -0,0 +1,100 @@
+import asyncio
+import os
+
+import pytest
+
+from ingestion.uploads import ContentIndex, UploadRejected, receive_upload, safe_filename
+
+BOUNDARY = "patentboundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def multipart_body(filename, content, chunk_size=7):
+    body = (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nhello\r\n"
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+    async def chunks():
+        # Small chunks so parts straddle chunk boundaries
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+    return chunks()
+
+
+def upload(tmp_path, filename, content, **kwargs):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir(exist_ok=True)
+    index = kwargs.pop("index", None) or ContentIndex(str(data_dir), str(tmp_path / "db"))
+    return asyncio.run(receive_upload(CONTENT_TYPE, multipart_body(filename, content), data_dir, index, **kwargs))
+
+
+def test_streams_file_into_data_dir_with_hash(tmp_path):
+    content = os.urandom(5000) + b"\r\n--notTheBoundary\r\n"
+    filename, sha256, size = upload(tmp_path, "US11391262.pdf", content)
+    assert (filename, size) == ("US11391262.pdf", len(content))
+    assert (tmp_path / "data" / filename).read_bytes() == content
+    assert len(sha256) == 64
+    # No partial files are left behind
+    assert os.listdir(tmp_path / "data") == ["US11391262.pdf"]
+
+
+def test_file_data_is_written_off_the_event_loop(tmp_path, monkeypatch):
+    import threading
+
+    from ingestion import uploads
+
+    writers = set()
+    on_part_data = uploads._FilePart.on_part_data
+
+    def record_thread(self, data, start, end):
+        writers.add(threading.get_ident())
+        on_part_data(self, data, start, end)
+
+    monkeypatch.setattr(uploads._FilePart, "on_part_data", record_thread)
+    monkeypatch.setattr(uploads, "WRITE_BLOCK_SIZE", 4096)
+    content = os.urandom(50000)
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    index = ContentIndex(str(data_dir), str(tmp_path / "db"))
+    body = multipart_body("US11391262.pdf", content, chunk_size=1000)
+    filename, _, _ = asyncio.run(receive_upload(CONTENT_TYPE, body, data_dir, index))
+
+    assert (data_dir / filename).read_bytes() == content
+    assert writers and threading.get_ident() not in writers
+
+
+def test_rejects_duplicate_content_under_another_name(tmp_path):
+    upload(tmp_path, "a.pdf", b"same bytes")
+    with pytest.raises(UploadRejected) as rejected:
+        upload(tmp_path, "b.pdf", b"same bytes")
+    assert rejected.value.status_code == 409
+    assert sorted(os.listdir(tmp_path / "data")) == ["a.pdf"]
+
+    # Replacing a file with new content under the same name is allowed
+    upload(tmp_path, "a.pdf", b"revised bytes")
+    assert (tmp_path / "data" / "a.pdf").read_bytes() == b"revised bytes"
+
+
+def test_detects_duplicates_of_files_added_outside_uploads(tmp_path):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "existing.txt").write_bytes(b"already here")
+    with pytest.raises(UploadRejected):
+        upload(tmp_path, "new.txt", b"already here")
+
+
+def test_rejects_bad_type_and_oversized_files(tmp_path):
+    with pytest.raises(UploadRejected) as rejected:
+        upload(tmp_path, "payload.exe", b"x")
+    assert rejected.value.status_code == 400
+
+    with pytest.raises(UploadRejected) as rejected:
+        upload(tmp_path, "big.pdf", b"x" * 100, max_bytes=50)
+    assert rejected.value.status_code == 413
+    assert os.listdir(tmp_path / "data") == []
+
+
+def test_safe_filename():
+    assert safe_filename("../../etc/passwd.pdf") == "passwd.pdf"
+    assert safe_filename("C:\\Users\\me\\my patent.pdf") == "my_patent.pdf"